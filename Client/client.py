@@ -2,11 +2,19 @@
 import sys
 import socket
 import chatlib
+import collections
 
 
 # Our server will run on same computer as client #
 SERVER_IP = "127.0.0.1"
 SERVER_PORT = 5678
+PRINT_MESSAGES = True  # Print every sent message (the load generator turns it off)
+
+
+# Stream decoder of every socket, messages that already arrived but not read yet, and sockets in the binary protocol #
+message_decoders = {}
+pending_messages = {}
+binary_sockets   = set()
 
 
 # HELPER SOCKET METHODS #
@@ -19,9 +27,15 @@ def build_and_send_message(socket_connection, cmd, data=""):
 
     Returns: Nothing.
     """
-    full_msg = chatlib.build_message(cmd, data)
-    print("[CLIENT] Client Send : " + full_msg)
-    socket_connection.send(full_msg.encode())
+    if socket_connection in binary_sockets:
+        if PRINT_MESSAGES:
+            print(f'[CLIENT] Client Send : {cmd} {data}')
+        socket_connection.sendall(chatlib.build_binary_message(cmd, data))
+    else:
+        full_msg = chatlib.build_message(cmd, data)
+        if PRINT_MESSAGES:
+            print("[CLIENT] Client Send : " + full_msg)
+        socket_connection.sendall(full_msg.encode())
 
 
 def build_send_recv_parse(socket_connection, cmd, data=""):
@@ -38,17 +52,44 @@ def build_send_recv_parse(socket_connection, cmd, data=""):
     return msg_code, return_data
 
 
+def build_send_recv_batch(socket_connection, commands):
+    """
+    Explanations: Sends some commands in one BATCH message, and receives all the answers in one BATCH_ANSWER message
+    (one round trip instead of one per command).
+
+    Parameters: socket_connection (socket object), commands (list of (cmd, data)).
+
+    Returns: list of (msg_code (str), return_data (str)) - one answer per command, in order.
+    If error occurred, will return None.
+    """
+    msg_code, batch_data = build_send_recv_parse(socket_connection, chatlib.PROTOCOL_CLIENT["batch_msg"], chatlib.build_batch(commands))
+    if msg_code != chatlib.PROTOCOL_SERVER["batch_answer_msg"]:
+        return chatlib.ERROR_RETURN
+
+    return chatlib.parse_batch(batch_data)
+
+
 def recv_message_and_parse(socket_connection):
     """
     Explanations: Receives a new message from given socket, then parses the message using chatlib.
+    The chatlib decoder of the socket keeps partial messages between reads,
+    and messages that arrived together are returned one by one in the next calls.
 
     Parameters: socket_connection (socket object).
 
     Returns: msg_code (str) and data (str) of the received message.
     If error occurred, will return None, None.
     """
-    full_msg = socket_connection.recv(1024).decode()
-    msg_code, data = chatlib.parse_message(full_msg)
+    decoder  = message_decoders.setdefault(socket_connection, chatlib.MessageDecoder())
+    messages = pending_messages.setdefault(socket_connection, collections.deque())
+
+    while not messages:
+        received = socket_connection.recv(chatlib.MAX_MSG_LENGTH)
+        if not received:
+            return chatlib.ERROR_RETURN, chatlib.ERROR_RETURN
+        messages.extend(decoder.feed(received))
+
+    msg_code, data = messages.popleft()
     return msg_code, data
 
 
@@ -63,6 +104,37 @@ def connect():
     return client_socket
 
 
+def forget_socket(socket_connection):
+    """
+    Explanations: Removes the decoder, the pending messages and the protocol of a closed socket.
+
+    Parameters: socket_connection (socket object).
+
+    Returns: Nothing.
+    """
+    message_decoders.pop(socket_connection, None)
+    pending_messages.pop(socket_connection, None)
+    binary_sockets.discard(socket_connection)
+
+
+def negotiate_protocol(socket_connection):
+    """
+    Explanations: Asks the server to switch the connection to the binary protocol (version 2).
+    An old server answers with an error, and the connection stays in the text protocol.
+
+    Parameters: socket_connection (socket object).
+
+    Returns: True if the connection uses the binary protocol.
+    """
+    msg_code, version = build_send_recv_parse(socket_connection, chatlib.PROTOCOL_CLIENT["protocol_msg"], chatlib.BINARY_PROTOCOL_VERSION)
+    if msg_code == chatlib.PROTOCOL_SERVER["protocol_ok_msg"] and version == chatlib.BINARY_PROTOCOL_VERSION:
+        message_decoders[socket_connection] = chatlib.BinaryMessageDecoder()
+        binary_sockets.add(socket_connection)
+        return True
+
+    return False
+
+
 def error_and_exit(error_msg):
     """
     Explanations: Print error message and exit from the program.
@@ -140,6 +212,73 @@ def get_high_score(socket_connection):
         error_and_exit(f'{chatlib.PROTOCOL_CLIENT["high_score_msg"]} Not Works, Because msg_code = {msg_code}')
 
 
+def get_top_scores(socket_connection):
+    """
+    Explanations: Get the users with the highest scores.
+
+    Parameters: socket_connection (socket object).
+
+    Returns: Nothing.
+    """
+    top_count = input("[CLIENT] How Many Top Scores : ")
+    msg_code, top_scores_table = build_send_recv_parse(socket_connection, cmd=chatlib.PROTOCOL_CLIENT["top_scores_msg"], data=top_count)
+
+    if msg_code is not chatlib.ERROR_RETURN and msg_code == chatlib.PROTOCOL_SERVER["all_score_msg"]:
+        print("[CLIENT] Top Scores Table :" + "\n" + top_scores_table)
+    else:
+        print(f'[CLIENT] {chatlib.PROTOCOL_CLIENT["top_scores_msg"]} Not Works, Because : {top_scores_table}')
+
+
+def get_my_rank(socket_connection):
+    """
+    Explanations: Get the rank of the user in the high score table.
+
+    Parameters: socket_connection (socket object).
+
+    Returns: Nothing.
+    """
+    msg_code, my_rank = build_send_recv_parse(socket_connection, cmd=chatlib.PROTOCOL_CLIENT["my_rank_msg"])
+
+    if msg_code is not chatlib.ERROR_RETURN and msg_code == chatlib.PROTOCOL_SERVER["your_rank_msg"]:
+        print(f'[CLIENT] Your Rank is : {my_rank}')
+    else:
+        error_and_exit(f'{chatlib.PROTOCOL_CLIENT["my_rank_msg"]} Not Works, Because msg_code = {msg_code}')
+
+
+def get_stats(socket_connection):
+    """
+    Explanations: Get the metrics of the server (admin users only).
+
+    Parameters: socket_connection (socket object).
+
+    Returns: Nothing.
+    """
+    msg_code, server_stats = build_send_recv_parse(socket_connection, cmd=chatlib.PROTOCOL_CLIENT["stats_msg"])
+
+    if msg_code is not chatlib.ERROR_RETURN and msg_code == chatlib.PROTOCOL_SERVER["stats_answer_msg"]:
+        print("[CLIENT] Server Stats :" + "\n" + server_stats)
+    else:
+        print(f'[CLIENT] {chatlib.PROTOCOL_CLIENT["stats_msg"]} Not Works, Because : {server_stats}')
+
+
+def get_status(socket_connection):
+    """
+    Explanations: Get score, rank and high score table of user, in one batch.
+
+    Parameters: socket_connection (socket object).
+
+    Returns: Nothing.
+    """
+    answers = build_send_recv_batch(socket_connection, [(chatlib.PROTOCOL_CLIENT["my_score_msg"], ""), (chatlib.PROTOCOL_CLIENT["my_rank_msg"], ""), (chatlib.PROTOCOL_CLIENT["high_score_msg"], "")])
+    if answers is chatlib.ERROR_RETURN or len(answers) != 3:
+        error_and_exit(f'{chatlib.PROTOCOL_CLIENT["batch_msg"]} Not Works, Because we didn\'t get answers from the Server ...')
+
+    (_, my_score), (_, my_rank), (_, high_score_table) = answers
+    print(f'[CLIENT] Your Score is : {my_score}')
+    print(f'[CLIENT] Your Rank is : {my_rank}')
+    print("[CLIENT] High Score Table :" + "\n" + high_score_table)
+
+
 def play_question(socket_connection):
     """
     Explanations: Get question from the server, and get an answer also.
@@ -152,10 +291,13 @@ def play_question(socket_connection):
     if msg_code is chatlib.ERROR_RETURN or msg_code == chatlib.PROTOCOL_SERVER["no_questions_msg"]:
         error_and_exit(f'{chatlib.PROTOCOL_CLIENT["get_question_msg"]} Game Over - Not Works, Because we don\'t have questions anymore in the stack ...')
 
-    question_id, question_msg = question_data.split(chatlib.DATA_DELIMITER)
-    print(f'[CLIENT] Question : {question_msg}' + '\n')
+    question_id, question_msg, *answers = question_data.split(chatlib.DATA_DELIMITER)
+    print(f'[CLIENT] Question : {question_msg}')
+    for answer_number, answer in enumerate(answers, start=1):
+        print(f'[CLIENT] {answer_number} - {answer}')
+    print()
 
-    user_answer = input("[CLIENT] Please Enter Your Answer : ")
+    user_answer = input("[CLIENT] Please Enter Your Answer Number : ")
     msg_code, server_answer = build_send_recv_parse(socket_connection, cmd=chatlib.PROTOCOL_CLIENT["send_answer_msg"], data=question_id + chatlib.DATA_DELIMITER + user_answer)
 
     if   msg_code == chatlib.PROTOCOL_SERVER["correct_answer_msg"]:
@@ -188,6 +330,9 @@ def main():
     client_socket = connect()
     print("[CLIENT] Server is Up and Running ...")
 
+    if negotiate_protocol(client_socket):
+        print("[CLIENT] Using the Binary Protocol ...")
+
     login(client_socket)
 
     while True:
@@ -195,7 +340,11 @@ def main():
         print("P          | Play Question    ")
         print("S          | Get My Score     ")
         print("H          | Get High Score   ")
+        print("T          | Get Top Scores   ")
+        print("R          | Get My Rank      ")
+        print("A          | Get All Status   ")
         print("L          | Get Logged Users ")
+        print("X          | Get Server Stats ")
         print("Q          | Quit             ")
         print("==============================")
 
@@ -210,9 +359,21 @@ def main():
         elif user_choice == "H":
             get_high_score(client_socket)
 
+        elif user_choice == "T":
+            get_top_scores(client_socket)
+
+        elif user_choice == "R":
+            get_my_rank(client_socket)
+
+        elif user_choice == "A":
+            get_status(client_socket)
+
         elif user_choice == "L":
             get_logged_users(client_socket)
 
+        elif user_choice == "X":
+            get_stats(client_socket)
+
         elif user_choice == "Q":
             break
 
@@ -0,0 +1,278 @@
+# Imports #
+import os
+import json
+import time
+import socket
+import random
+import argparse
+import threading
+import multiprocessing
+import chatlib
+import client
+
+
+# Load Constants #
+DEFAULT_MIX         = "GET_QUESTION=4,SEND_ANSWER=4,MY_SCORE=2,HIGHSCORE=1,LOGGED=1,LOGIN=0"
+DEFAULT_CREDENTIALS = ["Test#Test"]
+THREAD_STACK_SIZE   = 256 * 1024   # Every simulated player is a thread - a small stack lets one process run thousands of them
+CONNECT_ERROR       = "CONNECT"
+
+
+class Player:
+    """
+    Explanations: One simulated player - a connection to the server that sends commands of the mix, one at a time
+    (sends a command, waits for its answer, then chooses the next one), with the protocol helpers of the client.
+    The latency of every command is recorded in results (cmd ---> {"latencies", "errors"}).
+    """
+
+    def __init__(self, address, credentials, binary, timeout, commands, weights):
+        self.address     = address
+        self.credentials = credentials
+        self.binary      = binary
+        self.timeout     = timeout
+        self.commands    = commands
+        self.weights     = weights
+        self.results     = {}
+        self.connection  = None
+        self.question    = None   # (question ID, number of answers) of the last question, for SEND_ANSWER
+
+    def record(self, cmd, latency, failed):
+        result = self.results.setdefault(cmd, {"latencies": [], "errors": 0})
+        if failed: result["errors"] += 1
+        else:      result["latencies"].append(latency)
+
+    def request(self, cmd, data=""):
+        """
+        Explanations: Sends the command and waits for its answer, and records the latency.
+
+        Returns: msg_code (str), data (str).
+        """
+        start_time     = time.perf_counter()
+        msg_code, data = client.build_send_recv_parse(self.connection, cmd, data)
+        if msg_code is chatlib.ERROR_RETURN:
+            raise ConnectionError(f'{cmd} - the server closed the connection')
+
+        self.record(cmd, time.perf_counter() - start_time, msg_code in (chatlib.PROTOCOL_SERVER["login_failed_msg"], chatlib.PROTOCOL_SERVER["busy_msg"]))
+        return msg_code, data
+
+    def connect(self):
+        self.connection = socket.create_connection(self.address, timeout=self.timeout)
+        if self.binary:
+            client.negotiate_protocol(self.connection)
+        self.request(chatlib.PROTOCOL_CLIENT["login_msg"], self.credentials)
+
+    def close(self):
+        if self.connection is None:
+            return
+
+        try:
+            client.build_and_send_message(self.connection, chatlib.PROTOCOL_CLIENT["logout_msg"])
+        except OSError:
+            pass
+        client.forget_socket(self.connection)
+        self.connection.close()
+        self.connection = None
+        self.question   = None
+
+    def get_question(self):
+        msg_code, question_data = self.request(chatlib.PROTOCOL_CLIENT["get_question_msg"])
+        if msg_code == chatlib.PROTOCOL_SERVER["your_question_msg"]:
+            question_id, question_msg, *answers = question_data.split(chatlib.DATA_DELIMITER)
+            self.question = (question_id, len(answers))
+        else:
+            self.question = None
+
+    def run_command(self, cmd):
+        if cmd == chatlib.PROTOCOL_CLIENT["login_msg"]:
+            self.close()
+            self.connect()
+
+        elif cmd == chatlib.PROTOCOL_CLIENT["get_question_msg"]:
+            self.get_question()
+
+        elif cmd == chatlib.PROTOCOL_CLIENT["send_answer_msg"]:
+            if self.question is None:
+                self.get_question()
+            if self.question is not None:
+                question_id, answers_count = self.question
+                self.question              = None
+                self.request(cmd, question_id + chatlib.DATA_DELIMITER + str(random.randint(1, answers_count)))
+
+        else:
+            self.request(cmd)
+
+    def run(self, start_delay, deadline):
+        """
+        Explanations: Runs the player until the deadline. A broken connection is counted as an error of the command,
+        and the player connects and logs in again.
+
+        Returns: Nothing.
+        """
+        time.sleep(start_delay)
+        while time.time() < deadline:
+            cmd = None
+            try:
+                if self.connection is None:
+                    cmd = CONNECT_ERROR
+                    self.connect()
+                cmd = random.choices(self.commands, self.weights)[0]
+                self.run_command(cmd)
+            except (OSError, ValueError):
+                self.record(cmd, 0, True)
+                self.close()
+                time.sleep(0.1)
+        self.close()
+
+
+def parse_mix(mix_spec):
+    """
+    Explanations: Parses the commands mix - "CMD=weight,CMD=weight,...".
+
+    Returns: commands (list of str), weights (list of float).
+    """
+    commands, weights = [], []
+    for mix_entry in mix_spec.split(","):
+        cmd, _, weight = mix_entry.partition("=")
+        if cmd.strip() not in chatlib.PROTOCOL_CLIENT.values():
+            raise ValueError(f'Unknown command in the mix : {cmd}')
+        if float(weight or 1) > 0:
+            commands.append(cmd.strip())
+            weights.append(float(weight or 1))
+    return commands, weights
+
+
+def merge_results(results, new_results):
+    for cmd, result in new_results.items():
+        merged = results.setdefault(cmd, {"latencies": [], "errors": 0})
+        merged["latencies"].extend(result["latencies"])
+        merged["errors"] += result["errors"]
+
+
+def run_players(args, players_count, deadline, results_queue):
+    """
+    Explanations: Entry point of one load process - runs players_count players in threads, then sends their results.
+
+    Returns: Nothing.
+    """
+    client.PRINT_MESSAGES = False
+    threading.stack_size(THREAD_STACK_SIZE)
+
+    commands, weights = parse_mix(args.mix)
+    players           = [Player((args.host, args.port), args.user[index % len(args.user)], args.binary, args.timeout, commands, weights) for index in range(players_count)]
+    players_threads   = [threading.Thread(target=player.run, args=(random.uniform(0, args.ramp), deadline), daemon=True) for player in players]
+
+    for player_thread in players_threads:
+        player_thread.start()
+    for player_thread in players_threads:
+        player_thread.join()
+
+    results = {}
+    for player in players:
+        merge_results(results, player.results)
+    results_queue.put(results)
+
+
+def percentile(sorted_latencies, q):
+    if not sorted_latencies:
+        return None
+    return sorted_latencies[min(len(sorted_latencies) - 1, int(q * len(sorted_latencies)))]
+
+
+def summarize(results, elapsed):
+    """
+    Explanations: Builds the report of the run - throughput, error rate and latency percentiles (ms), per command and in total.
+
+    Receives: results (dict) - cmd ---> {"latencies", "errors"}, elapsed (float) - seconds.
+
+    Returns: report (dict).
+    """
+    def summarize_latencies(latencies, errors):
+        latencies = sorted(latencies)
+        total     = len(latencies) + errors
+        to_ms     = lambda seconds: None if seconds is None else round(seconds * 1000, 3)
+        return {"count"     : total,
+                "errors"    : errors,
+                "error_rate": round(errors / total, 4) if total else 0,
+                "throughput": round(len(latencies) / elapsed, 1),
+                "mean_ms"   : to_ms(sum(latencies) / len(latencies)) if latencies else None,
+                "p50_ms"    : to_ms(percentile(latencies, 0.50)),
+                "p95_ms"    : to_ms(percentile(latencies, 0.95)),
+                "p99_ms"    : to_ms(percentile(latencies, 0.99))}
+
+    all_latencies = [latency for result in results.values() for latency in result["latencies"]]
+    all_errors    = sum(result["errors"] for result in results.values())
+    return {"elapsed" : round(elapsed, 3),
+            "total"   : summarize_latencies(all_latencies, all_errors),
+            "commands": {cmd: summarize_latencies(result["latencies"], result["errors"]) for cmd, result in sorted(results.items())}}
+
+
+def print_report(report, baseline=None):
+    """
+    Explanations: Prints the report as a table (and the change of the throughput and the p99 from the baseline report).
+
+    Returns: Nothing.
+    """
+    print(f'{"Command":>14} | {"Count":>8} | {"Errors":>6} | {"Ops/s":>9} | {"p50 ms":>8} | {"p95 ms":>8} | {"p99 ms":>8}')
+    rows = list(report["commands"].items()) + [("TOTAL", report["total"])]
+    for cmd, summary in rows:
+        percentiles = " | ".join(f'{summary[key]:>8}' if summary[key] is not None else f'{"-":>8}' for key in ("p50_ms", "p95_ms", "p99_ms"))
+        line        = f'{cmd:>14} | {summary["count"]:>8} | {summary["errors"]:>6} | {summary["throughput"]:>9} | {percentiles}'
+
+        base_summary = (baseline or {}).get("commands", {}).get(cmd) if cmd != "TOTAL" else (baseline or {}).get("total")
+        if base_summary and base_summary["throughput"] and base_summary["p99_ms"] and summary["p99_ms"]:
+            line += f'   (ops/s {(summary["throughput"] / base_summary["throughput"] - 1) * 100:+.1f}%, p99 {(summary["p99_ms"] / base_summary["p99_ms"] - 1) * 100:+.1f}%)'
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Trivia Load Generator - simulated players on the real protocol")
+    parser.add_argument("--host", default=client.SERVER_IP)
+    parser.add_argument("--port", type=int, default=client.SERVER_PORT)
+    parser.add_argument("--players", type=int, default=1000, help="Number of simulated players (connections)")
+    parser.add_argument("--processes", type=int, default=os.cpu_count(), help="Load processes - the players are split between them")
+    parser.add_argument("--duration", type=float, default=30, help="Seconds of load")
+    parser.add_argument("--ramp", type=float, default=5, help="Seconds over which the players connect")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="Weights of the commands, like GET_QUESTION=4,SEND_ANSWER=4,MY_SCORE=2,HIGHSCORE=1,LOGGED=1,LOGIN=1")
+    parser.add_argument("--user", action="append", default=None, help="Credentials of the players, user name#password (repeat for more users)")
+    parser.add_argument("--binary", action="store_true", help="Use the binary protocol (version 2)")
+    parser.add_argument("--timeout", type=float, default=10, help="Seconds to wait for an answer before the command counts as an error")
+    parser.add_argument("--output", default="load_results.json", help="JSON file of the results")
+    parser.add_argument("--baseline", default=None, help="JSON results of a previous run, to compare with")
+    args = parser.parse_args()
+    args.user = args.user or DEFAULT_CREDENTIALS
+    parse_mix(args.mix)
+
+    processes_count = max(1, min(args.processes, args.players))
+    results_queue   = multiprocessing.Queue()
+    start_time      = time.time()
+    deadline        = start_time + args.duration
+    processes       = [multiprocessing.Process(target=run_players, args=(args, args.players // processes_count + (index < args.players % processes_count), deadline, results_queue))
+                       for index in range(processes_count)]
+
+    print(f'[CLIENT] {args.players} Players in {processes_count} Processes, for {args.duration} Seconds ...')
+    for process in processes:
+        process.start()
+
+    results = {}
+    for _ in processes:
+        merge_results(results, results_queue.get())
+    for process in processes:
+        process.join()
+
+    report = summarize(results, time.time() - start_time)
+    report["config"] = {key: value for key, value in vars(args).items() if key not in ("output", "baseline")}
+    report["time"]   = time.strftime("%Y-%m-%d %H:%M:%S")
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, "r") as baseline_file:
+            baseline = json.load(baseline_file)
+    print_report(report, baseline)
+
+    with open(args.output, "w") as output_file:
+        json.dump(report, output_file, indent=4)
+    print(f'[CLIENT] Results Saved to {args.output} ...')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,299 @@
+# Imports #
+import asyncio
+import chatlib
+import threading
+import collections
+
+
+# Our server will run on same computer as client #
+SERVER_IP   = "127.0.0.1"
+SERVER_PORT = 5678
+
+
+class TriviaError(Exception):
+    """
+    Explanations: The server answered a request with an error (or closed the connection) - the message is the data of the answer.
+    """
+
+
+class TriviaClient:
+    """
+    Explanations: Asyncio client of the trivia server - one connection, with async methods for the protocol commands.
+    Requests are pipelined : every request is written at once, without waiting for the answers of the requests before it,
+    and because the server answers the requests of a connection in order, the answers are matched to the requests
+    by order (a queue of futures). Many coroutines can use the same client at the same time.
+
+    Usage :
+    trivia_client = await TriviaClient.connect()
+    await trivia_client.login("Test", "Test")
+    score, question = await asyncio.gather(trivia_client.my_score(), trivia_client.get_question())
+
+    Pushed messages (SCORES_UPDATE, after subscribe_scores) aren't answers of requests - they go to the score_updates queue.
+    """
+
+    def __init__(self, reader, writer):
+        self.reader         = reader
+        self.writer         = writer
+        self.decoder        = chatlib.MessageDecoder()
+        self.binary         = False
+        self.waiting        = collections.deque()   # Futures of the requests that weren't answered yet, in order
+        self.reader_task    = asyncio.get_running_loop().create_task(self.read_answers())
+        self.heartbeat_task = None
+        self.score_updates  = asyncio.Queue()   # Pushed score changes - list of (user_name, score) per SCORES_UPDATE
+        self.last_request   = asyncio.get_running_loop().time()
+
+    @classmethod
+    async def connect(cls, host=SERVER_IP, port=SERVER_PORT, binary=False, heartbeat=None):
+        """
+        Explanations: Connects to the server (and switches to the binary protocol, if wanted and the server supports it).
+        With heartbeat (seconds), a PING is sent whenever the connection had no request for that long,
+        so the server doesn't close an idle connection (keep it below the idle timeout of the server).
+
+        Returns: TriviaClient.
+        """
+        reader, writer = await asyncio.open_connection(host, port)
+        trivia_client  = cls(reader, writer)
+        if binary:
+            await trivia_client.negotiate_protocol()
+        if heartbeat:
+            trivia_client.heartbeat_task = asyncio.get_running_loop().create_task(trivia_client.send_heartbeats(heartbeat))
+        return trivia_client
+
+    async def read_answers(self):
+        """
+        Explanations: Background task - reads the answers of the server, and gives every answer to the oldest waiting request.
+
+        Returns: Nothing.
+        """
+        error = ConnectionError("The server closed the connection")
+        try:
+            while True:
+                received = await self.reader.read(chatlib.MAX_MSG_LENGTH)
+                if not received:
+                    break
+
+                for msg_code, data in self.decoder.feed(received):
+                    if msg_code is chatlib.ERROR_RETURN:
+                        raise ConnectionError("Broken message from the server")
+                    if msg_code == chatlib.PROTOCOL_SERVER["scores_update_msg"]:
+                        self.score_updates.put_nowait(parse_scores_table(data))
+                    elif self.waiting:
+                        future = self.waiting.popleft()
+                        if not future.done():
+                            future.set_result((msg_code, data))
+        except (ConnectionError, OSError) as read_error:
+            error = read_error
+        finally:
+            while self.waiting:
+                future = self.waiting.popleft()
+                if not future.done():
+                    future.set_exception(error)
+
+    def send(self, cmd, data=""):
+        if self.binary:
+            self.writer.write(chatlib.build_binary_message(cmd, data))
+        else:
+            self.writer.write(chatlib.build_message(cmd, data).encode())
+
+    async def request(self, cmd, data=""):
+        """
+        Explanations: Sends a request, and waits for its answer (other requests may be sent meanwhile).
+
+        Returns: msg_code (str), data (str).
+        """
+        if self.reader_task.done():
+            raise ConnectionError("The connection to the server is closed")
+
+        future            = asyncio.get_running_loop().create_future()
+        self.last_request = future.get_loop().time()
+        self.waiting.append(future)
+        self.send(cmd, data)
+        await self.writer.drain()
+        return await future
+
+    async def expect(self, cmd, expected_codes, data=""):
+        """
+        Explanations: Sends a request, and checks that the answer is one of the expected answers.
+
+        Returns: msg_code (str), data (str). Raises TriviaError if the server answered with another answer.
+        """
+        msg_code, answer_data = await self.request(cmd, data)
+        if msg_code not in expected_codes:
+            raise TriviaError(answer_data)
+        return msg_code, answer_data
+
+    async def negotiate_protocol(self):
+        """
+        Explanations: Asks the server to switch to the binary protocol. Should be awaited before other requests are sent.
+
+        Returns: True if the connection uses the binary protocol.
+        """
+        msg_code, version = await self.request(chatlib.PROTOCOL_CLIENT["protocol_msg"], chatlib.BINARY_PROTOCOL_VERSION)
+        if msg_code == chatlib.PROTOCOL_SERVER["protocol_ok_msg"] and version == chatlib.BINARY_PROTOCOL_VERSION:
+            self.decoder = chatlib.BinaryMessageDecoder()
+            self.binary  = True
+        return self.binary
+
+    async def ping(self):
+        await self.expect(chatlib.PROTOCOL_CLIENT["ping_msg"], (chatlib.PROTOCOL_SERVER["pong_msg"],))
+
+    async def send_heartbeats(self, interval):
+        """
+        Explanations: Background task - sends PING when the connection had no request for interval seconds.
+
+        Returns: Nothing.
+        """
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                await asyncio.sleep(self.last_request + interval - loop.time())
+                if loop.time() - self.last_request >= interval:
+                    await self.ping()
+        except (ConnectionError, OSError):
+            pass
+
+    async def login(self, user_name, password):
+        await self.expect(chatlib.PROTOCOL_CLIENT["login_msg"], (chatlib.PROTOCOL_SERVER["login_ok_msg"],), chatlib.join_data([user_name, password]))
+
+    async def get_question(self):
+        """
+        Returns: {"id" (int), "question" (str), "answers" (list of str)}, or None if the user answered all the questions.
+        """
+        msg_code, question_data = await self.expect(chatlib.PROTOCOL_CLIENT["get_question_msg"], (chatlib.PROTOCOL_SERVER["your_question_msg"], chatlib.PROTOCOL_SERVER["no_questions_msg"]))
+        if msg_code == chatlib.PROTOCOL_SERVER["no_questions_msg"]:
+            return None
+
+        question_id, question, *answers = question_data.split(chatlib.DATA_DELIMITER)
+        return {"id": int(question_id), "question": question, "answers": answers}
+
+    async def send_answer(self, question_id, answer_number):
+        """
+        Returns: True if the answer is correct.
+        """
+        msg_code, answer_data = await self.expect(chatlib.PROTOCOL_CLIENT["send_answer_msg"], (chatlib.PROTOCOL_SERVER["correct_answer_msg"], chatlib.PROTOCOL_SERVER["wrong_answer_msg"]),
+                                                  chatlib.join_data([question_id, answer_number]))
+        return msg_code == chatlib.PROTOCOL_SERVER["correct_answer_msg"]
+
+    async def my_score(self):
+        msg_code, score = await self.expect(chatlib.PROTOCOL_CLIENT["my_score_msg"], (chatlib.PROTOCOL_SERVER["your_score_msg"],))
+        return int(score)
+
+    async def my_rank(self):
+        msg_code, rank = await self.expect(chatlib.PROTOCOL_CLIENT["my_rank_msg"], (chatlib.PROTOCOL_SERVER["your_rank_msg"],))
+        return int(rank) if rank.isdigit() else None
+
+    async def high_score(self):
+        """
+        Returns: list of (user_name, score) - from the highest score.
+        """
+        msg_code, scores_table = await self.expect(chatlib.PROTOCOL_CLIENT["high_score_msg"], (chatlib.PROTOCOL_SERVER["all_score_msg"],))
+        return parse_scores_table(scores_table)
+
+    async def top_scores(self, count):
+        msg_code, scores_table = await self.expect(chatlib.PROTOCOL_CLIENT["top_scores_msg"], (chatlib.PROTOCOL_SERVER["all_score_msg"],), str(count))
+        return parse_scores_table(scores_table)
+
+    async def subscribe_scores(self):
+        """
+        Explanations: Subscribes to the score changes - the server pushes the scores that changed from now (see next_score_update).
+
+        Returns: list of (user_name, score) - the whole leaderboard at the time of the subscription.
+        """
+        msg_code, scores_table = await self.expect(chatlib.PROTOCOL_CLIENT["subscribe_msg"], (chatlib.PROTOCOL_SERVER["all_score_msg"],))
+        return parse_scores_table(scores_table)
+
+    async def next_score_update(self):
+        """
+        Returns: list of (user_name, score) - the users that their score changed (new score), from the highest score.
+        """
+        return await self.score_updates.get()
+
+    async def logged_users(self):
+        msg_code, logged_users = await self.expect(chatlib.PROTOCOL_CLIENT["logged_msg"], (chatlib.PROTOCOL_SERVER["logged_answer_msg"],))
+        return logged_users.split(", ") if logged_users else []
+
+    async def close(self):
+        """
+        Explanations: Sends LOGOUT (that has no answer), and closes the connection.
+
+        Returns: Nothing.
+        """
+        if self.heartbeat_task is not None:
+            self.heartbeat_task.cancel()
+        if not self.writer.is_closing():
+            self.send(chatlib.PROTOCOL_CLIENT["logout_msg"])
+            self.writer.close()
+            try:
+                await self.writer.wait_closed()
+            except (ConnectionError, OSError):
+                pass
+        await asyncio.gather(self.reader_task, return_exceptions=True)
+
+
+def parse_scores_table(scores_table):
+    """
+    Explanations: Parses the scores table of the server ("user : score" line for each user).
+
+    Returns: list of (user_name, score).
+    """
+    scores = []
+    for score_line in scores_table.splitlines():
+        user_name, _, score = score_line.rpartition(" : ")
+        scores.append((user_name, int(score)))
+    return scores
+
+
+class SyncTriviaClient:
+    """
+    Explanations: Blocking wrapper of TriviaClient, for code that isn't async. The TriviaClient runs on an asyncio loop
+    in a background thread, and every method waits for its result - so some threads can use one SyncTriviaClient,
+    and their requests are pipelined on the same connection.
+
+    Usage :
+    with SyncTriviaClient() as trivia_client:
+        trivia_client.login("Test", "Test")
+        print(trivia_client.my_score())
+    """
+
+    def __init__(self, host=SERVER_IP, port=SERVER_PORT, binary=False, timeout=None, heartbeat=None):
+        self.timeout     = timeout
+        self.loop        = asyncio.new_event_loop()
+        self.loop_thread = threading.Thread(target=self.loop.run_forever, name="trivia-client", daemon=True)
+        self.loop_thread.start()
+        try:
+            self.client = self.run(TriviaClient.connect(host, port, binary, heartbeat))
+        except BaseException:
+            self.stop_loop()
+            raise
+
+    def run(self, coroutine):
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop).result(self.timeout)
+
+    def __getattr__(self, name):
+        """
+        Explanations: Every async method of TriviaClient (login, get_question, send_answer, my_score, ...) as a blocking method.
+        """
+        if name == "client":
+            raise AttributeError(name)
+
+        method = getattr(self.client, name)
+        if not asyncio.iscoroutinefunction(method):
+            return method
+        return lambda *args, **kwargs: self.run(method(*args, **kwargs))
+
+    def stop_loop(self):
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.loop_thread.join()
+        self.loop.close()
+
+    def close(self):
+        try:
+            self.run(self.client.close())
+        finally:
+            self.stop_loop()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -1,3 +1,6 @@
+import struct
+
+
 # Protocol Constants #
 CMD_FIELD_LENGTH    = 16	                                          # Exact length of cmd field (in bytes)
 LENGTH_FIELD_LENGTH = 4                                               # Exact length of length field (in bytes)
@@ -8,6 +11,18 @@ DELIMITER           = "|"                                             # Delimite
 DATA_DELIMITER      = "#"                                             # Delimiter in the data part of the message
 
 
+# Binary Protocol (Version 2) Constants #
+TEXT_PROTOCOL_VERSION   = "1"
+BINARY_PROTOCOL_VERSION = "2"
+BINARY_HEADER           = struct.Struct(">BI")                        # opcode (1 byte) + data length (4 bytes)
+BINARY_MAX_DATA_LENGTH  = 2 ** 24                                     # Max size of data field in the binary protocol
+
+
+# Multiplexed Protocol Constants - many client sessions over one connection (gateway <---> server) #
+MUX_PROTOCOL_VERSION = "MUX"
+MUX_HEADER           = struct.Struct(">IBI")                          # session id (4 bytes) + opcode (1 byte) + data length (4 bytes)
+
+
 # Protocol Messages #
 PROTOCOL_CLIENT = {
 "login_msg"        : "LOGIN",
@@ -16,7 +31,15 @@ PROTOCOL_CLIENT = {
 "get_question_msg" : "GET_QUESTION",
 "send_answer_msg"  : "SEND_ANSWER",
 "my_score_msg"     : "MY_SCORE",
-"high_score_msg"   : "HIGHSCORE"
+"high_score_msg"   : "HIGHSCORE",
+"top_scores_msg"   : "TOP_SCORES",
+"my_rank_msg"      : "MY_RANK",
+"protocol_msg"     : "PROTOCOL",
+"batch_msg"        : "BATCH",
+"stats_msg"        : "STATS",
+"ping_msg"         : "PING",
+"subscribe_msg"    : "SUBSCRIBE_SCORES",
+"reload_msg"       : "RELOAD"
 }
 
 
@@ -29,10 +52,24 @@ PROTOCOL_SERVER = {
 "your_score_msg"    : "YOUR_SCORE",
 "all_score_msg"     : "ALL_SCORE",
 "login_failed_msg"  : "ERROR",
-"no_questions_msg"  : "NO_QUESTIONS"
+"no_questions_msg"  : "NO_QUESTIONS",
+"your_rank_msg"     : "YOUR_RANK",
+"protocol_ok_msg"   : "PROTOCOL_OK",
+"batch_answer_msg"  : "BATCH_ANSWER",
+"stats_answer_msg"  : "STATS_ANSWER",
+"pong_msg"          : "PONG",
+"busy_msg"          : "BUSY",
+"scores_update_msg" : "SCORES_UPDATE",
+"reload_answer_msg" : "RELOAD_ANSWER"
 }
 
 
+# Opcodes of the binary protocol - client commands from 1, server commands from 128 (new commands are only appended) #
+OPCODES = {cmd: opcode for opcode, cmd in enumerate(PROTOCOL_CLIENT.values(), start=1)}
+OPCODES.update({cmd: opcode for opcode, cmd in enumerate(PROTOCOL_SERVER.values(), start=128)})
+COMMANDS = {opcode: cmd for cmd, opcode in OPCODES.items()}
+
+
 # Other Constants
 ERROR_RETURN = None
 
@@ -41,12 +78,16 @@ def build_message(cmd, data):
 	"""
 	Explanations: Gets command name (str) and data field (str) and creates a valid protocol message.
 
-	Returns: str, or None if error occurred.
+	Returns: str, or None if error occurred (unknown command, or data longer than MAX_DATA_LENGTH bytes).
 	"""
-	if cmd not in PROTOCOL_CLIENT.values():
+	if cmd not in PROTOCOL_CLIENT.values() and cmd not in PROTOCOL_SERVER.values():
 		return ERROR_RETURN
 
-	full_msg = cmd + ((CMD_FIELD_LENGTH - len(cmd)) * ' ') + "|" + str(len(data)).zfill(LENGTH_FIELD_LENGTH) + "|" + data
+	data_length = len(data.encode())
+	if data_length > MAX_DATA_LENGTH:
+		return ERROR_RETURN
+
+	full_msg = cmd + ((CMD_FIELD_LENGTH - len(cmd)) * ' ') + "|" + str(data_length).zfill(LENGTH_FIELD_LENGTH) + "|" + data
 	return full_msg
 
 
@@ -64,7 +105,7 @@ def parse_message(data):
 	msg        = data.split("|")[-1]
 
 	try:
-		if len(msg) != int(msg_length.strip()):
+		if len(msg.encode()) != int(msg_length.strip()):
 			return ERROR_RETURN, ERROR_RETURN
 
 	except (ValueError, TypeError):
@@ -73,6 +114,205 @@ def parse_message(data):
 	return cmd.strip(), msg
 
 
+class MessageDecoder:
+	"""
+	Explanations: Incremental decoder of the stream of one connection.
+	TCP may split one message over some reads, or coalesce some messages into one read,
+	so the decoder keeps the received bytes, and cuts from them only complete messages
+	(header of MSG_HEADER_LENGTH bytes, then the data field by the length field of the header).
+	"""
+
+	def __init__(self):
+		self.buffer = bytearray()
+
+	def feed(self, received):
+		"""
+		Explanations: Adds the received bytes to the buffer, and cuts all the complete messages from it.
+
+		Returns: list of (cmd, data) - zero or more messages. If the stream is broken (bad header / bad encoding),
+		the buffer is dropped and the last message in the list is (None, None).
+		"""
+		self.buffer += received
+		messages = []
+		offset   = 0
+
+		while len(self.buffer) - offset >= MSG_HEADER_LENGTH:
+			header_end   = offset + MSG_HEADER_LENGTH
+			length_field = bytes(self.buffer[offset + CMD_FIELD_LENGTH + 1:header_end - 1])
+			if self.buffer[offset + CMD_FIELD_LENGTH] != ord(DELIMITER) or self.buffer[header_end - 1] != ord(DELIMITER) or not length_field.isdigit():
+				self.buffer.clear()
+				messages.append((ERROR_RETURN, ERROR_RETURN))
+				return messages
+
+			msg_end = header_end + int(length_field)
+			if len(self.buffer) < msg_end:
+				break
+
+			try:
+				cmd = bytes(self.buffer[offset:offset + CMD_FIELD_LENGTH]).decode().strip()
+				msg = bytes(self.buffer[header_end:msg_end]).decode()
+			except UnicodeDecodeError:
+				self.buffer.clear()
+				messages.append((ERROR_RETURN, ERROR_RETURN))
+				return messages
+
+			messages.append((cmd, msg))
+			offset = msg_end
+
+		del self.buffer[:offset]
+		return messages
+
+
+def build_binary_message(cmd, data):
+	"""
+	Explanations: Gets command name (str) and data field (str) and creates a binary protocol message
+	(opcode, length of the data in 4 bytes, then the data in UTF-8).
+
+	Returns: bytes, or None if error occurred.
+	"""
+	opcode = OPCODES.get(cmd)
+	data   = data.encode()
+	if opcode is None or len(data) > BINARY_MAX_DATA_LENGTH:
+		return ERROR_RETURN
+
+	return BINARY_HEADER.pack(opcode, len(data)) + data
+
+
+class BinaryMessageDecoder:
+	"""
+	Explanations: Incremental decoder of the binary protocol stream of one connection (same interface as MessageDecoder).
+	The header is read with struct directly from the buffer, and the data field is decoded from a memoryview of the buffer,
+	so nothing is copied or split on the way.
+	"""
+
+	def __init__(self):
+		self.buffer = bytearray()
+
+	def feed(self, received):
+		"""
+		Explanations: Adds the received bytes to the buffer, and cuts all the complete messages from it.
+
+		Returns: list of (cmd, data) - zero or more messages. If the stream is broken (unknown opcode / too long / bad encoding),
+		the buffer is dropped and the last message in the list is (None, None).
+		"""
+		self.buffer += received
+		messages = []
+		offset   = 0
+
+		with memoryview(self.buffer) as buffer_view:
+			while len(buffer_view) - offset >= BINARY_HEADER.size:
+				opcode, length = BINARY_HEADER.unpack_from(buffer_view, offset)
+				cmd            = COMMANDS.get(opcode)
+				if cmd is None or length > BINARY_MAX_DATA_LENGTH:
+					messages.append((ERROR_RETURN, ERROR_RETURN))
+					offset = len(buffer_view)
+					break
+
+				data_start = offset + BINARY_HEADER.size
+				if len(buffer_view) < data_start + length:
+					break
+
+				try:
+					messages.append((cmd, str(buffer_view[data_start:data_start + length], "utf-8")))
+				except UnicodeDecodeError:
+					messages.append((ERROR_RETURN, ERROR_RETURN))
+					offset = len(buffer_view)
+					break
+
+				offset = data_start + length
+
+		del self.buffer[:offset]
+		return messages
+
+
+def build_mux_message(session_id, cmd, data):
+	"""
+	Explanations: Gets session id (int), command name (str) and data field (str) and creates a multiplexed protocol message
+	(a binary protocol message, tagged with the id of the client session that it belongs to).
+
+	Returns: bytes, or None if error occurred.
+	"""
+	opcode = OPCODES.get(cmd)
+	data   = data.encode()
+	if opcode is None or len(data) > BINARY_MAX_DATA_LENGTH:
+		return ERROR_RETURN
+
+	return MUX_HEADER.pack(session_id, opcode, len(data)) + data
+
+
+class MuxMessageDecoder:
+	"""
+	Explanations: Incremental decoder of a multiplexed protocol stream (same as BinaryMessageDecoder, with the session id tag).
+	"""
+
+	def __init__(self):
+		self.buffer = bytearray()
+
+	def feed(self, received):
+		"""
+		Explanations: Adds the received bytes to the buffer, and cuts all the complete messages from it.
+
+		Returns: list of (session_id, cmd, data) - zero or more messages. If the stream is broken (unknown opcode / too long / bad encoding),
+		the buffer is dropped and the last message in the list is (None, None, None).
+		"""
+		self.buffer += received
+		messages = []
+		offset   = 0
+
+		with memoryview(self.buffer) as buffer_view:
+			while len(buffer_view) - offset >= MUX_HEADER.size:
+				session_id, opcode, length = MUX_HEADER.unpack_from(buffer_view, offset)
+				cmd                        = COMMANDS.get(opcode)
+				if cmd is None or length > BINARY_MAX_DATA_LENGTH:
+					messages.append((ERROR_RETURN, ERROR_RETURN, ERROR_RETURN))
+					offset = len(buffer_view)
+					break
+
+				data_start = offset + MUX_HEADER.size
+				if len(buffer_view) < data_start + length:
+					break
+
+				try:
+					messages.append((session_id, cmd, str(buffer_view[data_start:data_start + length], "utf-8")))
+				except UnicodeDecodeError:
+					messages.append((ERROR_RETURN, ERROR_RETURN, ERROR_RETURN))
+					offset = len(buffer_view)
+					break
+
+				offset = data_start + length
+
+		del self.buffer[:offset]
+		return messages
+
+
+def build_batch(messages):
+	"""
+	Explanations: Gets list of (cmd, data) and creates the data field of a BATCH / BATCH_ANSWER message
+	(the text protocol messages one after the other, in both protocols).
+
+	Returns: str, or None if error occurred.
+	"""
+	full_msgs = [build_message(cmd, data) for cmd, data in messages]
+	if ERROR_RETURN in full_msgs:
+		return ERROR_RETURN
+
+	return "".join(full_msgs)
+
+
+def parse_batch(data):
+	"""
+	Explanations: Cuts the messages from the data field of a BATCH / BATCH_ANSWER message.
+
+	Returns: list of (cmd, data), or None if the data field isn't complete messages.
+	"""
+	decoder  = MessageDecoder()
+	messages = decoder.feed(data.encode())
+	if decoder.buffer or (ERROR_RETURN, ERROR_RETURN) in messages:
+		return ERROR_RETURN
+
+	return messages
+
+
 def split_data(msg, expected_delimeters):
 	"""
 	Explanations: Helper method. gets a string and number of expected fields in it. Splits the string.
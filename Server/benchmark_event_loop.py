@@ -0,0 +1,126 @@
+import time
+import select
+import socket
+import argparse
+import selectors
+import multiprocessing
+
+
+# Global Variables #
+CONNECTIONS_COUNTS = [100, 1000, 10000]
+LOOP_PASSES        = 2000
+FD_SETSIZE         = 1024
+
+
+# IDLE CLIENTS #
+def open_idle_clients(server_address, connections_count, ready_event, stop_event):
+	"""
+	Explanations: Runs in a child process (so the client side descriptors don't count in the server process),
+	opens the wanted number of connections to the server, and keeps them idle until the benchmark ends.
+
+	Receives: server_address (tuple), connections_count (int), ready_event / stop_event (multiprocessing.Event).
+
+	Returns: None.
+	"""
+	clients_sockets = [socket.create_connection(server_address) for _ in range(connections_count)]
+	ready_event.set()
+	stop_event.wait()
+	for client_socket in clients_sockets:
+		client_socket.close()
+
+
+def accept_idle_clients(connections_count):
+	"""
+	Explanations: Opens a listening socket, starts the idle clients process and accepts all its connections.
+
+	Receives: connections_count (int).
+
+	Returns: server_socket (socket object), clients_sockets (list), clients_process (multiprocessing.Process), stop_event.
+	"""
+	server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+	server_socket.bind(("127.0.0.1", 0))
+	server_socket.listen(connections_count)
+
+	ready_event     = multiprocessing.Event()
+	stop_event      = multiprocessing.Event()
+	clients_process = multiprocessing.Process(target=open_idle_clients, args=(server_socket.getsockname(), connections_count, ready_event, stop_event))
+	clients_process.start()
+
+	clients_sockets = []
+	while len(clients_sockets) < connections_count:
+		client_socket, client_address = server_socket.accept()
+		client_socket.setblocking(False)
+		clients_sockets.append(client_socket)
+
+	ready_event.wait()
+	return server_socket, clients_sockets, clients_process, stop_event
+
+
+# LOOP MEASUREMENTS #
+def measure_select_loop(server_socket, clients_sockets, active_socket):
+	"""
+	Explanations: Measures one pass of the old loop - the read list is rebuilt and passed to select.select() every pass.
+
+	Returns: microseconds per pass (float), or None if a descriptor is above FD_SETSIZE.
+	"""
+	if max(client_socket.fileno() for client_socket in clients_sockets + [active_socket]) >= FD_SETSIZE:
+		return None
+
+	start_time = time.perf_counter()
+	for _ in range(LOOP_PASSES):
+		select.select([server_socket] + clients_sockets + [active_socket], [], [], 0)
+	return (time.perf_counter() - start_time) / LOOP_PASSES * 10 ** 6
+
+
+def measure_selector_loop(server_socket, clients_sockets, active_socket):
+	"""
+	Explanations: Measures one pass of the new loop - every socket is registered once in selectors.DefaultSelector.
+
+	Returns: microseconds per pass (float).
+	"""
+	server_selector = selectors.DefaultSelector()
+	server_selector.register(server_socket, selectors.EVENT_READ)
+	server_selector.register(active_socket, selectors.EVENT_READ)
+	for client_socket in clients_sockets:
+		server_selector.register(client_socket, selectors.EVENT_READ)
+
+	start_time = time.perf_counter()
+	for _ in range(LOOP_PASSES):
+		server_selector.select(0)
+	elapsed = time.perf_counter() - start_time
+
+	server_selector.close()
+	return elapsed / LOOP_PASSES * 10 ** 6
+
+
+# MAIN #
+def main():
+	global LOOP_PASSES
+
+	parser = argparse.ArgumentParser(description="Event loop cost with idle connections : select() vs selectors")
+	parser.add_argument("--connections", type=int, nargs="+", default=CONNECTIONS_COUNTS, help="Numbers of idle connections to measure")
+	parser.add_argument("--passes", type=int, default=LOOP_PASSES, help="Loop passes per measurement")
+	args = parser.parse_args()
+	LOOP_PASSES = args.passes
+
+	print(f'{"Connections":>12} | {"select() us/pass":>17} | {selectors.DefaultSelector.__name__ + " us/pass":>24}')
+	for connections_count in args.connections:
+		server_socket, clients_sockets, clients_process, stop_event = accept_idle_clients(connections_count)
+
+		# One socket that is always readable, so every pass returns one event like a busy server #
+		active_socket, peer_socket = socket.socketpair()
+		peer_socket.send(b"x")
+
+		select_cost   = measure_select_loop(server_socket, clients_sockets, active_socket)
+		selector_cost = measure_selector_loop(server_socket, clients_sockets, active_socket)
+		select_text   = "FD_SETSIZE" if select_cost is None else f'{select_cost:.1f}'
+		print(f'{connections_count:>12} | {select_text:>17} | {selector_cost:>24.1f}')
+
+		stop_event.set()
+		clients_process.join()
+		for opened_socket in clients_sockets + [server_socket, active_socket, peer_socket]:
+			opened_socket.close()
+
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,262 @@
+import os
+import asyncio
+import argparse
+import itertools
+import chatlib
+import server_logging
+from server_logging import logger
+
+
+# Gateway Constants #
+GATEWAY_IP           = "127.0.0.1"
+GATEWAY_PORT         = 5679
+SERVER_IP            = "127.0.0.1"
+SERVER_PORT          = 5678
+UPSTREAM_CONNECTIONS = 4
+RECONNECT_DELAY      = 1  # Seconds between reconnects of a broken upstream connection
+PLAYER_BUFFER_LIMIT  = 1024 * 1024  # Bytes of answers that wait for a slow player - more, and the player is dropped
+MUX_SECRET           = os.environ.get("TRIVIA_MUX_SECRET")  # Secret of the gateways (the --mux-secret of the server)
+
+
+class Player:
+	"""
+	Explanations: One client connection of the gateway - the answers of the server are sent to it in its own protocol (text / binary).
+	The answers of all the players of an upstream connection are routed by one coroutine, so it never waits for one player (drain) -
+	a player that doesn't read its answers, until PLAYER_BUFFER_LIMIT bytes wait for it, is dropped.
+	"""
+
+	def __init__(self, session_id, writer):
+		self.session_id = session_id
+		self.writer     = writer
+		self.binary     = False
+
+	def encode(self, cmd, data):
+		if self.binary:
+			return chatlib.build_binary_message(cmd, data)
+		full_msg = chatlib.build_message(cmd, data)
+		return full_msg.encode() if full_msg is not chatlib.ERROR_RETURN else chatlib.ERROR_RETURN
+
+	def send(self, cmd, data=""):
+		if self.writer.is_closing():
+			return
+
+		full_msg = self.encode(cmd, data)
+		if full_msg is chatlib.ERROR_RETURN:
+			logger.error("[GATEWAY] The %s Answer is Too Long for the Protocol of the Player (%d bytes) ...", cmd, len(data.encode()))
+			full_msg = self.encode(chatlib.PROTOCOL_SERVER["login_failed_msg"], f'[SERVER] The answer of {cmd} is too long ...')
+		self.writer.write(full_msg)
+
+		if self.writer.transport.get_write_buffer_size() > PLAYER_BUFFER_LIMIT:
+			logger.warning("[GATEWAY] Player %d Dropped - %d bytes of Answers Wait for it ...", self.session_id, self.writer.transport.get_write_buffer_size())
+			self.writer.transport.abort()
+
+
+class Upstream:
+	"""
+	Explanations: One multiplexed connection from the gateway to the server - the messages of many players go on it,
+	tagged with the session id of the player, and the answers are routed back to the players by the tag.
+	LOGOUT from the server closes the player of its tag (the server closed the session - idle, or the server is full).
+
+	players : session_id ---> Player, of the players on this connection.
+	"""
+
+	def __init__(self, reader, writer):
+		self.reader  = reader
+		self.writer  = writer
+		self.decoder = chatlib.MuxMessageDecoder()
+		self.players = {}
+
+	@classmethod
+	async def connect(cls, host, port, secret):
+		"""
+		Explanations: Connects to the server, and switches the connection to the multiplexed protocol (with the secret of the gateways).
+
+		Returns: Upstream. Raises ConnectionError if the server doesn't accept the multiplexed protocol.
+		"""
+		reader, writer = await asyncio.open_connection(host, port)
+		writer.write(chatlib.build_message(chatlib.PROTOCOL_CLIENT["protocol_msg"], chatlib.MUX_PROTOCOL_VERSION + chatlib.DATA_DELIMITER + secret).encode())
+
+		decoder  = chatlib.MessageDecoder()
+		messages = []
+		while not messages:
+			received = await reader.read(chatlib.MAX_MSG_LENGTH)
+			if not received:
+				raise ConnectionError("The server closed the connection")
+			messages = decoder.feed(received)
+
+		if messages[0] != (chatlib.PROTOCOL_SERVER["protocol_ok_msg"], chatlib.MUX_PROTOCOL_VERSION):
+			writer.close()
+			raise ConnectionError(f'The server doesn\'t support the multiplexed protocol : {messages[0]}')
+		return cls(reader, writer)
+
+	def is_alive(self):
+		return not self.writer.is_closing()
+
+	def send(self, session_id, cmd, data=""):
+		self.writer.write(chatlib.build_mux_message(session_id, cmd, data))
+
+	async def route_answers(self):
+		"""
+		Explanations: Reads the answers of the server, and sends every answer to the player of its tag.
+		When the connection breaks, all the players on it are disconnected.
+
+		Returns: Nothing.
+		"""
+		try:
+			while True:
+				received = await self.reader.read(chatlib.MAX_MSG_LENGTH)
+				if not received:
+					break
+
+				for session_id, cmd, data in self.decoder.feed(received):
+					if cmd is chatlib.ERROR_RETURN:
+						raise ConnectionError("Broken message from the server")
+
+					if cmd == chatlib.PROTOCOL_CLIENT["logout_msg"]:
+						player = self.players.pop(session_id, None)
+						if player is not None:
+							player.writer.close()
+						continue
+
+					player = self.players.get(session_id)
+					if player is not None:
+						player.send(cmd, data)
+		except (ConnectionError, OSError) as read_error:
+			logger.error("[GATEWAY] Upstream Connection Broken : %s", read_error)
+		finally:
+			self.writer.close()
+			for player in list(self.players.values()):
+				player.writer.close()
+			self.players.clear()
+
+
+class Gateway:
+	"""
+	Explanations: Accepts the connections of the players, and multiplexes their sessions over a few upstream
+	connections to the server (every player gets a session id, and stays on one upstream connection).
+	The server handles one connection instead of thousands, and the messages of many players share its reads and writes.
+	"""
+
+	def __init__(self, server_host, server_port, upstreams_count, secret):
+		self.server_host = server_host
+		self.server_port = server_port
+		self.secret      = secret
+		self.upstreams   = [None] * upstreams_count
+		self.session_ids = itertools.count(1)
+
+	async def keep_upstream(self, index):
+		"""
+		Explanations: Keeps upstream connection number index connected - connects again after it breaks.
+
+		Returns: Nothing.
+		"""
+		while True:
+			try:
+				upstream = await Upstream.connect(self.server_host, self.server_port, self.secret)
+			except (ConnectionError, OSError) as connect_error:
+				logger.error("[GATEWAY] Can't Connect to the Server : %s", connect_error)
+			else:
+				logger.info("[GATEWAY] Upstream Connection %d Connected ...", index)
+				self.upstreams[index] = upstream
+				await upstream.route_answers()
+				self.upstreams[index] = None
+			await asyncio.sleep(RECONNECT_DELAY)
+
+	def choose_upstream(self, session_id):
+		alive_upstreams = [upstream for upstream in self.upstreams if upstream is not None and upstream.is_alive()]
+		return alive_upstreams[session_id % len(alive_upstreams)] if alive_upstreams else None
+
+	def handle_protocol_message(self, player, decoder, data):
+		"""
+		Explanations: The protocol negotiation of a player is answered by the gateway (the upstream is always multiplexed).
+
+		Returns: decoder of the player stream.
+		"""
+		if data == chatlib.BINARY_PROTOCOL_VERSION:
+			player.send(chatlib.PROTOCOL_SERVER["protocol_ok_msg"], data)
+			player.binary = True
+			return chatlib.BinaryMessageDecoder()
+
+		if data == chatlib.TEXT_PROTOCOL_VERSION:
+			player.send(chatlib.PROTOCOL_SERVER["protocol_ok_msg"], data)
+		else:
+			player.send(chatlib.PROTOCOL_SERVER["login_failed_msg"], f'[SERVER] The protocol version : {data} - Not Supported ...')
+		return decoder
+
+	async def handle_player(self, reader, writer):
+		"""
+		Explanations: One coroutine per player - forwards the messages of the player to its upstream connection, tagged with its session id.
+		When the player leaves, the server gets LOGOUT of the session.
+
+		Receives: reader (asyncio.StreamReader), writer (asyncio.StreamWriter).
+
+		Returns: None.
+		"""
+		session_id = next(self.session_ids)
+		upstream   = self.choose_upstream(session_id)
+		if upstream is None:
+			writer.close()
+			return
+
+		player                       = Player(session_id, writer)
+		upstream.players[session_id] = player
+		decoder                      = chatlib.MessageDecoder()
+		try:
+			connected = True
+			while connected and upstream.is_alive():
+				received = await reader.read(chatlib.MAX_MSG_LENGTH)
+				for cmd, data in decoder.feed(received) if received else [("", "")]:
+					if cmd == "" or cmd == chatlib.PROTOCOL_CLIENT["logout_msg"] or cmd is chatlib.ERROR_RETURN:
+						connected = False
+						break
+
+					if cmd == chatlib.PROTOCOL_CLIENT["protocol_msg"]:
+						decoder = self.handle_protocol_message(player, decoder, data)
+					else:
+						upstream.send(session_id, cmd, data)
+
+				await upstream.writer.drain()
+		except (ConnectionError, OSError):
+			pass
+		finally:
+			if upstream.players.pop(session_id, None) is not None and upstream.is_alive():
+				upstream.send(session_id, chatlib.PROTOCOL_CLIENT["logout_msg"])
+			writer.close()
+
+	async def serve(self, host, port):
+		for index in range(len(self.upstreams)):
+			asyncio.create_task(self.keep_upstream(index))
+
+		server = await asyncio.start_server(self.handle_player, host, port)
+		logger.info(f'[GATEWAY] Gateway is Up and Running on {host}:{port} ({len(self.upstreams)} Upstream Connections to {self.server_host}:{self.server_port}) ...')
+		async with server:
+			await server.serve_forever()
+
+
+def main():
+	global PLAYER_BUFFER_LIMIT
+
+	parser = argparse.ArgumentParser(description="Trivia Gateway - multiplexes many player connections over a few server connections")
+	parser.add_argument("--host", default=GATEWAY_IP, help="Address that the players connect to")
+	parser.add_argument("--port", type=int, default=GATEWAY_PORT)
+	parser.add_argument("--server-host", default=SERVER_IP)
+	parser.add_argument("--server-port", type=int, default=SERVER_PORT)
+	parser.add_argument("--upstreams", type=int, default=UPSTREAM_CONNECTIONS, help="Number of multiplexed connections to the server")
+	parser.add_argument("--mux-secret", default=MUX_SECRET, help="The --mux-secret of the server (default : $TRIVIA_MUX_SECRET)")
+	parser.add_argument("--player-buffer-limit", type=int, default=PLAYER_BUFFER_LIMIT, help="Bytes of answers that wait for a slow player before it is dropped")
+	parser.add_argument("--log-level", choices=["DEBUG", "INFO", "WARNING", "ERROR"], default=server_logging.DEFAULT_LOG_LEVEL)
+	args = parser.parse_args()
+	if not args.mux_secret:
+		parser.error("the server accepts a gateway only with its secret - set --mux-secret or TRIVIA_MUX_SECRET")
+
+	PLAYER_BUFFER_LIMIT = args.player_buffer_limit
+
+	server_logging.setup_logging(args.log_level)
+	try:
+		asyncio.run(Gateway(args.server_host, args.server_port, max(1, args.upstreams), args.mux_secret).serve(args.host, args.port))
+	finally:
+		server_logging.stop_logging()
+
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,87 @@
+import os
+import threading
+import storage_backends
+from server_logging import logger
+
+
+class TableReloader:
+	"""
+	Explanations: Reloads one ASCII table file (users.txt / questions.txt) by rows - the raw fields of every row of the
+	last load are kept, so a reload parses only the rows that were added or changed, and finds the rows that were removed.
+	Runs in a background thread (not in the server loop) - the server applies the result in its loop.
+
+	rows      : raw key (first field) ---> (fields (tuple), key, value) - the parsed row.
+	signature : (mtime, size) of the file at the last load - the watch mode reloads only when it changes.
+	"""
+
+	def __init__(self, file_path, header_first_field, parse_row):
+		self.file_path          = file_path
+		self.header_first_field = header_first_field
+		self.parse_row          = parse_row
+		self.rows               = {}
+		self.signature          = None
+		self.lock               = threading.Lock()
+
+	def file_signature(self):
+		try:
+			file_stat = os.stat(self.file_path)
+		except OSError:
+			return None
+		return file_stat.st_mtime_ns, file_stat.st_size
+
+	def is_modified(self):
+		return self.file_signature() != self.signature
+
+	def reload(self):
+		"""
+		Explanations: Reads the file, and parses the rows that changed since the last load. A row that can't be parsed
+		(the file is in the middle of an edit) keeps its last value.
+
+		Returns: changed (dict) - key ---> value of the new and changed rows, removed (set) - keys of the removed rows.
+		Raises OSError if the file can't be read.
+		"""
+		with self.lock:
+			return self.read_rows()
+
+	def read_rows(self):
+		signature = self.file_signature()
+		rows      = {}
+		changed   = {}
+		for fields in storage_backends.TextStorage.read_table(self.file_path, self.header_first_field):
+			fields  = tuple(fields)
+			old_row = self.rows.get(fields[0])
+			if old_row is not None and old_row[0] == fields:
+				rows[fields[0]] = old_row
+				continue
+
+			try:
+				key, value = self.parse_row(list(fields))
+			except (ValueError, IndexError) as error:
+				logger.warning(f'[SERVER] Row {fields[0]} of {os.path.basename(self.file_path)} Not Valid : {error} ...')
+				if old_row is not None:
+					rows[fields[0]] = old_row
+				continue
+
+			rows[fields[0]] = (fields, key, value)
+			changed[key]    = value
+
+		removed                   = {old_row[1] for raw_key, old_row in self.rows.items() if raw_key not in rows}
+		self.rows, self.signature = rows, signature
+		return changed, removed
+
+	def save(self, write_file):
+		"""
+		Explanations: Writes the file by the server (write_file) - only if the file wasn't changed since the last load, so rows
+		that were added to the file and weren't reloaded yet aren't overwritten. The written rows are the base of the next reload.
+
+		Receives: write_file (function).
+
+		Returns: True if the file was written.
+		"""
+		with self.lock:
+			if self.is_modified():
+				return False
+
+			write_file()
+			self.read_rows()
+			return True
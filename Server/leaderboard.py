@@ -0,0 +1,72 @@
+import bisect
+
+
+class Leaderboard:
+	"""
+	Explanations: The users ordered by score (highest first). The order is kept on every score change with bisect,
+	instead of sorting all the users on every HIGHSCORE request.
+
+	entries : sorted list of (-score, user_name) - so the highest score is first, and equal scores are ordered by name.
+	scores  : user_name ---> score, to find the entry of a user.
+	"""
+
+	def __init__(self):
+		self.entries = []
+		self.scores  = {}
+
+	def __len__(self):
+		return len(self.entries)
+
+	def load(self, sorted_scores):
+		"""
+		Explanations: Fills an empty leaderboard from scores that are already ordered from the highest (O(U), no sort).
+
+		Receives: sorted_scores (list of (user_name, score)).
+
+		Returns: None.
+		"""
+		self.entries = [(-score, user_name) for user_name, score in sorted_scores]
+		self.scores  = dict(sorted_scores)
+
+	def update(self, user_name, score):
+		"""
+		Explanations: Sets the score of the user - O(log U) search, and one list insert / delete.
+
+		Returns: None.
+		"""
+		self.remove(user_name)
+		bisect.insort(self.entries, (-score, user_name))
+		self.scores[user_name] = score
+
+	def remove(self, user_name):
+		"""
+		Explanations: Removes the user from the leaderboard (if exists).
+
+		Returns: None.
+		"""
+		score = self.scores.pop(user_name, None)
+		if score is not None:
+			del self.entries[bisect.bisect_left(self.entries, (-score, user_name))]
+
+	def top(self, count=None):
+		"""
+		Explanations: The first users of the leaderboard - O(count).
+
+		Receives: count (int) - None for all the users.
+
+		Returns: list of (user_name, score).
+		"""
+		entries = self.entries if count is None else self.entries[:count]
+		return [(user_name, -negative_score) for negative_score, user_name in entries]
+
+	def rank(self, user_name):
+		"""
+		Explanations: The rank of the user - 1 + the number of users with a higher score - O(log U).
+
+		Returns: rank (int), or None if the user isn't in the leaderboard.
+		"""
+		score = self.scores.get(user_name)
+		if score is None:
+			return None
+
+		return bisect.bisect_left(self.entries, (-score,)) + 1
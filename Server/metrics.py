@@ -0,0 +1,198 @@
+import bisect
+import threading
+import http.server
+
+
+# Metrics Constants #
+LATENCY_BUCKETS = [0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5]  # Seconds
+UNKNOWN_COMMAND = "UNKNOWN"
+METRICS_PREFIX  = "trivia_"
+
+
+class Histogram:
+	"""
+	Explanations: Latency histogram with fixed buckets (like a Prometheus histogram) - observe is one bisect and two adds,
+	and the memory doesn't grow with the number of observations.
+
+	counts : number of observations in every bucket (not cumulative), the last one is +Inf.
+	"""
+
+	def __init__(self, buckets=LATENCY_BUCKETS):
+		self.buckets = buckets
+		self.counts  = [0] * (len(buckets) + 1)
+		self.total   = 0.0
+		self.count   = 0
+
+	def observe(self, value):
+		self.counts[bisect.bisect_left(self.buckets, value)] += 1
+		self.total += value
+		self.count += 1
+
+	def quantile(self, q):
+		"""
+		Explanations: Estimates the quantile - the upper bound of the bucket that holds it.
+
+		Receives: q (float) - between 0 and 1.
+
+		Returns: seconds (float), or None if nothing was observed (inf if the quantile is above the last bucket).
+		"""
+		if self.count == 0:
+			return None
+
+		rank       = q * self.count
+		cumulative = 0
+		for bucket, bucket_count in zip(self.buckets + [float("inf")], self.counts):
+			cumulative += bucket_count
+			if cumulative >= rank:
+				return bucket
+		return float("inf")
+
+
+class Metrics:
+	"""
+	Explanations: The metrics of one server process - counters that the server loop updates in place (no locks,
+	only the loop thread writes), and gauges that are computed only when the metrics are rendered.
+
+	requests / errors / latencies : per command (commands that the server doesn't know are counted as UNKNOWN).
+	gauges                        : function that returns {gauge name: value} - called by render.
+	"""
+
+	def __init__(self, commands, gauges=None):
+		self.requests      = {cmd: 0 for cmd in list(commands) + [UNKNOWN_COMMAND]}
+		self.errors        = dict.fromkeys(self.requests, 0)
+		self.latencies     = {cmd: Histogram() for cmd in self.requests}
+		self.error_replies = 0
+		self.bytes_in      = 0
+		self.bytes_out     = 0
+		self.reads         = 0
+		self.writes        = 0
+		self.accepts       = 0
+		self.rejects       = 0
+		self.timeouts      = 0
+		self.rate_limited  = 0
+		self.shed          = 0
+		self.cache_hits    = 0
+		self.cache_misses  = 0
+		self.gauges        = gauges
+
+	def record_command(self, cmd, seconds, failed):
+		"""
+		Explanations: Counts a handled command, its latency, and if it was answered with an error.
+
+		Returns: None.
+		"""
+		if cmd not in self.requests:
+			cmd = UNKNOWN_COMMAND
+		self.requests[cmd] += 1
+		self.latencies[cmd].observe(seconds)
+		if failed:
+			self.errors[cmd] += 1
+
+	def record_error(self, cmd=UNKNOWN_COMMAND):
+		self.errors[cmd if cmd in self.errors else UNKNOWN_COMMAND] += 1
+
+	def record_read(self, received_bytes):
+		self.reads    += 1
+		self.bytes_in += received_bytes
+
+	def record_write(self, sent_bytes):
+		self.writes    += 1
+		self.bytes_out += sent_bytes
+
+	def current_gauges(self):
+		return self.gauges() if self.gauges is not None else {}
+
+	def render_summary(self):
+		"""
+		Explanations: Short text of the metrics, for the STATS command - one line per counter / gauge,
+		and one line per command that was used : count, errors, p50 / p99 latency (ms).
+
+		Returns: str.
+		"""
+		lines = [f'{name} : {value}' for name, value in [("accepts", self.accepts), ("rejects", self.rejects), ("timeouts", self.timeouts),
+															  ("rate_limited", self.rate_limited), ("shed", self.shed),
+															  ("cache_hits", self.cache_hits), ("cache_misses", self.cache_misses), ("reads", self.reads), ("writes", self.writes),
+														  ("bytes_in", self.bytes_in), ("bytes_out", self.bytes_out)]]
+		lines += [f'{name} : {value}' for name, value in self.current_gauges().items()]
+		for cmd, count in list(self.requests.items()):
+			if not count and not self.errors[cmd]:
+				continue
+
+			line = f'{cmd} : count={count} errors={self.errors[cmd]}'
+			if count:
+				line += f' p50={self.latencies[cmd].quantile(0.5) * 1000:g}ms p99={self.latencies[cmd].quantile(0.99) * 1000:g}ms'
+			lines.append(line)
+		return "\n".join(lines)
+
+	def render_prometheus(self):
+		"""
+		Explanations: The metrics in the Prometheus text exposition format.
+
+		Returns: str.
+		"""
+		lines = []
+
+		def add_metric(name, metric_type, help_text, samples):
+			lines.append(f'# HELP {METRICS_PREFIX}{name} {help_text}')
+			lines.append(f'# TYPE {METRICS_PREFIX}{name} {metric_type}')
+			lines.extend(f'{METRICS_PREFIX}{name}{labels} {value}' for labels, value in samples)
+
+		add_metric("accepts_total"  , "counter", "Accepted connections.", [("", self.accepts)])
+		add_metric("rejects_total"  , "counter", "Connections rejected by the max connections limit.", [("", self.rejects)])
+		add_metric("timeouts_total" , "counter", "Connections closed by the idle / read deadlines.", [("", self.timeouts)])
+		add_metric("rate_limited_total", "counter", "Commands answered with BUSY by the rate limit of the session.", [("", self.rate_limited)])
+		add_metric("shed_total"        , "counter", "Commands answered with BUSY in the overload mode.", [("", self.shed)])
+		add_metric("cache_hits_total"  , "counter", "Answers sent from the response cache.", [("", self.cache_hits)])
+		add_metric("cache_misses_total", "counter", "Answers built and stored in the response cache.", [("", self.cache_misses)])
+		add_metric("reads_total"    , "counter", "Socket reads.", [("", self.reads)])
+		add_metric("writes_total"   , "counter", "Socket writes.", [("", self.writes)])
+		add_metric("bytes_in_total" , "counter", "Bytes received from the clients.", [("", self.bytes_in)])
+		add_metric("bytes_out_total", "counter", "Bytes sent to the clients.", [("", self.bytes_out)])
+		for name, value in self.current_gauges().items():
+			add_metric(name, "gauge", name.replace("_", " ").capitalize() + ".", [("", value)])
+
+		add_metric("requests_total", "counter", "Handled commands.", [(f'{{command="{cmd}"}}', count) for cmd, count in list(self.requests.items())])
+		add_metric("errors_total"  , "counter", "Commands answered with an error.", [(f'{{command="{cmd}"}}', count) for cmd, count in list(self.errors.items())])
+
+		samples = []
+		for cmd, latency in list(self.latencies.items()):
+			cumulative = 0
+			for bucket, bucket_count in zip(latency.buckets + ["+Inf"], list(latency.counts)):
+				cumulative += bucket_count
+				samples.append((f'_bucket{{command="{cmd}",le="{bucket}"}}', cumulative))
+			samples.append((f'_sum{{command="{cmd}"}}', latency.total))
+			samples.append((f'_count{{command="{cmd}"}}', latency.count))
+		add_metric("request_seconds", "histogram", "Latency of the commands.", samples)
+
+		return "\n".join(lines) + "\n"
+
+
+def start_metrics_server(metrics, host, port):
+	"""
+	Explanations: Serves the metrics in the Prometheus text format on http://host:port/metrics, in a background thread.
+	The counters are only read there (the loop keeps updating them), so a scrape never stops the server loop.
+
+	Receives: metrics (Metrics), host (str), port (int).
+
+	Returns: http.server.ThreadingHTTPServer.
+	"""
+
+	class MetricsHandler(http.server.BaseHTTPRequestHandler):
+		def do_GET(self):
+			if self.path.split("?")[0] not in ("/", "/metrics"):
+				self.send_error(404)
+				return
+
+			body = metrics.render_prometheus().encode()
+			self.send_response(200)
+			self.send_header("Content-Type", "text/plain; version=0.0.4")
+			self.send_header("Content-Length", str(len(body)))
+			self.end_headers()
+			self.wfile.write(body)
+
+		def log_message(self, *args):
+			pass
+
+	metrics_server = http.server.ThreadingHTTPServer((host, port), MetricsHandler)
+	threading.Thread(target=metrics_server.serve_forever, name="metrics-server", daemon=True).start()
+	return metrics_server
@@ -0,0 +1,135 @@
+import os
+import hmac
+import base64
+import hashlib
+import argparse
+import threading
+import storage_backends
+from concurrent.futures import ThreadPoolExecutor
+
+
+# Password Hash Constants #
+# Stored format : scrypt$n$r$p$salt$hash (salt and hash in base64) - passwords without the prefix are plaintext (not migrated yet)
+HASH_PREFIX        = "scrypt"
+HASH_DELIMITER     = "$"
+SCRYPT_N           = 2 ** 14
+SCRYPT_R           = 8
+SCRYPT_P           = 1
+SALT_LENGTH        = 16
+HASH_LENGTH        = 32
+PASSWORD_WORKERS   = 4     # Threads that verify passwords (hashlib.scrypt releases the GIL, so they run in parallel with the server loop)
+MAX_PENDING_LOGINS = 64    # Max verifications in flight (queued or running) - more logins are refused until some end
+
+
+def hash_password(password, salt=None):
+	"""
+	Explanations: Hashes the password with scrypt and a random salt.
+
+	Receives: password (str), salt (bytes) - None for a new random salt.
+
+	Returns: stored password (str) - "scrypt$n$r$p$salt$hash".
+	"""
+	salt          = os.urandom(SALT_LENGTH) if salt is None else salt
+	password_hash = hashlib.scrypt(password.encode(), salt=salt, n=SCRYPT_N, r=SCRYPT_R, p=SCRYPT_P, dklen=HASH_LENGTH)
+	return HASH_DELIMITER.join([HASH_PREFIX, str(SCRYPT_N), str(SCRYPT_R), str(SCRYPT_P), base64.b64encode(salt).decode(), base64.b64encode(password_hash).decode()])
+
+
+def is_hashed(stored_password):
+	return stored_password.startswith(HASH_PREFIX + HASH_DELIMITER)
+
+
+def verify_password(password, stored_password):
+	"""
+	Explanations: Checks the password against the stored password (scrypt hash, or plaintext of a user that wasn't migrated yet).
+	Slow for a hashed password (on purpose) - the server runs it in the PasswordVerifier threads.
+
+	Receives: password (str), stored_password (str).
+
+	Returns: True if the password is right.
+	"""
+	if not is_hashed(stored_password):
+		return hmac.compare_digest(password.encode(), stored_password.encode())
+
+	try:
+		prefix, n, r, p, salt, stored_hash = stored_password.split(HASH_DELIMITER)
+		stored_hash   = base64.b64decode(stored_hash)
+		password_hash = hashlib.scrypt(password.encode(), salt=base64.b64decode(salt), n=int(n), r=int(r), p=int(p), dklen=len(stored_hash))
+	except ValueError:
+		return False
+
+	return hmac.compare_digest(password_hash, stored_hash)
+
+
+class PasswordVerifier:
+	"""
+	Explanations: Verifies passwords in a bounded pool of threads, so a login storm doesn't freeze the server loop.
+	At most max_pending verifications are in flight - submit refuses more, and the server answers that it is busy.
+	The result is given to a callback in the pool thread (the server hands it over to its loop with call_in_loop).
+	"""
+
+	def __init__(self, workers=PASSWORD_WORKERS, max_pending=MAX_PENDING_LOGINS):
+		self.workers       = workers
+		self.max_pending   = max_pending
+		self.pending_count = 0
+		self.lock          = threading.Lock()
+		self.executor      = None
+
+	def submit(self, password, stored_password, callback, *args):
+		"""
+		Explanations: Starts the verification of the password. When it ends, callback(*args, verified) is called in the pool thread.
+
+		Returns: True if the verification started, False if too many verifications are in flight.
+		"""
+		with self.lock:
+			if self.pending_count >= self.max_pending:
+				return False
+			self.pending_count += 1
+			if self.executor is None:
+				self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="password-verifier")
+
+		self.executor.submit(self.run, password, stored_password, callback, args)
+		return True
+
+	def run(self, password, stored_password, callback, args):
+		try:
+			verified = verify_password(password, stored_password)
+		finally:
+			with self.lock:
+				self.pending_count -= 1
+		callback(*args, verified)
+
+
+def migrate_users(storage):
+	"""
+	Explanations: Hashes all the plaintext passwords of the storage (users that are already hashed are kept as is).
+	Should run while the server is stopped, because the users are saved back to the storage.
+
+	Receives: storage (TextStorage / SQLiteStorage).
+
+	Returns: number of hashed passwords (int).
+	"""
+	users = storage.load_users() or {user_name: storage.load_user(user_name) for user_name, score in storage.load_scores()}
+
+	hashed_count = 0
+	for user_details in users.values():
+		if not is_hashed(user_details["password"]):
+			user_details["password"] = hash_password(user_details["password"])
+			hashed_count += 1
+
+	if hashed_count:
+		storage.save_users(users)
+	return hashed_count
+
+
+def main():
+	parser = argparse.ArgumentParser(description="Hashes the plaintext passwords of the users (scrypt)")
+	parser.add_argument("--storage", choices=["text", "sqlite"], default="text", help="Storage of the users : users.txt in the working directory, or an SQLite database")
+	parser.add_argument("--database", default=None, help="Path of the SQLite database (default : trivia.db in the working directory)")
+	args = parser.parse_args()
+
+	storage = storage_backends.create_storage(args.storage, os.getcwd(), args.database)
+	print(f'Hashed {migrate_users(storage)} Passwords ...')
+
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,185 @@
+import os
+import sys
+import mmap
+import json
+import struct
+import storage_backends
+
+
+# Bank File Format #
+# Header  : magic (4 bytes) | version (u16) | reserved (u16) | count (u32)
+# Index   : count entries, sorted by question ID, every entry : question ID (u64) | offset (u64) | length (u32)
+# Records : every record : correct answer number (u8) | question and answers, UTF-8, separated by FIELD_SEPARATOR
+BANK_MAGIC      = b"QBNK"
+BANK_VERSION    = 1
+HEADER_STRUCT   = struct.Struct("<4sHHI")
+ENTRY_STRUCT    = struct.Struct("<QQI")
+FIELD_SEPARATOR = "\x1f"
+
+
+class MappedQuestionBank:
+	"""
+	Explanations: Questions bank in a memory-mapped bank file. Only the fixed-width index is searched,
+	and a question is decoded from its record when it is requested (by ID, or by position in the index),
+	so the resident memory of the server doesn't grow with the size of the bank.
+	Works like a read-only questions dictionary (questions[question_id], get, in, len).
+	"""
+
+	def __init__(self, bank_path):
+		with open(bank_path, "rb") as bank_file:
+			self.bank_map = mmap.mmap(bank_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+		magic, version, reserved, self.count = HEADER_STRUCT.unpack_from(self.bank_map, 0)
+		if magic != BANK_MAGIC or version != BANK_VERSION:
+			raise ValueError(f'{bank_path} is not a questions bank file (version {BANK_VERSION})')
+
+		self.ids       = BankIds(self)
+		self.positions = BankPositions(self)
+
+	def entry(self, position):
+		"""
+		Returns: (question_id, offset, length) of the given position in the index.
+		"""
+		return ENTRY_STRUCT.unpack_from(self.bank_map, HEADER_STRUCT.size + position * ENTRY_STRUCT.size)
+
+	def find(self, question_id):
+		"""
+		Explanations: Binary search of the question ID in the index - O(log N).
+
+		Returns: position (int), or None.
+		"""
+		low, high = 0, self.count
+		while low < high:
+			middle = (low + high) // 2
+			if self.entry(middle)[0] < question_id: low  = middle + 1
+			else:                                   high = middle
+
+		if low < self.count and self.entry(low)[0] == question_id:
+			return low
+		return None
+
+	def question_at(self, position):
+		"""
+		Explanations: Decodes the question of the given position.
+
+		Returns: {"question", "answers", "correct"}.
+		"""
+		question_id, offset, length = self.entry(position)
+		record                      = self.bank_map[offset:offset + length]
+		question, *answers          = record[1:].decode("utf-8").split(FIELD_SEPARATOR)
+		return {"question": question, "answers": answers, "correct": record[0]}
+
+	def __len__(self):
+		return self.count
+
+	def __contains__(self, question_id):
+		return isinstance(question_id, int) and self.find(question_id) is not None
+
+	def __getitem__(self, question_id):
+		position = self.find(question_id) if isinstance(question_id, int) else None
+		if position is None:
+			raise KeyError(question_id)
+		return self.question_at(position)
+
+	def get(self, question_id, default=None):
+		try:
+			return self[question_id]
+		except KeyError:
+			return default
+
+	def keys(self):
+		return iter(self.ids)
+
+	def close(self):
+		self.bank_map.close()
+
+
+class BankIds:
+	"""
+	Explanations: position ---> question ID view of the bank index (like the question_ids list of the server).
+	"""
+
+	def __init__(self, bank):
+		self.bank = bank
+
+	def __len__(self):
+		return self.bank.count
+
+	def __getitem__(self, position):
+		if not 0 <= position < self.bank.count:
+			raise IndexError(position)
+		return self.bank.entry(position)[0]
+
+
+class BankPositions:
+	"""
+	Explanations: question ID ---> position view of the bank index (like the question_positions dictionary of the server).
+	"""
+
+	def __init__(self, bank):
+		self.bank = bank
+
+	def __contains__(self, question_id):
+		return question_id in self.bank
+
+	def __getitem__(self, question_id):
+		position = self.bank.find(question_id)
+		if position is None:
+			raise KeyError(question_id)
+		return position
+
+
+def write_bank(bank_path, questions):
+	"""
+	Explanations: Writes a questions dictionary to a bank file (temporary file, then replace).
+
+	Receives: bank_path (str), questions (dict) - question ID (int) ---> {"question", "answers", "correct"}.
+
+	Returns: number of questions (int).
+	"""
+	question_ids = sorted(questions.keys())
+	records      = [bytes([questions[question_id]["correct"]]) + FIELD_SEPARATOR.join([questions[question_id]["question"]] + questions[question_id]["answers"]).encode("utf-8") for question_id in question_ids]
+
+	offset = HEADER_STRUCT.size + len(question_ids) * ENTRY_STRUCT.size
+	with open(bank_path + ".tmp", "wb") as bank_file:
+		bank_file.write(HEADER_STRUCT.pack(BANK_MAGIC, BANK_VERSION, 0, len(question_ids)))
+		for question_id, record in zip(question_ids, records):
+			bank_file.write(ENTRY_STRUCT.pack(question_id, offset, len(record)))
+			offset += len(record)
+		for record in records:
+			bank_file.write(record)
+	os.replace(bank_path + ".tmp", bank_path)
+
+	return len(question_ids)
+
+
+def load_source_questions(source_path):
+	"""
+	Explanations: Loads questions for the converter - a questions table file (questions.txt),
+	or the JSON that the web loader saves (questions_cache.json).
+
+	Returns: questions (dict).
+	"""
+	if source_path.endswith(".json"):
+		with open(source_path, "r", encoding="utf-8") as content_to_read:
+			return {int(question_id): question_details for question_id, question_details in json.load(content_to_read).items()}
+
+	text_storage = storage_backends.TextStorage(os.path.dirname(os.path.abspath(source_path)))
+	text_storage.questions_file_path = source_path
+	return text_storage.load_questions()
+
+
+def main():
+	if len(sys.argv) < 3:
+		print(f'Usage : python {os.path.basename(sys.argv[0])} <questions.txt / questions_cache.json> ... <output.qbank>')
+		sys.exit(1)
+
+	questions = {}
+	for source_path in sys.argv[1:-1]:
+		questions.update(load_source_questions(source_path))
+
+	print(f'Wrote {write_bank(sys.argv[-1], questions)} Questions to {sys.argv[-1]} ...')
+
+
+if __name__ == '__main__':
+	main()
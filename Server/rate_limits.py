@@ -0,0 +1,92 @@
+import chatlib
+
+
+# Rate Limits Constants #
+RATE_LIMIT      = 50    # Tokens per second that every session gets (0 - no rate limit)
+RATE_BURST      = 100   # Max tokens of a session (commands that can be sent at once after a quiet time)
+UPSTREAM_RATE   = 5000  # Tokens per second of a multiplexed connection (gateway), for all the sessions on it (0 - no limit)
+UPSTREAM_BURST  = 10000 # Max tokens of a multiplexed connection
+DEFAULT_COST    = 1
+SHED_COST       = 3     # In overload mode, commands that cost at least this are answered with BUSY
+MAX_LOOP_LAG    = 0.2   # Seconds of loop lag that start the overload mode (0 - not checked)
+MAX_QUEUE_BYTES = 8 * 1024 * 1024  # Bytes in the outbound queues that start the overload mode (0 - not checked)
+RECOVER_RATIO   = 0.5   # The overload mode ends when the lag and the queues are below this part of the limits
+
+
+# Cost of the commands in tokens - by the work of the server (HIGHSCORE builds the whole leaderboard, MY_SCORE is one lookup) #
+COMMAND_COSTS = {
+chatlib.PROTOCOL_CLIENT["login_msg"]        : 3,
+chatlib.PROTOCOL_CLIENT["logged_msg"]       : 3,
+chatlib.PROTOCOL_CLIENT["get_question_msg"] : 2,
+chatlib.PROTOCOL_CLIENT["send_answer_msg"]  : 1,
+chatlib.PROTOCOL_CLIENT["my_score_msg"]     : 1,
+chatlib.PROTOCOL_CLIENT["high_score_msg"]   : 5,
+chatlib.PROTOCOL_CLIENT["top_scores_msg"]   : 3,
+chatlib.PROTOCOL_CLIENT["my_rank_msg"]      : 2,
+chatlib.PROTOCOL_CLIENT["batch_msg"]        : 0,  # The commands of the batch are charged one by one
+chatlib.PROTOCOL_CLIENT["stats_msg"]        : 2,
+chatlib.PROTOCOL_CLIENT["ping_msg"]         : 1,
+chatlib.PROTOCOL_CLIENT["subscribe_msg"]    : 5,
+chatlib.PROTOCOL_CLIENT["reload_msg"]       : 5
+}
+
+
+class TokenBucket:
+	"""
+	Explanations: Token bucket of one session - gets rate tokens per second up to burst, and every command takes its cost.
+	The tokens are refilled lazily when a command arrives, so an idle session costs nothing.
+	"""
+	__slots__ = ("rate", "burst", "tokens", "updated")
+
+	def __init__(self, rate, burst, now):
+		self.rate    = rate
+		self.burst   = burst
+		self.tokens  = burst
+		self.updated = now
+
+	def take(self, cost, now):
+		"""
+		Explanations: Takes the cost from the bucket, if it has enough tokens.
+
+		Returns: True if the command is allowed.
+		"""
+		self.tokens  = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+		self.updated = now
+		if self.tokens < cost:
+			return False
+
+		self.tokens -= cost
+		return True
+
+
+class OverloadDetector:
+	"""
+	Explanations: Decides if the server is overloaded - by the loop lag (how late the loop runs a timer) and the bytes
+	in the outbound queues. The mode starts when one of them crosses its limit, and ends only when both are well
+	below the limits (RECOVER_RATIO), so the mode doesn't flap around the limit.
+	"""
+
+	def __init__(self, max_lag=MAX_LOOP_LAG, max_queue_bytes=MAX_QUEUE_BYTES):
+		self.max_lag         = max_lag
+		self.max_queue_bytes = max_queue_bytes
+		self.overloaded      = False
+		self.loop_lag        = 0.0
+		self.queue_bytes     = 0
+
+	def update(self, loop_lag, queue_bytes):
+		"""
+		Explanations: Updates the mode by the current measures.
+
+		Receives: loop_lag (float) - seconds, queue_bytes (int).
+
+		Returns: True if the mode changed.
+		"""
+		self.loop_lag    = loop_lag
+		self.queue_bytes = queue_bytes
+		ratio            = RECOVER_RATIO if self.overloaded else 1
+		overloaded       = bool(self.max_lag and loop_lag > self.max_lag * ratio or self.max_queue_bytes and queue_bytes > self.max_queue_bytes * ratio)
+		changed, self.overloaded = overloaded != self.overloaded, overloaded
+		return changed
+
+	def sheds(self, cmd):
+		return self.overloaded and COMMAND_COSTS.get(cmd, DEFAULT_COST) >= SHED_COST
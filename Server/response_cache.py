@@ -0,0 +1,40 @@
+# Response Cache Constants #
+MAX_ENTRIES = 50000  # The cache is cleared when it is full (the entries are rebuilt on the next requests)
+
+
+class ResponseCache:
+	"""
+	Explanations: Cache of ready to send answers (the encoded message bytes) of the read-only commands.
+	Every entry is tagged with the version of the state that it was built from, and the server bumps the version
+	when the state changes (login / logout ---> "logged", score change ---> "scores" and ("score", user_name)),
+	so an entry is valid while its version is the current one - a hit is one dict lookup, and nothing is invalidated one by one.
+
+	entries  : key ---> (version, full_msg (bytes)).
+	versions : version name ---> counter.
+	"""
+
+	def __init__(self, max_entries=MAX_ENTRIES):
+		self.max_entries = max_entries
+		self.entries     = {}
+		self.versions    = {}
+		self.enabled     = True
+
+	def __len__(self):
+		return len(self.entries)
+
+	def bump(self, version_name):
+		self.versions[version_name] = self.versions.get(version_name, 0) + 1
+
+	def get(self, key, version_name):
+		"""
+		Returns: full_msg (bytes), or None if there is no entry of the current version.
+		"""
+		entry = self.entries.get(key)
+		if entry is not None and entry[0] == self.versions.get(version_name, 0):
+			return entry[1]
+		return None
+
+	def put(self, key, version_name, full_msg):
+		if len(self.entries) >= self.max_entries:
+			self.entries.clear()
+		self.entries[key] = (self.versions.get(version_name, 0), full_msg)
@@ -0,0 +1,155 @@
+import os
+import time
+import threading
+
+
+# Journal Constants #
+JOURNAL_FILE_NAME = "users.journal"
+COMMIT_INTERVAL   = 0.05      # Seconds between group commits (one write + fsync for all the records of the interval)
+COMPACT_INTERVAL  = 5 * 60    # Seconds between compactions of the journal into the users file
+FIELD_DELIMITER   = "\t"
+SCORE_RECORD      = "S"
+QUESTION_RECORD   = "Q"
+
+
+class ScoreJournal:
+	"""
+	Explanations: Append-only journal of the users changes (scores and questions asked), so the progress of the players
+	survives a restart of the server. Recording a change only appends a line to a list in memory - a background thread
+	writes all the lines of the last COMMIT_INTERVAL with one write and one fsync (group commit),
+	and every COMPACT_INTERVAL folds the journal back into the users file and truncates it (only if something was recorded,
+	and if save_users didn't refuse to write the file - then the journal is kept for the next compaction).
+
+	Records (one per line) :
+	S <TAB> user_name <TAB> score        - the new score of the user (absolute, so replaying twice is safe).
+	Q <TAB> user_name <TAB> question_id  - the user was asked the question.
+	"""
+
+	def __init__(self, path, users, save_users, commit_interval=COMMIT_INTERVAL, compact_interval=COMPACT_INTERVAL):
+		self.path             = path
+		self.users            = users
+		self.save_users       = save_users
+		self.commit_interval  = commit_interval
+		self.compact_interval = compact_interval
+		self.pending          = []
+		self.uncompacted      = 0
+		self.pending_lock     = threading.Lock()
+		self.file_lock        = threading.Lock()
+		self.stop_event       = threading.Event()
+		self.journal_file     = open(path, "a", encoding="utf-8")
+		self.commit_thread    = threading.Thread(target=self.run, name="score-journal", daemon=True)
+		self.commit_thread.start()
+
+	def record_score(self, user_name, score):
+		with self.pending_lock:
+			self.pending.append(f'{SCORE_RECORD}{FIELD_DELIMITER}{user_name}{FIELD_DELIMITER}{score}\n')
+
+	def record_question(self, user_name, question_id):
+		with self.pending_lock:
+			self.pending.append(f'{QUESTION_RECORD}{FIELD_DELIMITER}{user_name}{FIELD_DELIMITER}{question_id}\n')
+
+	def commit(self):
+		"""
+		Explanations: Writes all the pending records to the journal file, with one fsync.
+
+		Returns: None.
+		"""
+		with self.file_lock:
+			with self.pending_lock:
+				records, self.pending = self.pending, []
+
+			if records:
+				self.journal_file.write("".join(records))
+				self.journal_file.flush()
+				os.fsync(self.journal_file.fileno())
+				self.uncompacted += len(records)
+
+	def compact(self):
+		"""
+		Explanations: Folds the journal into the users file - commits the pending records, saves a snapshot of the users,
+		then truncates the journal. Changes that are recorded during the compaction are written to the new journal
+		(they may be also in the snapshot, and that is fine, because replaying a record twice gives the same result).
+
+		Returns: None.
+		"""
+		with self.file_lock:
+			with self.pending_lock:
+				records, self.pending = self.pending, []
+
+			if records:
+				self.journal_file.write("".join(records))
+				self.journal_file.flush()
+				self.uncompacted += len(records)
+
+			if not self.uncompacted or self.save_users(self.users.snapshot()) is False:
+				return
+
+			self.uncompacted = 0
+			self.journal_file.truncate(0)
+			self.journal_file.flush()
+			os.fsync(self.journal_file.fileno())
+
+	def run(self):
+		last_compact_time = time.monotonic()
+		while not self.stop_event.wait(self.commit_interval):
+			self.commit()
+			if time.monotonic() - last_compact_time >= self.compact_interval:
+				self.compact()
+				last_compact_time = time.monotonic()
+
+	def close(self):
+		"""
+		Explanations: Stops the background thread, and commits the last records.
+
+		Returns: None.
+		"""
+		self.stop_event.set()
+		self.commit_thread.join()
+		self.commit()
+		self.journal_file.close()
+
+
+def replay_journal(path, users):
+	"""
+	Explanations: Applies the records of the journal on the users that were loaded from the users file.
+	A broken last line (the server crashed in the middle of a write), and a record that isn't valid, are ignored.
+
+	Receives: path (str), users (UserTable).
+
+	Returns: number of replayed records (int).
+	"""
+	if not os.path.exists(path):
+		return 0
+
+	changed_users = {}
+	asked_ids     = {}
+	records_count = 0
+	with open(path, "r", encoding="utf-8") as journal_file:
+		for line in journal_file:
+			if not line.endswith("\n"):
+				break
+
+			record_fields = line[:-1].split(FIELD_DELIMITER)
+			if len(record_fields) != 3 or record_fields[1] not in users:
+				continue
+
+			record_type, user_name, value = record_fields
+			try:
+				value = int(value)
+			except ValueError:
+				continue
+
+			user_details = changed_users.setdefault(user_name, users[user_name])
+			if record_type == SCORE_RECORD:
+				user_details["score"] = value
+			elif record_type == QUESTION_RECORD:
+				user_asked_ids = asked_ids.setdefault(user_name, set(user_details["questions_asked"]))
+				if value not in user_asked_ids:
+					user_asked_ids.add(value)
+					user_details["questions_asked"].append(value)
+			records_count += 1
+
+	for user_name, user_details in changed_users.items():
+		users[user_name] = user_details
+
+	return records_count
@@ -1,66 +1,316 @@
 import os
-import copy
+import json
+import zlib
 import base64
-import select
+import time
+import hmac
 import socket
 import random
+import asyncio
+import argparse
+import threading
+import selectors
+import collections
 import chatlib
+import metrics
+import sessions
 import requests
+import passwords
+import shared_state
+import question_bank
+import score_journal
+import storage_backends
+import server_logging
+import timer_wheel
+import rate_limits
+import response_cache
+import hot_reload
+import multiprocessing
+from server_logging import logger, wire_trace
 
 
 # Global Variables #
-users        	     = {}
+users        	     = shared_state.UserTable()
 questions    	     = {}
-logged_users 	     = {}
-messages_to_send     = []
+logged_users 	     = shared_state.LoggedUsers()
+client_sessions      = sessions.SessionTable()
+password_verifier    = passwords.PasswordVerifier()
+server_metrics       = metrics.Metrics(chatlib.PROTOCOL_CLIENT.values(), gauges=lambda: server_gauges())
+question_ids         = []
+question_positions   = {}
+question_decks       = {}
+outgoing_messages    = {}
+pending_sockets      = set()
+write_blocked        = set()  # Sockets that their kernel buffer is full - flushed again only when the selector says they are writable
+write_watched        = set()
+loop_callbacks       = collections.deque()
+loop_callbacks_lock  = threading.Lock()  # The check of running_loop and the queue of a callback are one step, against the start of the asyncio loop
+wakeup_sockets       = None
+running_loop         = None
+expire_connection    = None  # Function of the running engine that closes a connection (for the deadlines)
+overload_detector    = rate_limits.OverloadDetector()
+overload_timer       = None
+score_subscribers    = set()
+score_changes        = {}
+push_timer           = None
+changes_position     = None  # With --workers N - position of the last pull in the score changes of the state owner process, else None
+questions_bank       = None  # With --workers N - proxy of the questions bank that the refresher of the parent process publishes, else None
+questions_version    = 0     # Version of the last questions bank that the worker pulled
+answers_cache        = response_cache.ResponseCache()
+questions_reloader   = None
+users_reloader       = None
+reload_lock          = threading.Lock()  # A reload is parsed and handed to the loop as one step, so the reloads are installed in order
 ERROR_MSG    	     = "Error !"
 SERVER_PORT  	     = 5678
 SERVER_IP    	     = "127.0.0.1"
 CORRECT_ANSWER_POINT = 5
+ADMIN_USERS          = {"master"}  # Users that can send the admin commands (STATS, RELOAD)
+METRICS_HOST         = "127.0.0.1"
+METRICS_PORT         = 0           # Port of the Prometheus metrics endpoint (0 - no endpoint)
+IDLE_TIMEOUT         = 15 * 60     # Seconds without a complete message before a connection is closed (0 - no idle deadline)
+READ_TIMEOUT         = 30          # Seconds to complete a message that was started (0 - no read deadline)
+MAX_CONNECTIONS      = 0           # Max connected clients, the sessions of a gateway included - more are rejected (0 - no limit)
+MAX_CHANNELS         = 10000       # Max client sessions on one multiplexed connection (gateway) - more are rejected
+MUX_SECRET           = os.environ.get("TRIVIA_MUX_SECRET")  # Secret of the gateways - PROTOCOL MUX without it is not accepted (None - no gateways)
+TIMER_TICK           = 0.25        # Seconds per tick of the deadlines timer wheel
+deadline_timers      = timer_wheel.TimerWheel(TIMER_TICK, time.monotonic())
+RATE_LIMIT           = rate_limits.RATE_LIMIT
+RATE_BURST           = rate_limits.RATE_BURST
+UPSTREAM_RATE        = rate_limits.UPSTREAM_RATE
+OVERLOAD_CHECK       = 0.5         # Seconds between checks of the loop lag and the outbound queues
+PUSH_INTERVAL        = 0.25        # Seconds that score changes are coalesced before they are pushed to the subscribers
+storage              = storage_backends.TextStorage(os.getcwd())
+QUESTIONS_URL        = "https://opentdb.com/api.php?amount=50&difficulty=easy&type=multiple&encode=base64"
+QUESTIONS_CACHE_FILE = "questions_cache.json"
+QUESTIONS_REFRESH    = 60 * 60  # Seconds between refreshes of the questions bank from the web (0 - no refresh)
+QUESTIONS_PULL       = 1.0      # With --workers N - seconds between pulls of the refreshed questions bank by the workers
 
 
 # HELPER SOCKET METHODS #
 def build_and_send_message(socket_connection, cmd, data=""):
 	"""
 	Explanations: Builds a new message using chatlib, wanted cmd and message.
-	Prints debug info, then sends it to the given socket.
+	Prints debug info, then queues it in the outgoing buffer of the given socket.
+	The buffer is sent later by send_pending_messages (non-blocking, so a slow client doesn't stall the others).
 
 	Parameters: socket_connection (socket object), cmd (str), data (str).
 
 	Returns: Nothing.
 	"""
-	global messages_to_send
+	global outgoing_messages
+	global pending_sockets
+
+	if cmd == chatlib.PROTOCOL_SERVER["login_failed_msg"]:
+		server_metrics.error_replies += 1
+
+	session = client_sessions.get(socket_connection)
+	if session is not None and session.batch_replies is not None:
+		session.batch_replies.append((cmd, data))
+		return
+
+	if isinstance(socket_connection, sessions.MuxChannel):
+		full_msg = chatlib.build_mux_message(socket_connection.session_id, cmd, data)
+	else:
+		full_msg = encode_message(session, cmd, data)
+	if full_msg is chatlib.ERROR_RETURN:
+		logger.error("[SERVER] The %s Answer is Too Long for the Protocol (%d bytes) ...", cmd, len(data.encode()))
+		build_and_send_message(socket_connection, chatlib.PROTOCOL_SERVER["login_failed_msg"], f'[SERVER] The answer of {cmd} is too long ...')
+		return
+	if wire_trace.enabled:
+		wire_trace.log("SERVER", cmd, data)
+
+	queue_message(socket_connection.upstream if isinstance(socket_connection, sessions.MuxChannel) else socket_connection, full_msg)
+
+
+def encode_message(session, cmd, data):
+	"""
+	Explanations: Builds the message in the protocol of the session (text, or binary after negotiation).
+
+	Returns: full_msg (bytes), or None if error occurred (see chatlib.build_message).
+	"""
+	if session is not None and session.binary:
+		return chatlib.build_binary_message(cmd, data)
 
 	full_msg = chatlib.build_message(cmd, data)
-	print("[SERVER] ", full_msg)
+	return full_msg.encode() if full_msg is not chatlib.ERROR_RETURN else chatlib.ERROR_RETURN
+
+
+def answer_data_limit(socket_connection):
+	"""
+	Explanations: The max size of the data of an answer on the connection - MAX_DATA_LENGTH in the text protocol,
+	in a batch (the answers of a batch are text messages) and on a multiplexed session (the gateway may send it to a text client).
+
+	Receives: socket_connection (socket object, or MuxChannel).
+
+	Returns: max length in bytes (int).
+	"""
+	session = client_sessions.get(socket_connection)
+	if session.binary and session.batch_replies is None and not isinstance(socket_connection, sessions.MuxChannel):
+		return chatlib.BINARY_MAX_DATA_LENGTH
+	return chatlib.MAX_DATA_LENGTH
+
+
+def join_within(parts, separator, max_length):
+	"""
+	Explanations: Joins the parts of an answer (lines of a table, names) - only the first parts that fit in max_length bytes,
+	so a big table (HIGHSCORE / LOGGED of thousands of users) is cut at a whole part, instead of breaking the message.
+
+	Receives: parts (iterable of str), separator (str), max_length (int).
+
+	Returns: data (str).
+	"""
+	fitting, length = [], -len(separator.encode())
+	for part in parts:
+		length += len(separator.encode()) + len(part.encode())
+		if length > max_length:
+			break
+		fitting.append(part)
+	return separator.join(fitting)
+
+
+def send_cached_message(socket_connection, key, version_name, cmd, build_data):
+	"""
+	Explanations: Sends the answer of a read-only command from the response cache - the encoded message is built
+	(by build_data and the protocol of the session) only if the cache has no entry of the current version of the state.
+	Answers in a batch, of a multiplexed session or while the wire is traced are built as usual.
+
+	Parameters: socket_connection (socket object), key (tuple) - command and parameters, version_name - version of the state
+	that the answer depends on, cmd (str), build_data (function) - returns the data of the answer.
+
+	Returns: Nothing.
+	"""
+	session = client_sessions.get(socket_connection)
+	if not answers_cache.enabled or wire_trace.enabled or session.batch_replies is not None or isinstance(socket_connection, sessions.MuxChannel):
+		build_and_send_message(socket_connection, cmd, build_data())
+		return
+
+	cache_key = (key, session.binary)
+	full_msg  = answers_cache.get(cache_key, version_name)
+	if full_msg is None:
+		server_metrics.cache_misses += 1
+		data     = build_data()
+		full_msg = encode_message(session, cmd, data)
+		if full_msg is chatlib.ERROR_RETURN:
+			build_and_send_message(socket_connection, cmd, data)
+			return
+		answers_cache.put(cache_key, version_name, full_msg)
+	else:
+		server_metrics.cache_hits += 1
 
+	queue_message(socket_connection, full_msg)
+
+
+def queue_message(socket_connection, full_msg):
+	"""
+	Explanations: Queues an already built message in the outgoing buffer of the socket.
+
+	Parameters: socket_connection (socket object), full_msg (bytes).
+
+	Returns: Nothing.
+	"""
+	global outgoing_messages
+	global pending_sockets
+
+	outgoing_messages.setdefault(socket_connection, bytearray()).extend(full_msg)
+	pending_sockets.add(socket_connection)
+
+
+def send_pending_messages():
+	"""
+	Explanations: Sends the outgoing buffers of all the sockets that have pending data.
+	Every socket sends as much as it can without blocking (send() may take only a part of the buffer),
+	and the rest stays in its buffer. A socket that couldn't send all its buffer is write blocked - it is skipped
+	until the selector says it is writable (see update_write_interest), so a stalled client costs no send() per loop pass.
+
+	Returns: list of the sockets that failed to send (the connection is broken, and should be cleaned).
+	"""
+	global outgoing_messages
+	global pending_sockets
+	global write_blocked
+
+	broken_sockets = []
+	for socket_connection in list(pending_sockets - write_blocked if write_blocked else pending_sockets):
+		buffer = outgoing_messages[socket_connection]
+		try:
+			sent = socket_connection.send(buffer)
+		except BlockingIOError:
+			write_blocked.add(socket_connection)
+			continue
+		except OSError:
+			broken_sockets.append(socket_connection)
+			continue
+
+		server_metrics.record_write(sent)
+		del buffer[:sent]
+		if not buffer:
+			pending_sockets.discard(socket_connection)
+		else:
+			write_blocked.add(socket_connection)
+
+	return broken_sockets
+
+
+def drop_pending_messages(socket_connection):
 	"""
-	Explanations ===>
-	For One Client       : socket_connection.send(full_msg.encode())
-	For Multiple Clients : messages_to_send.append((socket_connection.getpeername(), data))
+	Explanations: Removes the outgoing buffer of a closed socket.
+
+	Parameters: socket_connection (socket object).
+
+	Returns: Nothing.
 	"""
-	messages_to_send.append((socket_connection, data))
+	global outgoing_messages
+	global pending_sockets
+	global write_blocked
+
+	outgoing_messages.pop(socket_connection, None)
+	pending_sockets.discard(socket_connection)
+	write_blocked.discard(socket_connection)
 
 
-def recv_message_and_parse(socket_connection):
+def recv_messages_and_parse(socket_connection):
 	"""
-	Explanations: Receives a new message from given socket, then parses the message using chatlib.
+	Explanations: Receives new data from given socket, then cuts from it all the complete messages
+	using the chatlib decoder of this socket (one read may hold a part of a message, or some pipelined messages).
 
 	Parameters: socket_connection (socket object).
 
-	Returns: msg_code (str) and data (str) of the received message.
-	If error occurred, will return None, None.
+	Returns: list of (msg_code (str), data (str)) - may be empty, if the message is not complete yet.
+	If the client closed the connection, will return [("", "")]. If error occurred, the last message is (None, None).
+	"""
+	return parse_received_data(socket_connection, socket_connection.recv(chatlib.MAX_MSG_LENGTH))
+
+
+def parse_received_data(socket_connection, received):
+	"""
+	Explanations: Feeds the received data to the decoder of the session (text protocol, or binary / multiplexed protocol after negotiation).
+
+	Parameters: socket_connection (socket object), received (bytes).
+
+	Returns: list of (msg_code (str), data (str)), same as recv_messages_and_parse.
+	For a multiplexed connection - list of (session_id (int), msg_code (str), data (str)), see handle_mux_messages.
 	"""
-	full_msg = socket_connection.recv(1024).decode()
-	print("[CLIENT] ", full_msg)
-	msg_code, data = chatlib.parse_message(full_msg)
-	return msg_code, data
+	global client_sessions
+
+	session = client_sessions.get(socket_connection)
+	server_metrics.record_read(len(received))
+	if not received:
+		return [("", "")] if session.channels is None else [(None, "", "")]
+
+	messages = session.decoder.feed(received)
+	update_read_deadline(session, bool(messages))
+	if messages and messages[-1][-1] is chatlib.ERROR_RETURN:
+		server_metrics.record_error()
+	if wire_trace.enabled:
+		for message in messages:
+			wire_trace.log("CLIENT", message[-2], message[-1])
+	return messages
+
 	
 
 # DATA LOADERS #
 def load_questions():
 	"""
-	Explanations: Loads questions bank from file.
+	Explanations: Loads questions bank from the storage (questions.txt, or the SQLite database).
 
 	Example :
 	questions = {
@@ -68,25 +318,20 @@ def load_questions():
 					4122 : {"question": "What is the capital of France ?", "answers": ["Lion", "Marseille", "Paris", "Montpelier"], "correct": 3}
 				}
 
+	The question ID is int, and "correct" is the number of the correct answer (1 - len(answers)).
+
 	Returns: questions dictionary.
 	"""
 	global questions
 
-	with open(os.path.join(os.getcwd(), "questions.txt"), 'r') as content_to_read:
-		for line_to_read in content_to_read:
-			if line_to_read.count("|") == 5:
-				question_fields = [question_field.strip() for question_field in line_to_read.split("|")[1:-1]]
-				if "Question ID" == question_fields[0]: continue
-				question_id, question, answers, correct_answer = question_fields
-				answers = [int(answer.strip()) for answer in answers.split(",")]
-				questions[question_id] = {"question": question, "answers": answers, "correct": correct_answer}
-
+	questions.update(storage.load_questions())
+	index_questions()
 	return questions
 
 
 def load_user_database():
 	"""
-	Explanations: Loads users list from file.
+	Explanations: Loads users list from the storage (users.txt, or the SQLite database - lazily, user by user).
 
 	Example :
 	users = {
@@ -99,22 +344,54 @@ def load_user_database():
 	"""
 	global users
 
-	with open(os.path.join(os.getcwd(), "users.txt"), 'r') as content_to_read:
-		for line_to_read in content_to_read:
-			if line_to_read.count("|") == 5:
-				user_fields = [user_field.strip() for user_field in line_to_read.split("|")[1:-1]]
-				if "User Name" == user_fields[0]: continue
-				user_name, password, score, questions_asked = user_fields
-				if questions_asked == "-": questions_asked = []
-				else:                      questions_asked = questions_asked.split(",")
-				users[user_name] = {"password": password, "score": int(score), "questions_asked": questions_asked}
-
+	users.attach_storage(storage)
+	users.update(storage.load_users())
 	return users
 
 
-def load_questions_from_web():
+def save_user_database(users_to_save):
 	"""
-	Explanations: Get questions from Web Page.
+	Explanations: Saves the users to the storage (the journal compaction calls it). With hot reload, users.txt is written
+	only if it wasn't changed since the last reload - else the rows that were added to the file would be lost,
+	so the save waits for RELOAD (or the watch mode) to load them, and the journal keeps the changes meanwhile.
+
+	Receives: users_to_save (dict).
+
+	Returns: False if the users were not saved.
+	"""
+	if users_reloader is None:
+		storage.save_users(users_to_save)
+	elif not users_reloader.save(lambda: storage.save_users(users_to_save)):
+		logger.warning("[SERVER] users.txt Was Changed and Not Reloaded yet - the Journal Compaction Waits for RELOAD ...")
+		return False
+
+
+def fetch_questions_from_web(url):
+	"""
+	Explanations: Get questions from Web Page (opentdb format, base64 encoded), without touching the questions bank of the server.
+	The question ID is a checksum of the question text, so the same question keeps its ID between refreshes
+	(and the questions_asked of the users stay correct).
+
+	Receives: url (str).
+
+	Returns: questions (dict).
+	"""
+	web_response = requests.get(url, timeout=10)
+	web_text     = web_response.json()
+
+	web_questions = {}
+	for web_question in web_text['results']:
+		question       = base64.b64decode(web_question["question"]).decode('utf-8')
+		answers        = [base64.b64decode(web_question["correct_answer"]).decode('utf-8')] + [base64.b64decode(incorrect_answers).decode('utf-8') for incorrect_answers in web_question["incorrect_answers"]]
+		correct_answer = base64.b64decode(web_question["correct_answer"]).decode('utf-8')
+		web_questions[zlib.crc32(question.encode())] = {"question": question, "answers": answers, "correct": answers.index(correct_answer) + 1}
+
+	return web_questions
+
+
+def load_questions_from_web(url=None):
+	"""
+	Explanations: Get questions from Web Page, and adds them to the questions bank.
 
 	Example :
 	questions = {
@@ -122,342 +399,1760 @@ def load_questions_from_web():
 					4122 : {"question": "What is the capital of France ?", "answers": ["Lion", "Marseille", "Paris", "Montpelier"], "correct": 3}
 				}
 
+	Receives: url (str) - default QUESTIONS_URL.
+
 	Returns: questions (dict).
 	"""
 	global questions
 
-	web_response = requests.get("https://opentdb.com/api.php?amount=50&difficulty=easy&type=multiple&encode=base64")
-	web_text     = web_response.json()
-	for idx, web_question in enumerate(web_text['results'], start=1):
-		question       = base64.b64decode(web_question["question"]).decode('utf-8')
-		answers        = [base64.b64decode(web_question["correct_answer"]).decode('utf-8')] + [base64.b64decode(incorrect_answers).decode('utf-8') for incorrect_answers in web_question["incorrect_answers"]]
-		correct_answer = base64.b64decode(web_question["correct_answer"]).decode('utf-8')
-		questions[idx] = {"question": question, "answers": answers, "correct": correct_answer}
-
+	questions.update(fetch_questions_from_web(url or QUESTIONS_URL))
+	index_questions()
 	return questions
 
 
-# SOCKET CREATOR #
-def setup_socket():
+def load_questions_cache():
 	"""
-	Explanations: Creates new listening socket and returns it.
+	Explanations: Loads the questions bank that the last refresh saved in the local cache file.
 
-	Returns: The socket object.
+	Returns: questions (dict), or None if there is no valid cache.
 	"""
-	server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-	server_socket.bind((SERVER_IP, SERVER_PORT))
-	server_socket.listen()
-	print("[SERVER] Server is Up and Running ...")
-	return server_socket
-	
+	try:
+		with open(os.path.join(os.getcwd(), QUESTIONS_CACHE_FILE), 'r', encoding="utf-8") as content_to_read:
+			cached_questions = json.load(content_to_read)
+	except (OSError, ValueError):
+		return None
 
-def send_error(socket_connection, error_msg):
+	return {int(question_id): question_details for question_id, question_details in cached_questions.items()} or None
+
+
+def save_questions_cache(questions_to_save):
 	"""
-	Explanations: Send error message with given message.
+	Explanations: Saves the decoded questions bank to the local cache file (temporary file, then replace).
 
-	Receives: socket_connection (socket object), message error string from called function.
+	Receives: questions_to_save (dict).
 
 	Returns: None.
 	"""
-	cmd        = chatlib.PROTOCOL_SERVER["login_failed_msg"] + (" " * (chatlib.CMD_FIELD_LENGTH - len(chatlib.PROTOCOL_SERVER["login_failed_msg"])))
-	str_length = str(len(error_msg)).zfill(4)
-	full_msg   = cmd + "|" + str_length + "|" + error_msg
-	socket_connection.send(full_msg.encode())
-	
+	cache_file_path = os.path.join(os.getcwd(), QUESTIONS_CACHE_FILE)
+	temp_file_path  = f'{cache_file_path}.{os.getpid()}.tmp'
+	with open(temp_file_path, 'w', encoding="utf-8") as content_to_write:
+		json.dump(questions_to_save, content_to_write)
+	os.replace(temp_file_path, cache_file_path)
 
-# MESSAGE HANDLING #
-def handle_get_score_message(socket_connection, user_name):
+
+def install_questions(new_questions):
 	"""
-	Explanations: Handle with your score message.
+	Explanations: Swaps the questions bank of the server with a new bank (runs in the server loop, between requests,
+	so a request never sees half of a swap). The decks of the logged users are built again on the new bank.
 
-	Receives: socket_connection (socket object), user_name (str).
+	Receives: new_questions (dict).
 
 	Returns: None.
 	"""
-	global users
-	build_and_send_message(socket_connection, chatlib.PROTOCOL_SERVER["YOUR_SCORE"], str(users[user_name]["score"]))
+	global questions
 
+	questions = new_questions
+	index_questions()
+	logger.info(f'[SERVER] Questions Bank Swapped ({len(questions)} Questions) ...')
 
-def handle_high_score_message(socket_connection):
+
+def refresh_questions_forever(url, interval, publish_questions):
 	"""
-	Explanations: Handle high score message.
+	Explanations: Background thread - downloads the questions bank every interval seconds,
+	saves it to the local cache, and publishes it (swaps it into the server loop, or into the shared bank of the workers).
+	A failed download keeps the current bank.
 
-	Receives: socket_connection (socket object).
+	Receives: url (str), interval (float), publish_questions (function) - receives the new bank.
 
 	Returns: None.
 	"""
-	global users
+	while True:
+		try:
+			web_questions = fetch_questions_from_web(url)
+		except (requests.RequestException, ValueError, KeyError) as error:
+			logger.warning(f'[SERVER] Questions Refresh Failed : {error} ...')
+		else:
+			if web_questions:
+				save_questions_cache(web_questions)
+				publish_questions(web_questions)
 
-	data = ""
-	sortedDict = dict(sorted(users.items(), key=lambda item: item[1]["score"], reverse=True))
-	for user, user_details in sortedDict.items():
-		data += user + " : " + str(user_details["score"]) + "\n"
+		if interval <= 0:
+			return
+		time.sleep(interval)
 
-	build_and_send_message(socket_connection, chatlib.PROTOCOL_SERVER["all_score_msg"], data)
 
+def start_questions_refresher(url=None, interval=None, publish_questions=None):
+	"""
+	Explanations: Starts the background refresh of the questions bank. With --workers N, only the parent process refreshes,
+	and publishes the bank to the state owner process (so all the workers serve the same bank, and only one process writes the cache).
 
-def handle_logout_message(socket_connection):
+	Receives: url (str) - default QUESTIONS_URL, interval (float) - default QUESTIONS_REFRESH,
+			  publish_questions (function) - default swaps the bank into the server loop.
+
+	Returns: thread (threading.Thread).
 	"""
-	Explanations: Closes the given socket (in later chapters, also remove user from logged_users dictionary).
+	publish_questions = publish_questions or (lambda web_questions: call_in_loop(install_questions, web_questions))
+	refresher         = threading.Thread(target=refresh_questions_forever, args=(url or QUESTIONS_URL, QUESTIONS_REFRESH if interval is None else interval, publish_questions), name="questions-refresher", daemon=True)
+	refresher.start()
+	return refresher
 
-	Receives: socket_connection (socket object).
+
+def pull_questions_bank():
+	"""
+	Explanations: With --workers N - installs the questions bank that the refresher of the parent process published,
+	if it changed since the last pull. Runs every QUESTIONS_PULL seconds, on the timer wheel of the loop.
 
 	Returns: None.
 	"""
-	global logged_users
+	global questions_version
+
+	questions_version, new_questions = questions_bank.bank_since(questions_version)
+	if new_questions is not None:
+		install_questions(new_questions)
+	deadline_timers.schedule(time.monotonic() + QUESTIONS_PULL, pull_questions_bank)
 
+
+# QUESTIONS INDEX #
+class QuestionDeck:
 	"""
-	Explanations :
-	user_port = socket_connection.getpeername()[0] 
-	user_ip   = socket_connection.getpeername()[1]
+	Explanations: The questions that one user wasn't asked yet - a lazily shuffled permutation of the positions
+	of the questions bank. The deck is a virtual array [0, count) of positions, and drawing / removing a position
+	swaps it with the last one and shrinks the count (swap-remove). Only the moved slots are kept (in dictionaries),
+	so drawing a random unasked question is O(1), without copying the bank.
 	"""
-	user_ip = socket_connection.getpeername()[1]
-	del logged_users[user_ip]
-	socket_connection.close()
 
+	def __init__(self, count):
+		self.count     = count
+		self.slots     = {}  # slot     ---> position (when it isn't the same number)
+		self.positions = {}  # position ---> slot     (when it isn't the same number)
 
-def handle_login_message(socket_connection, data):
-	"""
-	Explanations: Gets socket and message data of login message. Checks  user and pass exists and match.
-	If not - sends error and finished. If all ok, sends OK message and adds user and address to logged_users.
+	def remove(self, position):
+		"""
+		Explanations: Removes the given position from the deck (if it is still in the deck).
 
-	Receives: socket_connection (socket object), data (str).
+		Returns: True if the position was removed.
+		"""
+		slot = self.positions.get(position, position)
+		if slot >= self.count:
+			return False
 
-	Returns: None.
+		last_slot     = self.count - 1
+		last_position = self.slots.get(last_slot, last_slot)
+
+		self.slots[slot]               = last_position
+		self.positions[last_position]  = slot
+		self.slots[last_slot]          = position
+		self.positions[position]       = last_slot
+		self.count                    -= 1
+		return True
+
+	def draw(self):
+		"""
+		Explanations: Draws a random position from the deck, and removes it.
+
+		Returns: position (int), or None if the deck is empty.
+		"""
+		if self.count == 0:
+			return None
+
+		slot     = random.randrange(self.count)
+		position = self.slots.get(slot, slot)
+		self.remove(position)
+		return position
+
+
+def index_questions():
 	"""
-	global users         # This is needed to access the same users' dictionary from all functions
-	global logged_users	 # To be used later
+	Explanations: Indexes the questions bank by position (position ---> question ID, and question ID ---> position),
+	for the questions decks of the users. The decks of the logged users are built again on the new index.
+	A memory-mapped bank is already indexed by position, so its index is used as is (nothing is copied).
 
-	user_name, password = chatlib.split_data(msg=data, expected_delimeters=1)
+	Returns: None.
+	"""
+	global questions
+	global question_ids
+	global question_positions
+	global question_decks
 
-	if user_name in users:
-		if users[user_name]["password"] == password:
-			user_ip = socket_connection.getpeername()[1]
-			logged_users[user_ip] = user_name
-			build_and_send_message(socket_connection, chatlib.PROTOCOL_SERVER["login_ok_msg"])
-		else:
-			data = "[SERVER] Password Incorrect ..."
-			build_and_send_message(socket_connection, chatlib.PROTOCOL_SERVER["login_failed_msg"], data)
+	if isinstance(questions, question_bank.MappedQuestionBank):
+		question_ids       = questions.ids
+		question_positions = questions.positions
 	else:
-		data = f'[SERVER] User {user_name} Not Exist in the DB of the Server ...'
-		build_and_send_message(socket_connection, chatlib.PROTOCOL_SERVER["login_failed_msg"], data)
+		question_ids       = list(questions.keys())
+		question_positions = {question_id: position for position, question_id in enumerate(question_ids)}
+	for user_name in list(question_decks.keys()):
+		build_question_deck(user_name)
 
 
-def handle_logged_message(socket_connection):
+def build_question_deck(user_name):
 	"""
-	Explanations: Handle logged users.
+	Explanations: Builds the questions deck of the user from users[user_name]["questions_asked"] - O(questions asked).
 
-	Receives: socket_connection (socket object).
+	Receives: user_name (str).
 
-	Returns: -
+	Returns: deck (QuestionDeck).
 	"""
 	global users
+	global question_decks
 
-	data = ""
-	for idx, user in enumerate(users.keys()):
-		comma = "" if idx == len(users.keys()) - 1 else ", "
-		data += user + comma
+	deck = QuestionDeck(len(question_ids))
+	for question_id in users[user_name]["questions_asked"]:
+		if question_id in question_positions:
+			deck.remove(question_positions[question_id])
 
-	build_and_send_message(socket_connection, chatlib.PROTOCOL_SERVER["logged_answer_msg"], data)
+	question_decks[user_name] = deck
+	return deck
 
 
-def handle_client_message(socket_connection, cmd, data):
+# HOT RELOAD #
+def start_hot_reload(watch_interval=0, reload_questions=True):
 	"""
-	Explanations: Gets message cmd and data and calls the right function to handle command.
+	Explanations: Starts to track the rows of questions.txt and users.txt (the first load only keeps the rows, the server
+	already loaded the tables), so RELOAD - and the watch mode, if watch_interval - reload only the rows that changed.
+	questions.txt is tracked only if the questions bank was loaded from it - a bank of the cache, of a bank file or of the web
+	isn't questions.txt, and the next web refresh would drop the rows of the file anyway.
 
-	Receives: socket_connection (socket object), cmd (str) and data (str).
+	Receives: watch_interval (float) - seconds between checks of the files (0 - no watch mode),
+			  reload_questions (bool) - the questions bank was loaded from questions.txt, and isn't refreshed from the web.
 
 	Returns: None.
 	"""
-	global logged_users
+	global questions_reloader
+	global users_reloader
 
-	user_name = socket_connection.gethostname()
-	if user_name not in logged_users.values():
-		if  cmd == chatlib.PROTOCOL_CLIENT["login_msg"]:
-			handle_login_message(socket_connection, data)
-		else:
-			data = f'[SERVER] The user not logged into the System, so the cmd : {cmd} - Not Recognized ...'
-			build_and_send_message(socket_connection, chatlib.PROTOCOL_SERVER["login_failed_msg"], data)
-	else:
-		if   cmd == chatlib.PROTOCOL_CLIENT["logged_msg"]:
-			handle_logged_message(socket_connection)
+	questions_reloader = hot_reload.TableReloader(storage.questions_file_path, "Question ID", storage.parse_question_row) if reload_questions else None
+	users_reloader     = hot_reload.TableReloader(storage.users_file_path, "User Name", storage.parse_user_row)
+	for reloader in (questions_reloader, users_reloader):
+		if reloader is None:
+			continue
+		try:
+			reloader.reload()
+		except OSError:
+			pass
 
-		elif cmd == chatlib.PROTOCOL_CLIENT["my_score_msg"]:
-			user_name = socket_connection.gethostname()
-			handle_get_score_message(socket_connection, user_name)
+	if watch_interval > 0:
+		threading.Thread(target=watch_tables_forever, args=(watch_interval,), name="tables-watcher", daemon=True).start()
 
-		elif cmd == chatlib.PROTOCOL_CLIENT["high_score_msg"]:
-			handle_high_score_message(socket_connection)
 
-		elif cmd == chatlib.PROTOCOL_CLIENT["logout_msg"]:
-			handle_logout_message(socket_connection)
+def watch_tables_forever(interval):
+	"""
+	Explanations: Background thread of the watch mode - reloads the tables when one of the files is modified.
 
-		elif cmd == chatlib.PROTOCOL_CLIENT["get_question_msg"]:
-			handle_question_message(socket_connection)
+	Receives: interval (float).
 
-		elif cmd == chatlib.PROTOCOL_CLIENT["send_answer_msg"]:
-			handle_answer_message(socket_connection, user_name, data)
+	Returns: None.
+	"""
+	while True:
+		time.sleep(interval)
+		if not (questions_reloader is not None and questions_reloader.is_modified()) and not users_reloader.is_modified():
+			continue
 
-		else:
-			data = f'[SERVER] The cmd : {cmd} - Not Recognized ...'
-			build_and_send_message(socket_connection, chatlib.PROTOCOL_SERVER["login_failed_msg"], data)
+		with reload_lock:
+			try:
+				call_in_loop(install_reload, reload_tables())
+			except OSError as error:
+				logger.warning(f'[SERVER] Reload Failed : {error} ...')
 
 
-def create_random_question(user_name):
+def reload_tables():
 	"""
-	Explanations: Get random question.
+	Explanations: Parses the changed rows of the tables (in a background thread), and builds the new questions bank
+	as a copy of the current one with the changes (copy-on-write - the bank that the loop uses is never changed in place).
 
-	Algorithm :
-	1 - Get Random question (with all details of question).
-	2 - If question not asked already by the client, we can send the question to the client.
-	    Else, we need to remove this question from the temporary DB that we have.
-	    Then, we need to check if the DB of questions is empty or not :
-	    * if the DB is empty    ---> We return None.
-	    * if the DB isn't empty ---> We try to random new question ID.
+	Returns: (base questions (dict), new questions (dict) or None if no question changed, questions delta, users delta) -
+	every delta is (changed (dict), removed (set)).
+	"""
+	base_questions  = questions
+	questions_delta = questions_reloader.reload() if questions_reloader is not None else ({}, set())
+	users_delta     = users_reloader.reload()
 
-	Returns: data (str).
+	new_questions = None
+	if questions_delta[0] or questions_delta[1]:
+		new_questions = apply_questions_delta(base_questions, questions_delta)
+	return base_questions, new_questions, questions_delta, users_delta
+
+
+def apply_questions_delta(base_questions, questions_delta):
 	"""
-	global users
-	global questions
+	Returns: new questions (dict) - a copy of base_questions with the changed and removed questions of the delta.
+	"""
+	changed, removed = questions_delta
+	new_questions    = dict(base_questions)
+	new_questions.update(changed)
+	for question_id in removed:
+		new_questions.pop(question_id, None)
+	return new_questions
 
-	questionsCopy = copy.deepcopy(questions)
 
-	while True:
-		id_question, question_details = random.choice(list(questionsCopy.items()))
-		if id_question not in users[user_name]["questions_asked"]:
-			break
-		else:
-			del questionsCopy[int(id_question)]
-			if len(questionsCopy) == 0:
-				return None
+def install_reload(reload_result):
+	"""
+	Explanations: Installs the reloaded tables (runs in the server loop, between requests, so a request sees all the reload or nothing).
+	The new questions bank is swapped in, and the decks of the logged users are built again from their asked questions
+	(so a user is never asked a question twice, and gets the new questions). New users are added, and changed users
+	get only their new password - the live score and asked questions of a user stay (the file is older than the journal),
+	and a user that was removed from the file is kept while the server runs.
 
-	data = str(id_question) + chatlib.DATA_DELIMITER + question_details["question"] + chatlib.DATA_DELIMITER + chatlib.DATA_DELIMITER.join(question_details["answers"])
-	return data
+	Receives: reload_result (see reload_tables).
+
+	Returns: summary (str).
+	"""
+	base_questions, new_questions, (changed_questions, removed_questions), (changed_users, removed_users) = reload_result
+
+	if new_questions is not None:
+		if questions is not base_questions:
+			new_questions = apply_questions_delta(questions, (changed_questions, removed_questions))
+		install_questions(new_questions)
 
+	added_users, changed_passwords = 0, 0
+	for user_name, user_details in changed_users.items():
+		if user_name not in users:
+			users[user_name] = user_details
+			added_users     += 1
+		elif users[user_name]["password"] != user_details["password"]:
+			users[user_name]   = dict(users[user_name], password=user_details["password"])
+			changed_passwords += 1
+	if added_users:
+		answers_cache.bump("scores")
 
-def handle_question_message(socket_connection):
+	summary = f'{len(changed_questions)} Questions Changed, {len(removed_questions)} Removed, {added_users} Users Added, {changed_passwords} Passwords Changed'
+	logger.info(f'[SERVER] Tables Reloaded : {summary} ...')
+	return summary
+
+
+# SOCKET CREATOR #
+def setup_socket(reuse_port=False):
 	"""
-	Explanations: Send question to Client.
+	Explanations: Creates new listening socket and returns it.
+	With reuse_port, some worker processes can bind to the same port (SO_REUSEPORT), and the kernel balances the new connections between them.
 
-	Receives: socket_connection (socket object).
+	Receives: reuse_port (bool).
 
-	Returns: None.
+	Returns: The socket object.
 	"""
-	global logged_users
+	server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+	server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+	if reuse_port:
+		server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+	server_socket.bind((SERVER_IP, SERVER_PORT))
+	server_socket.listen()
+	logger.info("[SERVER] Server is Up and Running ...")
+	return server_socket
+	
 
-	socket_connection_ip = socket_connection.getpeername()[1]
-	data = create_random_question(logged_users[socket_connection_ip])
-	if data is None:
-		data = "[SERVER] Game Over - The Client already answered on all the questions in the DB ..."
-		build_and_send_message(socket_connection, chatlib.PROTOCOL_SERVER["no_questions_msg"], data)
-	else:
-		build_and_send_message(socket_connection, chatlib.PROTOCOL_SERVER["your_question_msg"], data)
+def send_error(socket_connection, error_msg):
+	"""
+	Explanations: Send error message with given message.
 
+	Receives: socket_connection (socket object), message error string from called function.
 
-def handle_answer_message(socket_connection, user_name, data):
+	Returns: None.
+	"""
+	cmd        = chatlib.PROTOCOL_SERVER["login_failed_msg"] + (" " * (chatlib.CMD_FIELD_LENGTH - len(chatlib.PROTOCOL_SERVER["login_failed_msg"])))
+	str_length = str(len(error_msg)).zfill(4)
+	full_msg   = cmd + "|" + str_length + "|" + error_msg
+	socket_connection.send(full_msg.encode())
+	
+
+# MESSAGE HANDLING #
+def handle_get_score_message(socket_connection, user_name):
 	"""
-	Explanations: Check the answer of the client.
+	Explanations: Handle with your score message.
 
-	Receives: socket_connection (socket object), user_name (str), data (str).
+	Receives: socket_connection (socket object), user_name (str).
 
 	Returns: None.
 	"""
 	global users
-	global questions
+	send_cached_message(socket_connection, ("MY_SCORE", user_name), ("score", user_name), chatlib.PROTOCOL_SERVER["your_score_msg"], lambda: str(users[user_name]["score"]))
 
-	id_question, user_answer = data.split(chatlib.DATA_DELIMITER)
 
-	if user_answer not in questions[int(id_question)]["answers"]:
-		data = f'[SERVER] Wrong. You try to type answer that not related to the options ...'
-		build_and_send_message(socket_connection, chatlib.PROTOCOL_SERVER["wrong_answer_msg"], data)
-	else:
-		if int(user_answer) == questions[int(id_question)]["correct"]:
-			users[user_name]["score"] += CORRECT_ANSWER_POINT
-			data = f'[SERVER] Great, Correct Answer ...'
-			build_and_send_message(socket_connection, chatlib.PROTOCOL_SERVER["correct_answer_msg"], data)
-		else:
-			data = f'[SERVER] Wrong. The Correct Answer : {str(questions[int(id_question)]["correct"])}'
-			build_and_send_message(socket_connection, chatlib.PROTOCOL_SERVER["wrong_answer_msg"], data)
+def build_scores_table(scores, max_length=None):
+	"""
+	Explanations: Builds the scores table data of the client ("user : score" line for each user).
+
+	Receives: scores (list of (user_name, score)), max_length (int) - only the first lines that fit in max_length bytes (None - all the lines).
+
+	Returns: data (str).
+	"""
+	lines = (f'{user} : {score}\n' for user, score in scores)
+	return "".join(lines) if max_length is None else join_within(lines, "", max_length)
 
 
-def print_client_sockets(clients_sockets):
+def handle_high_score_message(socket_connection):
 	"""
-	Explanations: Print all clients sockets.
+	Explanations: Handle high score message - the leaderboard of the users table is already sorted.
+	In the text protocol the table is cut to the first users that fit in one message (TOP_SCORES / the binary protocol for more).
 
-	Receives: clients_sockets (socket object).
+	Receives: socket_connection (socket object).
 
 	Returns: None.
 	"""
-	global logged_users
+	global users
 
-	for client_socket in clients_sockets:
-		client_port, client_ip = client_socket.getpeername()
-		print(f'{logged_users[client_ip]} : ({client_port} , {client_ip})')
+	send_cached_message(socket_connection, ("HIGHSCORE",), "scores", chatlib.PROTOCOL_SERVER["all_score_msg"], lambda: build_scores_table(users.top_scores(), answer_data_limit(socket_connection)))
 
 
-def clean_current_socket(clients_sockets, socket_connection):
+def handle_subscribe_scores_message(socket_connection):
 	"""
-	Explanations: Remove all details of specific socket connection.
+	Explanations: Handle subscribe scores message - answers with the whole leaderboard (like HIGHSCORE), and from now
+	the connection gets SCORES_UPDATE messages with the scores that changed (until it is closed).
+	With --workers N the changes of all the workers are pulled from the state owner process (see pull_score_changes).
 
-	Receives: clients_sockets (socket object), socket_connection (socket object).
+	Receives: socket_connection (socket object).
 
 	Returns: None.
 	"""
-	global logged_users
+	global score_subscribers
+	global changes_position
+	global push_timer
 
-	print(f"Connection of {socket_connection} Closed ...")
-	client_ip = socket_connection.getpeername()[1]
-	del logged_users[client_ip]
-	clients_sockets.remove(socket_connection)
-	handle_logout_message(socket_connection)
+	if changes_position is not None and push_timer is None:
+		changes_position = users.score_changes_since(None)[0]
+		push_timer       = deadline_timers.schedule(time.monotonic() + PUSH_INTERVAL, pull_score_changes)
 
+	score_subscribers.add(socket_connection)
+	handle_high_score_message(socket_connection)
 
-# MAIN #
-def main():
-	# Initializes global users and questions dictionaries using load functions, will be used later #
+
+def record_score_change(user_name, score):
+	"""
+	Explanations: A score changed - bumps the versions of the cached score answers, and keeps the new score of the user
+	for the next push (the changes of PUSH_INTERVAL seconds are coalesced - a user that scored some times is pushed once, with the last score).
+
+	Receives: user_name (str), score (int).
+
+	Returns: None.
+	"""
+	global push_timer
+
+	answers_cache.bump("scores")
+	answers_cache.bump(("score", user_name))
+	if not score_subscribers or changes_position is not None:
+		return
+
+	score_changes[user_name] = score
+	if push_timer is None:
+		push_timer = deadline_timers.schedule(time.monotonic() + PUSH_INTERVAL, push_score_changes)
+
+
+def build_push_messages(cmd, lines):
+	"""
+	Explanations: Builds the push of the lines in both protocols, once for all the subscribers.
+	In the text protocol the lines are split to some messages, so every message is at most MAX_DATA_LENGTH bytes.
+
+	Receives: cmd (str), lines (list of str).
+
+	Returns: {False: text protocol messages (bytes), True: binary protocol message (bytes)}.
+	"""
+	text_msgs, chunk, chunk_length = [], [], 0
+	for line in lines:
+		if chunk and chunk_length + len(line.encode()) > chatlib.MAX_DATA_LENGTH:
+			text_msgs.append(chatlib.build_message(cmd, "".join(chunk)).encode())
+			chunk, chunk_length = [], 0
+		chunk.append(line)
+		chunk_length += len(line.encode())
+	text_msgs.append(chatlib.build_message(cmd, "".join(chunk)).encode())
+
+	return {False: b"".join(text_msgs), True: chatlib.build_binary_message(cmd, "".join(lines))}
+
+
+def push_score_changes():
+	"""
+	Explanations: Pushes the coalesced score changes to all the subscribers - one SCORES_UPDATE ("user : score" lines,
+	from the highest score), that is encoded once and queued as is on every subscriber socket.
+
+	Returns: None.
+	"""
+	global push_timer
+	global score_changes
+
+	push_timer             = None
+	changes, score_changes = score_changes, {}
+	if not changes:
+		return
+
+	cmd   = chatlib.PROTOCOL_SERVER["scores_update_msg"]
+	lines = build_scores_table(sorted(changes.items(), key=lambda change: -change[1])).splitlines(keepends=True)
+	push  = build_push_messages(cmd, lines)
+	if wire_trace.enabled:
+		wire_trace.log("SERVER", cmd, "".join(lines))
+
+	for socket_connection in list(score_subscribers):
+		session = client_sessions.get(socket_connection)
+		if session is None:
+			score_subscribers.discard(socket_connection)
+		elif isinstance(socket_connection, sessions.MuxChannel):
+			build_and_send_message(socket_connection, cmd, "".join(lines))
+		else:
+			queue_message(socket_connection, push[session.binary])
+
+
+def pull_score_changes():
+	"""
+	Explanations: With --workers N - pulls the score changes of all the workers from the state owner process (one call,
+	coalesced there), and pushes them like the changes of this worker. Runs every PUSH_INTERVAL seconds while the worker has subscribers.
+
+	Returns: None.
+	"""
+	global changes_position
+	global push_timer
+
+	push_timer = None
+	if not score_subscribers:
+		return
+
+	changes_position, changes = users.score_changes_since(changes_position)
+	score_changes.update(changes)
+	push_score_changes()
+	push_timer = deadline_timers.schedule(time.monotonic() + PUSH_INTERVAL, pull_score_changes)
+
+
+def handle_top_scores_message(socket_connection, data):
+	"""
+	Explanations: Handle top scores message - the first N users of the leaderboard (O(N)).
+
+	Receives: socket_connection (socket object), data (str) - N.
+
+	Returns: None.
+	"""
+	global users
+
+	if not (data.isascii() and data.isdigit()):
+		data = f'[SERVER] The number of top scores : {data} - Not Valid ...'
+		build_and_send_message(socket_connection, chatlib.PROTOCOL_SERVER["login_failed_msg"], data)
+		return
+
+	count = int(data)
+	send_cached_message(socket_connection, ("TOP_SCORES", count), "scores", chatlib.PROTOCOL_SERVER["all_score_msg"], lambda: build_scores_table(users.top_scores(count), answer_data_limit(socket_connection)))
+
+
+def handle_my_rank_message(socket_connection, user_name):
+	"""
+	Explanations: Handle my rank message - the rank of the user in the leaderboard (O(log U)).
+
+	Receives: socket_connection (socket object), user_name (str).
+
+	Returns: None.
+	"""
+	global users
+
+	build_and_send_message(socket_connection, chatlib.PROTOCOL_SERVER["your_rank_msg"], str(users.rank(user_name)))
+
+
+def logout_session(session):
+	"""
+	Explanations: Logs out the user of the session (if logged in). The questions deck of the user is kept
+	while the user has other sessions.
+
+	Receives: session (Session).
+
+	Returns: None.
+	"""
+	global logged_users
+	global client_sessions
+	global question_decks
+
+	user_name = session.user_name
+	if user_name is None:
+		return
+
+	if client_sessions.logout(session):
+		question_decks.pop(user_name, None)
+	logged_users.remove(user_name)
+	answers_cache.bump("logged")
+
+
+def handle_logout_message(socket_connection):
+	"""
+	Explanations: Closes the given socket, and removes its session (and the user from logged_users dictionary).
+	Only the session is used, so the socket isn't touched before it is closed.
+	Closing a multiplexed connection closes all the client sessions on it.
+
+	Receives: socket_connection (socket object, or MuxChannel).
+
+	Returns: None.
+	"""
+	global client_sessions
+
+	score_subscribers.discard(socket_connection)
+	session = client_sessions.close(socket_connection)
+	if session is not None:
+		if session.timer is not None:
+			deadline_timers.cancel(session.timer)
+		logout_session(session)
+		for channel in list((session.channels or {}).values()):
+			handle_logout_message(channel)
+	socket_connection.close()
+
+
+def handle_login_message(socket_connection, session, data):
+	"""
+	Explanations: Gets socket and message data of login message. Checks  user and pass exists and match.
+	If not - sends error and finished. If all ok, sends OK message and adds user and address to logged_users.
+	The password hash is checked by the password verifier threads (slow on purpose), and finish_login gets the result
+	in the server loop - the messages of the session that arrive meanwhile wait in session.waiting, and run after it.
+
+	Receives: socket_connection (socket object), session (Session), data (str).
+
+	Returns: None.
+	"""
+	global users         # This is needed to access the same users' dictionary from all functions
+	global password_verifier
+
+	login_fields = chatlib.split_data(msg=data, expected_delimeters=1)
+	if len(login_fields) != 2:
+		data = "[SERVER] The login must be : user name#password ..."
+		build_and_send_message(socket_connection, chatlib.PROTOCOL_SERVER["login_failed_msg"], data)
+		return
+
+	user_name, password = login_fields
+	if user_name in users:
+		if password_verifier.submit(password, users[user_name]["password"], call_in_loop, finish_login, socket_connection, session, user_name):
+			session.waiting = collections.deque()
+		else:
+			data = "[SERVER] The Server is Busy with other Logins, please try again ..."
+			build_and_send_message(socket_connection, chatlib.PROTOCOL_SERVER["login_failed_msg"], data)
+	else:
+		data = f'[SERVER] User {user_name} Not Exist in the DB of the Server ...'
+		build_and_send_message(socket_connection, chatlib.PROTOCOL_SERVER["login_failed_msg"], data)
+
+
+def finish_login(socket_connection, session, user_name, verified):
+	"""
+	Explanations: Ends a login with the result of the password verification (runs in the server loop, by call_in_loop).
+	Then runs the messages of the session that waited for the login.
+
+	Receives: socket_connection (socket object), session (Session), user_name (str), verified (bool).
+
+	Returns: None.
+	"""
+	global logged_users
+	global client_sessions
+
+	if client_sessions.get(socket_connection) is not session:
+		return
+
+	if verified:
+		logout_session(session)
+		client_sessions.login(session, user_name)
+		logged_users.add(user_name)
+		answers_cache.bump("logged")
+		if user_name not in question_decks:
+			build_question_deck(user_name)
+		build_and_send_message(socket_connection, chatlib.PROTOCOL_SERVER["login_ok_msg"])
+	else:
+		data = "[SERVER] Password Incorrect ..."
+		build_and_send_message(socket_connection, chatlib.PROTOCOL_SERVER["login_failed_msg"], data)
+
+	resume_session(session)
+
+
+def resume_session(session):
+	"""
+	Explanations: Runs the messages of the session that waited (in session.waiting) for a background task of the session
+	(login, reload) - in order, until one of them waits again.
+
+	Receives: session (Session).
+
+	Returns: None.
+	"""
+	waiting, session.waiting = session.waiting, None
+	while waiting and session.waiting is None:
+		handler, args = waiting.popleft()
+		handler(*args)
+	if session.waiting is not None:
+		session.waiting.extend(waiting)
+
+	if running_loop is not None:
+		send_pending_messages()
+
+
+def handle_logged_message(socket_connection):
+	"""
+	Explanations: Handle logged users - O(logged users). In the text protocol the list is cut to the names that fit in one message.
+
+	Receives: socket_connection (socket object).
+
+	Returns: -
+	"""
+	global logged_users
+
+	send_cached_message(socket_connection, ("LOGGED",), "logged", chatlib.PROTOCOL_SERVER["logged_answer_msg"], lambda: join_within(logged_users.names(), ", ", answer_data_limit(socket_connection)))
+
+
+def handle_protocol_message(socket_connection, session, data):
+	"""
+	Explanations: Handle protocol negotiation message (sent by the client at connect time).
+	The answer is sent in the text protocol, then the server switches the socket to the wanted protocol,
+	so the client must wait for the answer before sending binary messages.
+	The multiplexed protocol is only for the gateways - "MUX#<secret>", with the MUX_SECRET of the server.
+
+	Receives: socket_connection (socket object), session (Session), data (str) - wanted protocol version.
+
+	Returns: None.
+	"""
+	if data == chatlib.BINARY_PROTOCOL_VERSION:
+		build_and_send_message(socket_connection, chatlib.PROTOCOL_SERVER["protocol_ok_msg"], data)
+		session.decoder = chatlib.BinaryMessageDecoder()
+		session.binary  = True
+	elif data == chatlib.TEXT_PROTOCOL_VERSION:
+		build_and_send_message(socket_connection, chatlib.PROTOCOL_SERVER["protocol_ok_msg"], data)
+	elif data.partition(chatlib.DATA_DELIMITER)[0] == chatlib.MUX_PROTOCOL_VERSION and is_trusted_gateway(socket_connection, session, data):
+		build_and_send_message(socket_connection, chatlib.PROTOCOL_SERVER["protocol_ok_msg"], chatlib.MUX_PROTOCOL_VERSION)
+		session.decoder  = chatlib.MuxMessageDecoder()
+		session.channels = {}
+		session.bucket   = rate_limits.TokenBucket(UPSTREAM_RATE, rate_limits.UPSTREAM_BURST, time.perf_counter()) if UPSTREAM_RATE else None
+	else:
+		data = f'[SERVER] The protocol version : {data} - Not Supported ...'
+		build_and_send_message(socket_connection, chatlib.PROTOCOL_SERVER["login_failed_msg"], data)
+
+
+def is_trusted_gateway(socket_connection, session, data):
+	"""
+	Explanations: Checks a PROTOCOL MUX request - a connection of its own (not a session of a gateway), not logged in,
+	with the secret of the gateways (every session id on a multiplexed connection is a session, so any client could open many).
+
+	Receives: socket_connection (socket object), session (Session), data (str) - "MUX#<secret>".
+
+	Returns: True if the connection may switch to the multiplexed protocol.
+	"""
+	if isinstance(socket_connection, sessions.MuxChannel) or session.user_name is not None or not MUX_SECRET:
+		return False
+
+	secret = data.partition(chatlib.DATA_DELIMITER)[2]
+	if not hmac.compare_digest(secret.encode(), MUX_SECRET.encode()):
+		logger.warning("[SERVER] Client %s Sent PROTOCOL MUX With a Wrong Secret ...", session.address)
+		return False
+	return True
+
+
+def handle_batch_message(socket_connection, session, data):
+	"""
+	Explanations: Handle BATCH message - runs all the commands of the batch in order, and sends all the answers
+	in one BATCH_ANSWER message (one round trip and one send, instead of one per command).
+	The answers of the commands are collected by build_and_send_message while the batch runs.
+	LOGOUT, PROTOCOL and nested BATCH are not allowed in a batch, and are answered with an error.
+
+	Receives: socket_connection (socket object), session (Session), data (str) - the commands, as text protocol messages one after the other.
+
+	Returns: None.
+	"""
+	commands = chatlib.parse_batch(data)
+	if commands is None:
+		data = '[SERVER] The batch is not complete messages ...'
+		build_and_send_message(socket_connection, chatlib.PROTOCOL_SERVER["login_failed_msg"], data)
+		return
+
+	session.batch_replies = []
+	run_batch(socket_connection, session, collections.deque(commands))
+
+
+def run_batch(socket_connection, session, commands):
+	"""
+	Explanations: Runs the commands of a batch, then sends the BATCH_ANSWER. If a LOGIN of the batch waits for the
+	password verification, the rest of the batch waits in session.waiting, and runs after the login ends.
+
+	Receives: socket_connection (socket object), session (Session), commands (deque of (cmd, data)).
+
+	Returns: None.
+	"""
+	not_in_batch = (chatlib.PROTOCOL_CLIENT["logout_msg"], chatlib.PROTOCOL_CLIENT["protocol_msg"], chatlib.PROTOCOL_CLIENT["batch_msg"])
+	while True:
+		if session.waiting is not None:
+			session.waiting.append((run_batch, (socket_connection, session, commands)))
+			return
+		if not commands:
+			break
+
+		cmd, cmd_data = commands.popleft()
+		if cmd in not_in_batch:
+			session.batch_replies.append((chatlib.PROTOCOL_SERVER["login_failed_msg"], f'[SERVER] The cmd : {cmd} - Not Allowed in a Batch ...'))
+		else:
+			handle_client_message(socket_connection, cmd, cmd_data)
+
+	replies, session.batch_replies = session.batch_replies, None
+	data = chatlib.build_batch(replies)
+	if data is chatlib.ERROR_RETURN or not session.binary and len(data.encode()) > chatlib.MAX_DATA_LENGTH:
+		data = f'[SERVER] The answers of the batch are longer than {chatlib.MAX_DATA_LENGTH} bytes ...'
+		build_and_send_message(socket_connection, chatlib.PROTOCOL_SERVER["login_failed_msg"], data)
+		return
+
+	build_and_send_message(socket_connection, chatlib.PROTOCOL_SERVER["batch_answer_msg"], data)
+
+
+def handle_mux_messages(socket_connection, messages):
+	"""
+	Explanations: Handles the messages of a multiplexed connection (gateway) - every message is handled in the session of its tag.
+	LOGOUT closes only the session of the tag (the gateway sends it when the client leaves, and the server sends it
+	to the gateway when it closes a session - see close_channel).
+
+	Receives: socket_connection (socket object), messages (list of (session_id (int), cmd (str), data (str))).
+
+	Returns: False if the multiplexed connection is closed or broken, else True.
+	"""
+	for session_id, cmd, data in messages:
+		if cmd == "" or cmd is chatlib.ERROR_RETURN:
+			return False
+
+		if cmd == chatlib.PROTOCOL_CLIENT["logout_msg"]:
+			channel = client_sessions.get(socket_connection).channels.get(session_id)
+			if channel is not None:
+				handle_logout_message(channel)
+		else:
+			handle_client_message(socket_connection, cmd, data, session_id)
+	return True
+
+
+def open_mux_channel(upstream, session_id):
+	"""
+	Explanations: Finds the session of a session id tag on a multiplexed connection - a new session is opened on its first message
+	(with its own idle deadline), unless the connection has MAX_CHANNELS sessions or the server has MAX_CONNECTIONS -
+	then the session is rejected with an error, and closed in the gateway.
+
+	Receives: upstream (socket object), session_id (int).
+
+	Returns: channel (MuxChannel), or None if the session was rejected.
+	"""
+	channel = client_sessions.get(upstream).channels.get(session_id)
+	if channel is not None:
+		client_sessions.get(channel).last_active = time.monotonic()
+		return channel
+
+	if len(client_sessions.get(upstream).channels) >= MAX_CHANNELS or MAX_CONNECTIONS and len(client_sessions) >= MAX_CONNECTIONS:
+		server_metrics.rejects += 1
+		logger.warning("[SERVER] Session %d of the Gateway %s Rejected - the Server is Full ...", session_id, client_sessions.get(upstream).address)
+		queue_message(upstream, chatlib.build_mux_message(session_id, chatlib.PROTOCOL_SERVER["login_failed_msg"], "[SERVER] The Server is Full, please try again later ..."))
+		queue_message(upstream, chatlib.build_mux_message(session_id, chatlib.PROTOCOL_CLIENT["logout_msg"], ""))
+		return None
+
+	channel = client_sessions.open_channel(upstream, session_id)
+	schedule_deadline(client_sessions.get(channel))
+	return channel
+
+
+def close_channel(channel):
+	"""
+	Explanations: Closes a session of a multiplexed connection from the server side, and tells the gateway to close its client (LOGOUT of the tag).
+
+	Receives: channel (MuxChannel).
+
+	Returns: None.
+	"""
+	queue_message(channel.upstream, chatlib.build_mux_message(channel.session_id, chatlib.PROTOCOL_CLIENT["logout_msg"], ""))
+	handle_logout_message(channel)
+
+
+def handle_client_message(socket_connection, cmd, data, session_id=None):
+	"""
+	Explanations: Gets message cmd and data and calls the right function to handle command.
+	Counts the command in the metrics - latency, and if it was answered with an error.
+	A message of a multiplexed connection is handled in the session of its session id tag, not of the socket.
+
+	Receives: socket_connection (socket object), cmd (str) and data (str), session_id (int) - tag of a multiplexed message, or None.
+
+	Returns: None.
+	"""
+	global client_sessions
+
+	if session_id is not None:
+		socket_connection = open_mux_channel(socket_connection, session_id)
+		if socket_connection is None:
+			return
+
+	session = client_sessions.get(socket_connection)
+	if session.waiting is not None:
+		session.waiting.append((handle_client_message, (socket_connection, cmd, data)))
+		return
+
+	start_time    = time.perf_counter()
+	error_replies = server_metrics.error_replies
+	if not admit_command(socket_connection, session, cmd, start_time):
+		return
+
+	dispatch_client_message(socket_connection, session, cmd, data)
+	server_metrics.record_command(cmd, time.perf_counter() - start_time, server_metrics.error_replies != error_replies)
+
+
+def admit_command(socket_connection, session, cmd, now):
+	"""
+	Explanations: Checks the command against the token bucket of the session (every command costs its weight in COMMAND_COSTS),
+	and in the overload mode sheds the expensive commands. A command that isn't admitted is answered with BUSY.
+
+	Receives: socket_connection (socket object), session (Session), cmd (str), now (float).
+
+	Returns: True if the command should be handled.
+	"""
+	if overload_detector.sheds(cmd):
+		server_metrics.shed += 1
+		data = f'[SERVER] The Server is Overloaded, so the cmd : {cmd} - Not Handled now, please try again later ...'
+	elif take_tokens(socket_connection, session, rate_limits.COMMAND_COSTS.get(cmd, rate_limits.DEFAULT_COST), now):
+		return True
+	else:
+		server_metrics.rate_limited += 1
+		data = f'[SERVER] Too Many Requests, so the cmd : {cmd} - Not Handled, please slow down ...'
+
+	server_metrics.record_error(cmd)
+	build_and_send_message(socket_connection, chatlib.PROTOCOL_SERVER["busy_msg"], data)
+	return False
+
+
+def take_tokens(socket_connection, session, cost, now):
+	"""
+	Explanations: Takes the cost of a command from the token bucket of the session, and for a session of a multiplexed connection
+	also from the bucket of the connection (UPSTREAM_RATE tokens per second for all its sessions) - so new session ids
+	don't bring new tokens.
+
+	Receives: socket_connection (socket object, or MuxChannel), session (Session), cost (int), now (float).
+
+	Returns: True if the buckets had enough tokens.
+	"""
+	if RATE_LIMIT:
+		if session.bucket is None:
+			session.bucket = rate_limits.TokenBucket(RATE_LIMIT, RATE_BURST, now)
+		if not session.bucket.take(cost, now):
+			return False
+
+	if isinstance(socket_connection, sessions.MuxChannel):
+		upstream_bucket = client_sessions.get(socket_connection.upstream).bucket
+		return upstream_bucket is None or upstream_bucket.take(cost, now)
+	return True
+
+
+def dispatch_client_message(socket_connection, session, cmd, data):
+	"""
+	Explanations: Calls the right function to handle command.
+
+	Receives: socket_connection (socket object), session (Session), cmd (str) and data (str).
+
+	Returns: None.
+	"""
+	if cmd == chatlib.PROTOCOL_CLIENT["protocol_msg"]:
+		handle_protocol_message(socket_connection, session, data)
+		return
+
+	if cmd == chatlib.PROTOCOL_CLIENT["batch_msg"]:
+		handle_batch_message(socket_connection, session, data)
+		return
+
+	if cmd == chatlib.PROTOCOL_CLIENT["ping_msg"]:
+		build_and_send_message(socket_connection, chatlib.PROTOCOL_SERVER["pong_msg"], data)
+		return
+
+	user_name = session.user_name
+	if user_name is None:
+		if  cmd == chatlib.PROTOCOL_CLIENT["login_msg"]:
+			handle_login_message(socket_connection, session, data)
+		else:
+			data = f'[SERVER] The user not logged into the System, so the cmd : {cmd} - Not Recognized ...'
+			build_and_send_message(socket_connection, chatlib.PROTOCOL_SERVER["login_failed_msg"], data)
+	else:
+		if   cmd == chatlib.PROTOCOL_CLIENT["logged_msg"]:
+			handle_logged_message(socket_connection)
+
+		elif cmd == chatlib.PROTOCOL_CLIENT["my_score_msg"]:
+			handle_get_score_message(socket_connection, user_name)
+
+		elif cmd == chatlib.PROTOCOL_CLIENT["high_score_msg"]:
+			handle_high_score_message(socket_connection)
+
+		elif cmd == chatlib.PROTOCOL_CLIENT["top_scores_msg"]:
+			handle_top_scores_message(socket_connection, data)
+
+		elif cmd == chatlib.PROTOCOL_CLIENT["my_rank_msg"]:
+			handle_my_rank_message(socket_connection, user_name)
+
+		elif cmd == chatlib.PROTOCOL_CLIENT["logout_msg"]:
+			handle_logout_message(socket_connection)
+
+		elif cmd == chatlib.PROTOCOL_CLIENT["get_question_msg"]:
+			handle_question_message(socket_connection, user_name)
+
+		elif cmd == chatlib.PROTOCOL_CLIENT["send_answer_msg"]:
+			handle_answer_message(socket_connection, user_name, data)
+
+		elif cmd == chatlib.PROTOCOL_CLIENT["stats_msg"]:
+			handle_stats_message(socket_connection, user_name)
+
+		elif cmd == chatlib.PROTOCOL_CLIENT["subscribe_msg"]:
+			handle_subscribe_scores_message(socket_connection)
+
+		elif cmd == chatlib.PROTOCOL_CLIENT["reload_msg"]:
+			handle_reload_message(socket_connection, session, user_name)
+
+		else:
+			data = f'[SERVER] The cmd : {cmd} - Not Recognized ...'
+			build_and_send_message(socket_connection, chatlib.PROTOCOL_SERVER["login_failed_msg"], data)
+
+
+def handle_stats_message(socket_connection, user_name):
+	"""
+	Explanations: Handle STATS admin message - sends the metrics summary of this server process.
+
+	Receives: socket_connection (socket object), user_name (str).
+
+	Returns: None.
+	"""
+	if user_name not in ADMIN_USERS:
+		data = f'[SERVER] The cmd : {chatlib.PROTOCOL_CLIENT["stats_msg"]} - Only for Admin Users ...'
+		build_and_send_message(socket_connection, chatlib.PROTOCOL_SERVER["login_failed_msg"], data)
+		return
+
+	build_and_send_message(socket_connection, chatlib.PROTOCOL_SERVER["stats_answer_msg"], server_metrics.render_summary())
+
+
+def handle_reload_message(socket_connection, session, user_name):
+	"""
+	Explanations: Handle RELOAD admin message - reloads the changed rows of questions.txt and users.txt (see reload_tables).
+	The files are parsed in a background thread, and the answer is sent after the new tables are installed -
+	the messages of the session that arrive meanwhile wait in session.waiting (like in a login).
+
+	Receives: socket_connection (socket object), session (Session), user_name (str).
+
+	Returns: None.
+	"""
+	if user_name not in ADMIN_USERS:
+		data = f'[SERVER] The cmd : {chatlib.PROTOCOL_CLIENT["reload_msg"]} - Only for Admin Users ...'
+		build_and_send_message(socket_connection, chatlib.PROTOCOL_SERVER["login_failed_msg"], data)
+		return
+
+	if users_reloader is None:
+		data = '[SERVER] Reload is Supported only with the text storage, in one process ...'
+		build_and_send_message(socket_connection, chatlib.PROTOCOL_SERVER["login_failed_msg"], data)
+		return
+
+	session.waiting = collections.deque()
+	threading.Thread(target=run_reload, args=(socket_connection, session), name="tables-reload", daemon=True).start()
+
+
+def run_reload(socket_connection, session):
+	"""
+	Explanations: Background thread of the RELOAD message - parses the tables, and hands the result to the server loop.
+
+	Returns: None.
+	"""
+	with reload_lock:
+		try:
+			reload_result = reload_tables()
+		except OSError as error:
+			reload_result = error
+		call_in_loop(finish_reload, socket_connection, session, reload_result)
+
+
+def finish_reload(socket_connection, session, reload_result):
+	"""
+	Explanations: Installs the reloaded tables (runs in the server loop), answers the RELOAD message,
+	then runs the messages of the session that waited for it.
+
+	Receives: socket_connection (socket object), session (Session), reload_result (see reload_tables, or OSError).
+
+	Returns: None.
+	"""
+	if isinstance(reload_result, OSError):
+		cmd, data = chatlib.PROTOCOL_SERVER["login_failed_msg"], f'[SERVER] Reload Failed : {reload_result} ...'
+	else:
+		cmd, data = chatlib.PROTOCOL_SERVER["reload_answer_msg"], install_reload(reload_result)
+
+	if client_sessions.get(socket_connection) is session:
+		build_and_send_message(socket_connection, cmd, data)
+		resume_session(session)
+
+
+def server_gauges():
+	"""
+	Explanations: The gauges of the metrics - computed only when the metrics are rendered (STATS / metrics endpoint).
+
+	Returns: dict - gauge name ---> value.
+	"""
+	return {
+		"connected_clients"     : len(client_sessions),
+		"gateway_sessions"      : client_sessions.channels,
+		"logged_in_users"       : len(logged_users),
+		"pending_logins"        : password_verifier.pending_count,
+		"deadline_timers"       : len(deadline_timers),
+		"outbound_queue_sockets": len(pending_sockets),
+		"outbound_queue_bytes"  : outbound_queue_bytes(),
+		"score_subscribers"     : len(score_subscribers),
+		"response_cache_entries": len(answers_cache),
+		"loop_lag_ms"           : round(overload_detector.loop_lag * 1000, 3),
+		"overloaded"            : int(overload_detector.overloaded),
+	}
+
+
+def outbound_queue_bytes():
+	"""
+	Returns: bytes that wait to be sent to the clients - in the outgoing buffers and in the asyncio transports.
+	"""
+	async_connections = [session.connection for session in client_sessions if isinstance(session.connection, AsyncClientConnection)]
+	return sum(len(buffer) for buffer in list(outgoing_messages.values())) + sum(connection.writer.transport.get_write_buffer_size() for connection in async_connections)
+
+
+def create_random_question(user_name):
+	"""
+	Explanations: Get random question.
+
+	Algorithm :
+	1 - Draw a random position from the questions deck of the user (only questions that the user wasn't asked yet).
+	    * if the deck is empty ---> We return None.
+	2 - Mark the question as asked in the users table - with --workers N the deck of this worker doesn't know the questions
+	    that the other workers asked, so a question that was already asked is skipped, and we draw again.
+	3 - Build the question data for the client.
+
+	Returns: data (str).
+	"""
+	global users
+	global questions
+	global question_decks
+
+	deck = question_decks.get(user_name)
+	if deck is None:
+		deck = build_question_deck(user_name)
+
+	while True:
+		position = deck.draw()
+		if position is None:
+			return None
+
+		id_question = question_ids[position]
+		if users.add_asked_question(user_name, id_question):
+			break
+
+	question_details = questions[id_question]
+
+	data = str(id_question) + chatlib.DATA_DELIMITER + question_details["question"] + chatlib.DATA_DELIMITER + chatlib.DATA_DELIMITER.join(question_details["answers"])
+	return data
+
+
+def handle_question_message(socket_connection, user_name):
+	"""
+	Explanations: Send question to Client.
+
+	Receives: socket_connection (socket object), user_name (str).
+
+	Returns: None.
+	"""
+	data = create_random_question(user_name)
+	if data is None:
+		data = "[SERVER] Game Over - The Client already answered on all the questions in the DB ..."
+		build_and_send_message(socket_connection, chatlib.PROTOCOL_SERVER["no_questions_msg"], data)
+	else:
+		build_and_send_message(socket_connection, chatlib.PROTOCOL_SERVER["your_question_msg"], data)
+
+
+def handle_answer_message(socket_connection, user_name, data):
+	"""
+	Explanations: Check the answer of the client - only a question that the user was asked, and didn't answer yet, is scored.
+
+	Receives: socket_connection (socket object), user_name (str), data (str).
+
+	Returns: None.
+	"""
 	global users
 	global questions
-	global messages_to_send
+
+	answer_fields    = chatlib.split_data(msg=data, expected_delimeters=1)
+	question_details = None
+	if len(answer_fields) == 2 and answer_fields[0].isascii() and answer_fields[0].isdigit():
+		id_question, user_answer = answer_fields
+		question_details         = questions.get(int(id_question))
+
+	if question_details is None or not (user_answer.isascii() and user_answer.isdigit()) or not 1 <= int(user_answer) <= len(question_details["answers"]):
+		data = f'[SERVER] Wrong. You try to type answer that not related to the options ...'
+		build_and_send_message(socket_connection, chatlib.PROTOCOL_SERVER["wrong_answer_msg"], data)
+	else:
+		correct = int(user_answer) == question_details["correct"]
+		score   = users.answer_question(user_name, int(id_question), CORRECT_ANSWER_POINT if correct else 0)
+		if score is None:
+			data = f'[SERVER] The question : {id_question} - Was not asked, or already answered ...'
+			build_and_send_message(socket_connection, chatlib.PROTOCOL_SERVER["wrong_answer_msg"], data)
+		elif correct:
+			record_score_change(user_name, score)
+			data = f'[SERVER] Great, Correct Answer ...'
+			build_and_send_message(socket_connection, chatlib.PROTOCOL_SERVER["correct_answer_msg"], data)
+		else:
+			data = f'[SERVER] Wrong. The Correct Answer : {str(question_details["correct"])}'
+			build_and_send_message(socket_connection, chatlib.PROTOCOL_SERVER["wrong_answer_msg"], data)
+
+
+def print_client_sockets():
+	"""
+	Explanations: Print all clients sessions.
+
+	Returns: None.
+	"""
+	global client_sessions
+
+	for session in client_sessions:
+		client_ip, client_port = session.address
+		print(f'{session.user_name} : ({client_ip} , {client_port})')
+
+
+def clean_current_socket(server_selector, socket_connection):
+	"""
+	Explanations: Remove all details of specific socket connection.
+
+	Receives: server_selector (selectors.BaseSelector), socket_connection (socket object).
+
+	Returns: None.
+	"""
+	global write_watched
+
+	logger.info("Connection of %s Closed ...", client_sessions.get(socket_connection))
+	server_selector.unregister(socket_connection)
+	write_watched.discard(socket_connection)
+	drop_pending_messages(socket_connection)
+	handle_logout_message(socket_connection)
+
+
+# LOOP CALLBACKS #
+def call_in_loop(callback, *args):
+	"""
+	Explanations: Runs the callback in the thread of the server loop (thread-safe - background threads use it to hand over results).
+	In the asyncio engine the callback goes to the asyncio loop, and in the select engine it is queued, and the loop is woken up.
+	Callbacks that are queued before the asyncio loop starts are moved to it by run_asyncio_server (under the same lock, so none is lost).
+
+	Receives: callback (function), args.
+
+	Returns: None.
+	"""
+	with loop_callbacks_lock:
+		if running_loop is not None:
+			running_loop.call_soon_threadsafe(callback, *args)
+			return
+
+		loop_callbacks.append((callback, args))
+
+	if wakeup_sockets is not None:
+		try:
+			wakeup_sockets[1].send(b"\0")
+		except BlockingIOError:
+			pass
+
+
+def run_loop_callbacks():
+	"""
+	Explanations: Runs all the callbacks that were queued by call_in_loop (select engine).
+
+	Returns: None.
+	"""
+	while loop_callbacks:
+		callback, args = loop_callbacks.popleft()
+		callback(*args)
+
+
+# CONNECTION DEADLINES #
+def connection_deadline(session):
+	"""
+	Explanations: The time that the connection should be closed at - the idle deadline (after the last complete message),
+	or the read deadline of a message that was started and not completed yet, the earlier of them.
+	A multiplexed connection (gateway) has no idle deadline - every session on it has its own.
+
+	Receives: session (Session).
+
+	Returns: time.monotonic() time (float), or None if the connection has no deadline.
+	"""
+	deadlines = []
+	if IDLE_TIMEOUT and session.channels is None:
+		deadlines.append(session.last_active + IDLE_TIMEOUT)
+	if READ_TIMEOUT and session.partial_since is not None:
+		deadlines.append(session.partial_since + READ_TIMEOUT)
+	return min(deadlines, default=None)
+
+
+def schedule_deadline(session):
+	"""
+	Explanations: Schedules the deadlines timer of the connection (one timer per connection, in the timer wheel).
+	Messages don't move the timer - when it expires, check_deadline schedules it again if the client was active meanwhile.
+
+	Receives: session (Session).
+
+	Returns: None.
+	"""
+	deadline      = connection_deadline(session)
+	session.timer = deadline_timers.schedule(deadline, check_deadline, session) if deadline is not None else None
+
+
+def check_deadline(session):
+	"""
+	Explanations: The deadlines timer of the connection expired - closes the connection if its deadline passed, else schedules it again.
+
+	Receives: session (Session).
+
+	Returns: None.
+	"""
+	session.timer = None
+	if client_sessions.get(session.connection) is not session:
+		return
+
+	deadline = connection_deadline(session)
+	if deadline is not None and deadline <= time.monotonic():
+		server_metrics.timeouts += 1
+		logger.info("[SERVER] Connection of %s Timed Out ...", session)
+		if isinstance(session.connection, sessions.MuxChannel):
+			close_channel(session.connection)
+		else:
+			expire_connection(session.connection)
+	else:
+		schedule_deadline(session)
+
+
+def update_read_deadline(session, completed):
+	"""
+	Explanations: Updates the activity of the connection after a read - the time of the last complete message,
+	and the start of a message that isn't complete yet (the timer is moved earlier only if the read deadline is before it).
+
+	Receives: session (Session), completed (bool) - the read completed some messages.
+
+	Returns: None.
+	"""
+	now = time.monotonic()
+	if completed:
+		session.last_active = now
+
+	if not session.decoder.buffer:
+		session.partial_since = None
+	elif session.partial_since is None:
+		session.partial_since = now
+		if READ_TIMEOUT and (session.timer is None or session.timer.expires * TIMER_TICK > now + READ_TIMEOUT):
+			if session.timer is not None:
+				deadline_timers.cancel(session.timer)
+			schedule_deadline(session)
+
+
+def check_overload():
+	"""
+	Explanations: Measures the loop lag (how late this timer runs after its tick) and the outbound queues,
+	and updates the overload mode. Runs every OVERLOAD_CHECK seconds, on the timer wheel of the loop.
+
+	Returns: None.
+	"""
+	global overload_timer
+
+	now      = time.monotonic()
+	loop_lag = max(now - overload_timer.expires * TIMER_TICK, 0.0)
+	if overload_detector.update(loop_lag, outbound_queue_bytes()):
+		logger.warning("[SERVER] Overload Mode %s (loop lag %.3f s, outbound queues %d bytes) ...",
+					   "On" if overload_detector.overloaded else "Off", loop_lag, overload_detector.queue_bytes)
+	overload_timer = deadline_timers.schedule(now + OVERLOAD_CHECK, check_overload)
+
+
+def start_overload_checks():
+	global overload_timer
+
+	if overload_detector.max_lag or overload_detector.max_queue_bytes:
+		overload_timer = deadline_timers.schedule(time.monotonic() + OVERLOAD_CHECK, check_overload)
+
+
+def accept_connection(connection, address):
+	"""
+	Explanations: Opens the session of a new connection (and its deadlines timer), or rejects it with an error message
+	if the server already has MAX_CONNECTIONS connected clients.
+
+	Receives: connection (socket object, or AsyncClientConnection), address (ip, port).
+
+	Returns: session (Session), or None if the connection was rejected (and closed).
+	"""
+	if MAX_CONNECTIONS and len(client_sessions) >= MAX_CONNECTIONS:
+		server_metrics.rejects += 1
+		logger.warning("[SERVER] Client %s Rejected - the Server is Full (%d Connections) ...", address, MAX_CONNECTIONS)
+		try:
+			send_error(connection, "[SERVER] The Server is Full, please try again later ...")
+		except OSError:
+			pass
+		connection.close()
+		return None
+
+	server_metrics.accepts += 1
+	logger.info("[SERVER] New Client %s Joined ...", address)
+	session = client_sessions.open(connection, address)
+	schedule_deadline(session)
+	return session
+
+
+# SERVER ENGINES #
+class AsyncClientConnection:
+	"""
+	Explanations: Wraps the asyncio streams of one client, so the handle_*_message functions
+	can work with it exactly like with a socket object (send / close).
+	"""
+
+	def __init__(self, reader, writer):
+		self.reader = reader
+		self.writer = writer
+
+	def send(self, data):
+		self.writer.write(data)
+		return len(data)
+
+	def close(self):
+		self.writer.close()
+
+	def abort(self):
+		self.writer.transport.abort()
+
+	async def recv_messages_and_parse(self):
+		"""
+		Explanations: Same as recv_messages_and_parse, for the asyncio stream of this client.
+
+		Returns: list of (msg_code (str), data (str)).
+		"""
+		return parse_received_data(self, await self.reader.read(chatlib.MAX_MSG_LENGTH))
+
+
+async def handle_async_client(reader, writer):
+	"""
+	Explanations: One coroutine per client - reads messages from the client, handles them with
+	handle_client_message, then flushes the answers that the handlers queued in the outgoing buffers
+	(once per read, so pipelined messages are answered together).
+
+	Receives: reader (asyncio.StreamReader), writer (asyncio.StreamWriter).
+
+	Returns: None.
+	"""
+	connection = AsyncClientConnection(reader, writer)
+	session    = accept_connection(connection, writer.get_extra_info("peername"))
+	if session is None:
+		return
+
+	try:
+		connected = True
+		while connected:
+			client_messages = await connection.recv_messages_and_parse()
+			if session.channels is not None:
+				connected       = handle_mux_messages(connection, client_messages)
+				client_messages = ()
+
+			for client_cmd, client_data in client_messages:
+				if client_cmd == "" or client_cmd == chatlib.PROTOCOL_CLIENT["logout_msg"] or client_cmd == chatlib.ERROR_RETURN:
+					connected = False
+					break
+
+				handle_client_message(connection, client_cmd, client_data)
+
+			send_pending_messages()
+			await writer.drain()
+	except (ConnectionError, OSError):
+		pass
+	finally:
+		logger.info("Connection of %s Closed ...", session)
+		drop_pending_messages(connection)
+		handle_logout_message(connection)
+
+
+async def run_asyncio_server(reuse_port=False):
+	"""
+	Explanations: Runs the server with asyncio (asyncio.start_server), one coroutine per client.
+
+	Receives: reuse_port (bool).
+
+	Returns: None.
+	"""
+	global running_loop
+	global expire_connection
+
+	with loop_callbacks_lock:
+		running_loop = asyncio.get_running_loop()
+		while loop_callbacks:
+			callback, args = loop_callbacks.popleft()
+			running_loop.call_soon(callback, *args)
+	expire_connection = AsyncClientConnection.abort
+	deadlines_task = running_loop.create_task(run_deadline_timers())
+	start_overload_checks()
+
+	server = await asyncio.start_server(handle_async_client, SERVER_IP, SERVER_PORT, reuse_port=reuse_port)
+	logger.info("[SERVER] Server is Up and Running (asyncio) ...")
+	async with server:
+		await server.serve_forever()
+
+
+async def run_deadline_timers():
+	"""
+	Explanations: Advances the deadlines timer wheel every tick (asyncio engine).
+
+	Returns: None.
+	"""
+	while True:
+		await asyncio.sleep(deadline_timers.timeout(time.monotonic()) or TIMER_TICK)
+		deadline_timers.advance(time.monotonic())
+		send_pending_messages()
 
 
-	print("Welcome to Trivia Server !")
-	questions       = load_questions_from_web()
-	users           = load_user_database()
-	server_socket   = setup_socket()
-	clients_sockets = []
+def update_write_interest(server_selector):
+	"""
+	Explanations: Updates the selector interest of the sockets that their write blocked state changed -
+	write blocked sockets are watched also for writing, and sockets that sent everything go back to reading only.
+	Only the changed sockets are touched, so the cost doesn't depend on the number of connected clients.
+
+	Receives: server_selector (selectors.BaseSelector).
+
+	Returns: None.
+	"""
+	global pending_sockets
+	global write_blocked
+	global write_watched
+
+	for socket_connection in write_blocked - write_watched:
+		server_selector.modify(socket_connection, selectors.EVENT_READ | selectors.EVENT_WRITE)
+		write_watched.add(socket_connection)
+
+	for socket_connection in write_watched - pending_sockets:
+		server_selector.modify(socket_connection, selectors.EVENT_READ)
+		write_watched.discard(socket_connection)
+
+
+def run_select_server(reuse_port=False):
+	"""
+	Explanations: Runs the server with one synchronous event loop over all the sockets,
+	on selectors.DefaultSelector (epoll on Linux, so there is no FD_SETSIZE limit).
+	Every socket is registered once, when accepted. The sockets are non-blocking,
+	and a socket is watched for writing only while its pending data is blocked by a full kernel buffer.
+
+	Receives: reuse_port (bool).
+
+	Returns: None.
+	"""
+	global wakeup_sockets
+	global expire_connection
+
+	server_socket   = setup_socket(reuse_port)
+	server_selector = selectors.DefaultSelector()
+	server_selector.register(server_socket, selectors.EVENT_READ)
+
+	wakeup_sockets = socket.socketpair()
+	for wakeup_socket in wakeup_sockets:
+		wakeup_socket.setblocking(False)
+	server_selector.register(wakeup_sockets[0], selectors.EVENT_READ)
+	run_loop_callbacks()
+	expire_connection = lambda socket_connection: clean_current_socket(server_selector, socket_connection)
+	start_overload_checks()
 
 	while True:
-		print("Waiting for new connection ...")
-
-		ready_to_read, ready_to_write, in_error = select.select([server_socket] + clients_sockets, clients_sockets, [])
-		for current_socket in ready_to_read:
-			if current_socket is server_socket:
-				(client_socket, client_address) = server_socket.accept()
-				print(f'[SERVER] New Client {client_address} Joined ...')
-				clients_sockets.append(client_socket)
+		logger.debug("Waiting for new connection ...")
+
+		for selector_key, events in server_selector.select(deadline_timers.timeout(time.monotonic())):
+			current_socket = selector_key.fileobj
+			if events & selectors.EVENT_WRITE:
+				write_blocked.discard(current_socket)
+			if not events & selectors.EVENT_READ:
+				continue
+
+			if current_socket is wakeup_sockets[0]:
+				try:
+					current_socket.recv(4096)
+				except BlockingIOError:
+					pass
+				run_loop_callbacks()
+
+			elif current_socket is server_socket:
+				try:
+					(client_socket, client_address) = server_socket.accept()
+				except OSError as accept_error:
+					logger.error("[SERVER] Accept Failed : %s", accept_error)
+					continue
+				if accept_connection(client_socket, client_address) is not None:
+					client_socket.setblocking(False)
+					server_selector.register(client_socket, selectors.EVENT_READ)
 			else:
-				print(f"[SERVER] New Data From Existing Client {current_socket} ...")
+				logger.debug("[SERVER] New Data From Existing Client %s ...", current_socket)
 				try:
-					client_cmd, client_data = recv_message_and_parse(current_socket)
+					client_messages = recv_messages_and_parse(current_socket)
+				except BlockingIOError:
+					continue
 				except (socket.error, KeyboardInterrupt, OSError):
-					clean_current_socket(clients_sockets, current_socket)
+					clean_current_socket(server_selector, current_socket)
 				else:
-					"""
-					Explanations :
-					client_cmd == ""                                    : It Means that the Client Press on Ctrl + C.
-					client_cmd == chatlib.PROTOCOL_CLIENT["logout_msg"] : It Means that the Client sent Logout Message.
-					client_cmd == chatlib.ERROR_RETURN                  : It Means that there is error / issue in connection between Client and Server.
-					"""
-					if client_cmd == "" or client_cmd == chatlib.PROTOCOL_CLIENT["logout_msg"] or client_cmd == chatlib.ERROR_RETURN:
-						clean_current_socket(clients_sockets, current_socket)
-					else:
-						handle_client_message(current_socket, client_cmd, client_data)
-
-						for message in messages_to_send:
-							socket_to_send, data_to_send = message
-							if socket_to_send in ready_to_write:
-								socket_to_send.send(data_to_send.encode())
-								messages_to_send.remove(message)
+					if client_sessions.get(current_socket).channels is not None:
+						if not handle_mux_messages(current_socket, client_messages):
+							clean_current_socket(server_selector, current_socket)
+						continue
+
+					for client_cmd, client_data in client_messages:
+						"""
+						Explanations :
+						client_cmd == ""                                    : It Means that the Client Press on Ctrl + C.
+						client_cmd == chatlib.PROTOCOL_CLIENT["logout_msg"] : It Means that the Client sent Logout Message.
+						client_cmd == chatlib.ERROR_RETURN                  : It Means that there is error / issue in connection between Client and Server.
+						"""
+						if client_cmd == "" or client_cmd == chatlib.PROTOCOL_CLIENT["logout_msg"] or client_cmd == chatlib.ERROR_RETURN:
+							clean_current_socket(server_selector, current_socket)
+							break
+						else:
+							handle_client_message(current_socket, client_cmd, client_data)
+
+		deadline_timers.advance(time.monotonic())
+
+		for broken_socket in send_pending_messages():
+			clean_current_socket(server_selector, broken_socket)
+
+		update_write_interest(server_selector)
+
+
+def run_server(engine, reuse_port=False, worker_index=0):
+	"""
+	Explanations: Runs the server with the wanted engine. Every worker serves its metrics on its own port (METRICS_PORT + worker index).
+
+	Receives: engine (str) - "select" or "asyncio", reuse_port (bool), worker_index (int).
+
+	Returns: None.
+	"""
+	if QUESTIONS_URL and questions_bank is None:
+		start_questions_refresher()
+	elif QUESTIONS_URL:
+		pull_questions_bank()
+
+	if METRICS_PORT:
+		metrics.start_metrics_server(server_metrics, METRICS_HOST, METRICS_PORT + worker_index)
+		logger.info(f'[SERVER] Metrics on http://{METRICS_HOST}:{METRICS_PORT + worker_index}/metrics ...')
+
+	if engine == "asyncio":
+		asyncio.run(run_asyncio_server(reuse_port))
+	else:
+		run_select_server(reuse_port)
+
+
+def run_worker(state_address, engine, worker_index):
+	"""
+	Explanations: Entry point of one worker process - replaces the users and logged_users dictionaries
+	with proxies to the state owner process, then runs the server on the shared port.
+
+	Receives: state_address (address of the StateManager), engine (str), worker_index (int).
+
+	Returns: None.
+	"""
+	global users
+	global logged_users
+	global changes_position
+	global questions_bank
+
+	server_logging.start_listener()
+	users, logged_users, questions_bank = shared_state.connect_state_manager(state_address)
+	answers_cache.enabled               = False  # The logins and the scores of the other workers don't bump the versions of this worker
+	changes_position                    = users.score_changes_since(None)[0]
+	logger.info(f'[SERVER] Worker {os.getpid()} Started ...')
+	run_server(engine, reuse_port=True, worker_index=worker_index)
+
+
+def run_workers(workers_count, engine):
+	"""
+	Explanations: Runs the server in some worker processes that share the port with SO_REUSEPORT.
+	The users and logged_users dictionaries live in one state owner process, so login, scoring and HIGHSCORE
+	are the same in all the workers. The questions are loaded once here, and the workers get them on fork -
+	the web refresh runs only here, and the workers pull every refreshed bank from the state owner process.
+
+	Receives: workers_count (int), engine (str).
+
+	Returns: None.
+	"""
+	journal_path  = os.path.join(os.getcwd(), score_journal.JOURNAL_FILE_NAME)
+	state_manager = shared_state.start_state_manager(users, journal_path, storage)
+	workers       = [multiprocessing.Process(target=run_worker, args=(state_manager.address, engine, worker_index)) for worker_index in range(workers_count)]
+
+	for worker in workers:
+		worker.start()
+
+	if QUESTIONS_URL:
+		start_questions_refresher(publish_questions=state_manager.questions_bank().publish)
+
+	try:
+		for worker in workers:
+			worker.join()
+	except KeyboardInterrupt:
+		for worker in workers:
+			worker.terminate()
+	finally:
+		state_manager.shutdown()
+
+
+# MAIN #
+def main():
+	# Initializes global users and questions dictionaries using load functions, will be used later #
+	global users
+	global questions
+	global storage
+	global QUESTIONS_URL
+	global QUESTIONS_REFRESH
+	global password_verifier
+	global METRICS_PORT
+	global ADMIN_USERS
+	global IDLE_TIMEOUT
+	global READ_TIMEOUT
+	global MAX_CONNECTIONS
+	global RATE_LIMIT
+	global RATE_BURST
+	global UPSTREAM_RATE
+	global MAX_CHANNELS
+	global MUX_SECRET
+	global overload_detector
+
+	parser = argparse.ArgumentParser(description="Trivia Server")
+	parser.add_argument("--engine", choices=["select", "asyncio"], default="select", help="Server engine : one select() loop, or asyncio with one coroutine per client")
+	parser.add_argument("--workers", type=int, default=1, help="Number of worker processes that share the server port (SO_REUSEPORT)")
+	parser.add_argument("--storage", choices=["text", "sqlite"], default="text", help="Storage of the users and questions : the text tables, or an SQLite database")
+	parser.add_argument("--database", default=None, help="Path of the SQLite database (default : trivia.db in the working directory)")
+	parser.add_argument("--questions-url", default=QUESTIONS_URL, help="URL of the questions bank refresh (opentdb format), empty - no refresh")
+	parser.add_argument("--questions-refresh", type=float, default=QUESTIONS_REFRESH, help="Seconds between refreshes of the questions bank (0 - refresh only at startup)")
+	parser.add_argument("--questions-bank", default=None, help="Memory-mapped questions bank file (made by question_bank.py), instead of the cache / storage - no web refresh")
+	parser.add_argument("--password-workers", type=int, default=passwords.PASSWORD_WORKERS, help="Threads that verify the password hashes of the logins")
+	parser.add_argument("--max-pending-logins", type=int, default=passwords.MAX_PENDING_LOGINS, help="Max password verifications in flight - more logins are answered with an error")
+	parser.add_argument("--metrics-port", type=int, default=METRICS_PORT, help="Port of the local Prometheus metrics endpoint (0 - no endpoint, workers use port + worker index)")
+	parser.add_argument("--admin", action="append", default=None, help="Admin user that can send STATS (default : master)")
+	parser.add_argument("--idle-timeout", type=float, default=IDLE_TIMEOUT, help="Seconds without a message (or PING) before a client is disconnected (0 - never)")
+	parser.add_argument("--read-timeout", type=float, default=READ_TIMEOUT, help="Seconds to complete a started message before the client is disconnected (0 - never)")
+	parser.add_argument("--max-connections", type=int, default=MAX_CONNECTIONS, help="Max connected clients (per worker) - more connections are rejected with an error (0 - no limit)")
+	parser.add_argument("--rate-limit", type=float, default=RATE_LIMIT, help="Tokens per second of every session - commands cost tokens by their weight (0 - no rate limit)")
+	parser.add_argument("--rate-burst", type=float, default=RATE_BURST, help="Max tokens of a session")
+	parser.add_argument("--upstream-rate-limit", type=float, default=UPSTREAM_RATE, help="Tokens per second of a gateway connection, for all the sessions on it (0 - no limit)")
+	parser.add_argument("--max-channels", type=int, default=MAX_CHANNELS, help="Max sessions on one gateway connection")
+	parser.add_argument("--mux-secret", default=MUX_SECRET, help="Secret that the gateways send with PROTOCOL MUX (default : $TRIVIA_MUX_SECRET, none - no gateways)")
+	parser.add_argument("--overload-lag", type=float, default=rate_limits.MAX_LOOP_LAG, help="Seconds of loop lag that start the overload mode - expensive commands get BUSY (0 - not checked)")
+	parser.add_argument("--overload-queue", type=int, default=rate_limits.MAX_QUEUE_BYTES, help="Bytes in the outbound queues that start the overload mode (0 - not checked)")
+	parser.add_argument("--watch-tables", type=float, default=0, help="Seconds between checks of questions.txt and users.txt - changed rows are reloaded (0 - only by the RELOAD admin command)")
+	parser.add_argument("--log-level", choices=["DEBUG", "INFO", "WARNING", "ERROR"], default=server_logging.DEFAULT_LOG_LEVEL, help="Level of the server logs")
+	parser.add_argument("--trace", action="store_true", help="Log every protocol message from start (switch on / off at runtime with kill -USR1 <pid>)")
+	parser.add_argument("--trace-sample", action="append", default=[], metavar="CMD=N", help="Log only 1 of every N traced messages of CMD (N alone - of every command)")
+	args = parser.parse_args()
+
+	password_verifier = passwords.PasswordVerifier(args.password_workers, args.max_pending_logins)
+	QUESTIONS_URL     = args.questions_url if args.questions_bank is None else ""
+	QUESTIONS_REFRESH = args.questions_refresh
+	METRICS_PORT      = args.metrics_port
+	ADMIN_USERS       = set(args.admin) if args.admin else ADMIN_USERS
+	IDLE_TIMEOUT      = args.idle_timeout
+	READ_TIMEOUT      = args.read_timeout
+	MAX_CONNECTIONS   = args.max_connections
+	RATE_LIMIT        = args.rate_limit
+	RATE_BURST        = args.rate_burst
+	UPSTREAM_RATE     = args.upstream_rate_limit
+	MAX_CHANNELS      = args.max_channels
+	MUX_SECRET        = args.mux_secret
+	overload_detector = rate_limits.OverloadDetector(args.overload_lag, args.overload_queue)
+
+	server_logging.setup_logging(args.log_level, args.trace, args.trace_sample)
+	logger.info("Welcome to Trivia Server !")
+	storage      = storage_backends.create_storage(args.storage, os.getcwd(), args.database)
+	users        = load_user_database()
+	questions    = load_questions_cache() if args.questions_bank is None else question_bank.MappedQuestionBank(args.questions_bank)
+	from_file    = questions is None and not QUESTIONS_URL  # The bank is questions.txt (not the cache, a bank file or the web)
+	if questions is None:
+		questions = {}
+		load_questions()
+	else:
+		index_questions()
+	journal_path = os.path.join(os.getcwd(), score_journal.JOURNAL_FILE_NAME)
+	logger.info(f'[SERVER] Replayed {score_journal.replay_journal(journal_path, users)} Records From the Score Journal ...')
+	if args.workers <= 1 and isinstance(storage, storage_backends.TextStorage):
+		start_hot_reload(args.watch_tables, from_file)
+
+	try:
+		if args.workers > 1:
+			run_workers(args.workers, args.engine)
+		else:
+			users.attach_journal(score_journal.ScoreJournal(journal_path, users, save_user_database))
+			try:
+				run_server(args.engine)
+			finally:
+				users.journal.close()
+	finally:
+		server_logging.stop_logging()
 
 
 if __name__ == '__main__':
@@ -0,0 +1,122 @@
+import sys
+import queue
+import signal
+import logging
+import threading
+import logging.handlers
+
+
+# Logging Constants #
+LOGGER_NAME       = "trivia"
+LOG_FORMAT        = "%(asctime)s %(levelname)-7s %(processName)s | %(message)s"
+DEFAULT_LOG_LEVEL = "INFO"
+TRACE_SIGNAL      = getattr(signal, "SIGUSR1", None)   # kill -USR1 <pid> switches the wire tracing on / off
+
+logger      = logging.getLogger(LOGGER_NAME)
+wire_logger = logging.getLogger(LOGGER_NAME + ".wire")
+
+
+class WireTrace:
+	"""
+	Explanations: Tracing of every protocol message that the server receives and sends (off by default).
+	The server checks wire_trace.enabled before it builds anything, so a disabled trace costs one attribute read per message.
+	Every message type can be sampled - with a rate of N, only 1 of every N messages of the type is logged.
+
+	enabled      : bool - can be switched at runtime (toggle / TRACE_SIGNAL).
+	sample_rates : cmd ---> N (commands that aren't in it are logged with default_rate).
+	"""
+
+	def __init__(self):
+		self.enabled      = False
+		self.default_rate = 1
+		self.sample_rates = {}
+		self.counters     = {}
+
+	def toggle(self, *signal_args):
+		self.enabled = not self.enabled
+		logger.warning(f'[SERVER] Wire Tracing {"On" if self.enabled else "Off"} ...')
+
+	def log(self, direction, cmd, data):
+		"""
+		Explanations: Logs the message, if it is in the sample of its type.
+
+		Receives: direction (str) - "CLIENT" (received) or "SERVER" (sent), cmd (str), data (str).
+
+		Returns: None.
+		"""
+		count = self.counters[cmd] = self.counters.get(cmd, 0) + 1
+		if count % self.sample_rates.get(cmd, self.default_rate) == 0:
+			wire_logger.debug("[%s] %s %s", direction, cmd, data)
+
+
+wire_trace = WireTrace()
+listener   = None
+
+
+def parse_sample_rates(sample_specs):
+	"""
+	Explanations: Parses the --trace-sample options.
+
+	Receives: sample_specs (list of str) - "CMD=N", or "N" for the default rate of all the commands.
+
+	Returns: default_rate (int), sample_rates (dict).
+	"""
+	default_rate = 1
+	sample_rates = {}
+	for sample_spec in sample_specs:
+		cmd, _, rate = sample_spec.rpartition("=")
+		if cmd: sample_rates[cmd] = max(1, int(rate))
+		else:   default_rate      = max(1, int(rate))
+	return default_rate, sample_rates
+
+
+def setup_logging(level=DEFAULT_LOG_LEVEL, trace=False, sample_specs=()):
+	"""
+	Explanations: Sets the log level and the wire tracing of the server, and starts the log listener.
+
+	Receives: level (str), trace (bool) - wire tracing at start, sample_specs (list of str) - see parse_sample_rates.
+
+	Returns: None.
+	"""
+	logger.setLevel(level)
+	wire_logger.setLevel(logging.DEBUG)
+
+	wire_trace.enabled = trace
+	wire_trace.default_rate, wire_trace.sample_rates = parse_sample_rates(sample_specs)
+	if TRACE_SIGNAL is not None and threading.current_thread() is threading.main_thread():
+		signal.signal(TRACE_SIGNAL, wire_trace.toggle)
+
+	start_listener()
+
+
+def start_listener():
+	"""
+	Explanations: Sends the logs of the server to a queue, and writes them to stdout in a background thread
+	(QueueListener), so a slow terminal or pipe never blocks the server loop. Called again in every worker process
+	after fork (the listener thread of the parent doesn't exist in the child).
+
+	Returns: None.
+	"""
+	global listener
+
+	log_queue = queue.SimpleQueue()
+	handler   = logging.StreamHandler(sys.stdout)
+	handler.setFormatter(logging.Formatter(LOG_FORMAT))
+	listener  = logging.handlers.QueueListener(log_queue, handler)
+	listener.start()
+
+	logger.handlers  = [logging.handlers.QueueHandler(log_queue)]
+	logger.propagate = False
+
+
+def stop_logging():
+	"""
+	Explanations: Writes the logs that are still in the queue, and stops the background thread.
+
+	Returns: None.
+	"""
+	global listener
+
+	if listener is not None:
+		listener.stop()
+		listener = None
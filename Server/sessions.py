@@ -0,0 +1,156 @@
+import time
+import chatlib
+
+
+class Session:
+	"""
+	Explanations: The state of one client connection, created when the connection is accepted.
+	Everything that the handlers need about the connection is kept here (the peer address is saved at accept time),
+	so no handler calls getpeername() on a socket that may be already closed.
+
+	connection    : socket object (or AsyncClientConnection).
+	address       : (ip, port) of the client.
+	user_name     : the logged in user, or None before login.
+	decoder       : chatlib decoder of the stream (MessageDecoder, or BinaryMessageDecoder after protocol negotiation).
+	binary        : True if the answers are sent in the binary protocol.
+	batch_replies : list of the answers of the BATCH that is running now, or None.
+	waiting       : while the password of a login is verified - deque of (handler, args) that arrived meanwhile, else None.
+	channels      : for a multiplexed connection (gateway) - session id ---> MuxChannel of the client sessions on it, else None.
+	last_active   : time.monotonic() of the last complete message (for the idle deadline).
+	partial_since : time.monotonic() since a part of a message waits in the decoder (for the read deadline), or None.
+	timer         : the deadlines timer of the connection (TimerWheel timer), or None.
+	bucket        : the rate limit token bucket of the session (created on the first command), or None.
+	"""
+	__slots__ = ("connection", "address", "user_name", "decoder", "binary", "batch_replies", "waiting", "channels",
+				 "last_active", "partial_since", "timer", "bucket")
+
+	def __init__(self, connection, address):
+		self.connection    = connection
+		self.address       = address
+		self.user_name     = None
+		self.decoder       = chatlib.MessageDecoder()
+		self.binary        = False
+		self.batch_replies = None
+		self.waiting       = None
+		self.channels      = None
+		self.last_active   = time.monotonic()
+		self.partial_since = None
+		self.timer         = None
+		self.bucket        = None
+
+	def __repr__(self):
+		return f'Session({self.user_name}, {self.address})'
+
+
+class MuxChannel:
+	"""
+	Explanations: One client session inside a multiplexed connection (tagged with session_id by the gateway).
+	The handlers get it instead of a socket, and the answers are tagged with the session id and queued on the upstream connection.
+
+	upstream   : the multiplexed connection (socket object, or AsyncClientConnection).
+	session_id : int - the tag of the session in the frames.
+	"""
+	__slots__ = ("upstream", "session_id", "channels")
+
+	def __init__(self, upstream, session_id, channels):
+		self.upstream   = upstream
+		self.session_id = session_id
+		self.channels   = channels
+
+	def __repr__(self):
+		return f'MuxChannel({self.session_id})'
+
+	def close(self):
+		self.channels.pop(self.session_id, None)
+
+
+class SessionTable:
+	"""
+	Explanations: The sessions of the server process, with an index from user name to the sessions of the user
+	(a user may be logged in from some connections), so finding the session of a connection, login and logout are O(1).
+
+	by_connection : connection ---> Session.
+	by_user       : user_name ---> set of Session.
+	channels      : number of the sessions that are MuxChannel (not a connection of their own).
+	"""
+
+	def __init__(self):
+		self.by_connection = {}
+		self.by_user       = {}
+		self.channels      = 0
+
+	def __len__(self):
+		return len(self.by_connection)
+
+	def __iter__(self):
+		return iter(list(self.by_connection.values()))
+
+	def open(self, connection, address):
+		"""
+		Explanations: Creates the session of a new connection.
+
+		Returns: session (Session).
+		"""
+		session = self.by_connection[connection] = Session(connection, address)
+		return session
+
+	def open_channel(self, upstream, session_id):
+		"""
+		Explanations: Finds the session of a session id tag on a multiplexed connection (created on the first message of the session).
+
+		Returns: channel (MuxChannel) - the connection of the session.
+		"""
+		channels = self.by_connection[upstream].channels
+		channel  = channels.get(session_id)
+		if channel is None:
+			channel = channels[session_id] = MuxChannel(upstream, session_id, channels)
+			self.open(channel, self.by_connection[upstream].address)
+			self.channels += 1
+		return channel
+
+	def get(self, connection):
+		return self.by_connection.get(connection)
+
+	def login(self, session, user_name):
+		"""
+		Explanations: Marks the session as logged in by the user (a session that was logged in by another user is logged out first).
+
+		Returns: None.
+		"""
+		if session.user_name is not None:
+			self.logout(session)
+
+		session.user_name = user_name
+		self.by_user.setdefault(user_name, set()).add(session)
+
+	def logout(self, session):
+		"""
+		Explanations: Marks the session as not logged in.
+
+		Returns: True if it was the last session of the user.
+		"""
+		user_name, session.user_name = session.user_name, None
+		user_sessions                = self.by_user.get(user_name)
+		if user_sessions is None:
+			return False
+
+		user_sessions.discard(session)
+		if user_sessions:
+			return False
+
+		del self.by_user[user_name]
+		return True
+
+	def close(self, connection):
+		"""
+		Explanations: Removes the session of a closed connection.
+
+		Returns: session (Session), or None if the connection has no session.
+		"""
+		session = self.by_connection.pop(connection, None)
+		if session is not None and isinstance(connection, MuxChannel):
+			self.channels -= 1
+		return session
+
+	def user_sessions(self, user_name):
+		return self.by_user.get(user_name, ())
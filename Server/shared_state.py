@@ -0,0 +1,350 @@
+import threading
+import collections
+from multiprocessing import util
+from leaderboard import Leaderboard
+from score_journal import ScoreJournal
+from multiprocessing.managers import BaseManager, MakeProxyType
+
+
+# Shared State Constants #
+MAX_SCORE_CHANGES = 100000  # Score changes that the state owner process keeps for the workers that push them to subscribers
+
+
+class UserTable(dict):
+	"""
+	Explanations: The users dictionary of the server (user name ---> {"password", "score", "questions_asked"}).
+	Every change of a user is done by a method of the table, so the same server code works on a local table
+	(one process), and on a proxy of the table that the state owner process shares between the workers.
+	The table keeps a Leaderboard of the users, that every score change updates,
+	and records every change in the ScoreJournal (if attached).
+	With a lazy storage (SQLite), only the leaderboard (user name, score) is loaded at boot,
+	and a user is loaded from the storage on the first access to it.
+
+	open_questions : user name ---> set of the questions that the user was asked and didn't answer yet (in memory only) -
+	every asked question is scored once, also when the user plays on some workers.
+	asked_ids      : user name ---> set of the ids of questions_asked (built on the first check of the user) -
+	checking a question is O(1), and the list keeps the order of the storage.
+	score_changes  : deque of (position, user name, score) of the last score changes (see track_score_changes), or None.
+	"""
+	lock          = threading.Lock()
+	journal       = None
+	storage       = None
+	score_changes = None
+
+	def __init__(self, *args, **kwargs):
+		super().__init__()
+		self.leaderboard    = Leaderboard()
+		self.open_questions = {}
+		self.asked_ids      = {}
+		self.update(*args, **kwargs)
+
+	def __setitem__(self, user_name, user_details):
+		super().__setitem__(user_name, user_details)
+		self.asked_ids.pop(user_name, None)
+		self.leaderboard.update(user_name, user_details["score"])
+
+	def __missing__(self, user_name):
+		user_details = self.storage.load_user(user_name) if self.storage is not None else None
+		if user_details is None:
+			raise KeyError(user_name)
+
+		super().__setitem__(user_name, user_details)
+		return user_details
+
+	def __contains__(self, user_name):
+		return super().__contains__(user_name) or user_name in self.leaderboard.scores
+
+	def get(self, user_name, default=None):
+		try:
+			return self[user_name]
+		except KeyError:
+			return default
+
+	def __delitem__(self, user_name):
+		super().__delitem__(user_name)
+		self.asked_ids.pop(user_name, None)
+		self.leaderboard.remove(user_name)
+
+	def update(self, *args, **kwargs):
+		for user_name, user_details in dict(*args, **kwargs).items():
+			self[user_name] = user_details
+
+	def add_score(self, user_name, points):
+		"""
+		Explanations: Adds points to the score of the user (atomic, also between workers).
+
+		Returns: the new score (int).
+		"""
+		with self.lock:
+			return self.change_score(user_name, points)
+
+	def change_score(self, user_name, points):
+		"""
+		Explanations: Adds points to the score of the user, and records the change in the leaderboard, the journal and the score changes.
+		Called with the lock of the table held.
+
+		Returns: the new score (int).
+		"""
+		user_details           = self[user_name]
+		user_details["score"] += points
+		self.leaderboard.update(user_name, user_details["score"])
+		if self.journal is not None:
+			self.journal.record_score(user_name, user_details["score"])
+		if self.score_changes is not None:
+			self.changes_position += 1
+			self.score_changes.append((self.changes_position, user_name, user_details["score"]))
+		return user_details["score"]
+
+	def add_asked_question(self, user_name, question_id):
+		"""
+		Explanations: Marks the question as asked by the user, if it wasn't asked yet (atomic, also between workers -
+		the questions deck of every worker is local, so two workers may draw the same question of the user).
+
+		Returns: True if the question is marked now, False if the user was already asked it.
+		"""
+		with self.lock:
+			questions_asked = self[user_name]["questions_asked"]
+			asked_ids       = self.asked_ids.get(user_name)
+			if asked_ids is None:
+				asked_ids = self.asked_ids[user_name] = set(questions_asked)
+			if question_id in asked_ids:
+				return False
+
+			questions_asked.append(question_id)
+			asked_ids.add(question_id)
+			self.open_questions.setdefault(user_name, set()).add(question_id)
+			if self.journal is not None:
+				self.journal.record_question(user_name, question_id)
+			return True
+
+	def answer_question(self, user_name, question_id, points):
+		"""
+		Explanations: Closes a question that the user was asked, and adds the points of the answer (atomic, also between workers).
+
+		Returns: the new score (int), or None if the user wasn't asked the question, or already answered it.
+		"""
+		with self.lock:
+			open_questions = self.open_questions.get(user_name)
+			if open_questions is None or question_id not in open_questions:
+				return None
+
+			open_questions.discard(question_id)
+			return self.change_score(user_name, points) if points else self[user_name]["score"]
+
+	def track_score_changes(self, max_changes=MAX_SCORE_CHANGES):
+		"""
+		Explanations: From now, keeps the last score changes, so every worker can pull the changes
+		of all the workers, and push them to its own subscribers (see score_changes_since).
+
+		Returns: None.
+		"""
+		self.score_changes    = collections.deque(maxlen=max_changes)
+		self.changes_position = 0
+
+	def score_changes_since(self, position):
+		"""
+		Explanations: The score changes after the given position - coalesced, a user that scored some times is returned once, with the last score.
+
+		Receives: position (int) - of the last pull, or None for only the current position.
+
+		Returns: position (int) - of the last change, changes (dict) - user name ---> score.
+		"""
+		with self.lock:
+			changes = {}
+			if position is not None:
+				for change_position, user_name, score in reversed(self.score_changes):
+					if change_position <= position:
+						break
+					changes.setdefault(user_name, score)
+			return self.changes_position, changes
+
+	def attach_storage(self, storage):
+		"""
+		Explanations: Loads the users lazily from the given storage - the leaderboard is filled from the scores of the storage now,
+		and every user is loaded when it is accessed.
+
+		Returns: None.
+		"""
+		self.storage = storage
+		self.leaderboard.load(storage.load_scores())
+
+	def attach_journal(self, journal):
+		"""
+		Explanations: From now, every change of a user is recorded in the given journal.
+
+		Returns: None.
+		"""
+		self.journal = journal
+
+	def snapshot(self):
+		"""
+		Explanations: A consistent copy of all the users (for saving them to the users file).
+
+		Returns: dict.
+		"""
+		with self.lock:
+			return {user_name: dict(user_details, questions_asked=list(user_details["questions_asked"])) for user_name, user_details in dict.items(self)}
+
+	def top_scores(self, count=None):
+		"""
+		Explanations: The users with the highest scores - O(count).
+
+		Returns: list of (user_name, score).
+		"""
+		with self.lock:
+			return self.leaderboard.top(count)
+
+	def rank(self, user_name):
+		"""
+		Explanations: The rank of the user in the leaderboard - O(log U).
+
+		Returns: rank (int), or None if the user doesn't exist.
+		"""
+		with self.lock:
+			return self.leaderboard.rank(user_name)
+
+	def keys(self):
+		return list(self.leaderboard.scores.keys())
+
+	def items(self):
+		return list(dict.items(self))
+
+
+class LoggedUsers(dict):
+	"""
+	Explanations: The logged users of the server (user name ---> number of sessions of the user).
+	Like UserTable, it is changed only by its methods, so it works also as a proxy that all the workers share.
+	"""
+	lock = threading.Lock()
+
+	def add(self, user_name):
+		"""
+		Explanations: Counts a new session of the user.
+
+		Returns: None.
+		"""
+		with self.lock:
+			self[user_name] = self.get(user_name, 0) + 1
+
+	def remove(self, user_name):
+		"""
+		Explanations: Counts a closed session of the user - the user is removed with its last session.
+
+		Returns: None.
+		"""
+		with self.lock:
+			sessions_count = self.get(user_name, 0) - 1
+			if sessions_count > 0: self[user_name] = sessions_count
+			else:                  self.pop(user_name, None)
+
+	def names(self):
+		"""
+		Returns: list of the logged user names - O(logged users).
+		"""
+		with self.lock:
+			return list(self.keys())
+
+
+class QuestionsBank:
+	"""
+	Explanations: The questions bank of the web refreshes, for all the workers - one refresher (in the parent process of the workers)
+	publishes every new bank here, and every worker pulls it (see bank_since), so all the workers serve the same bank.
+	"""
+	def __init__(self):
+		self.lock      = threading.Lock()
+		self.version   = 0
+		self.questions = None
+
+	def publish(self, questions):
+		"""
+		Explanations: Replaces the bank with a new bank of the refresher.
+
+		Returns: None.
+		"""
+		with self.lock:
+			self.version  += 1
+			self.questions = questions
+
+	def bank_since(self, version):
+		"""
+		Explanations: The bank, if it was published after the given version.
+
+		Receives: version (int) - of the last pull.
+
+		Returns: version (int), questions (dict) - or None if the bank wasn't published since the given version.
+		"""
+		with self.lock:
+			return self.version, self.questions if self.version != version else None
+
+
+# State owner process objects (exists only in the process of the StateManager) #
+_shared_users          = UserTable()
+_shared_logged_users   = LoggedUsers()
+_shared_questions_bank = QuestionsBank()
+
+
+def _load_shared_state(users, journal_path, storage):
+	if storage is not None:
+		_shared_users.attach_storage(storage)
+	_shared_users.update(users)
+	_shared_users.track_score_changes()
+	if journal_path is not None:
+		_shared_users.attach_journal(ScoreJournal(journal_path, _shared_users, storage.save_users))
+		util.Finalize(_shared_users, _shared_users.journal.close, exitpriority=10)
+
+
+def _get_shared_users():
+	return _shared_users
+
+
+def _get_shared_logged_users():
+	return _shared_logged_users
+
+
+def _get_shared_questions_bank():
+	return _shared_questions_bank
+
+
+UserTableProxy     = MakeProxyType("UserTableProxy", ("__contains__", "__getitem__", "__len__", "get", "keys", "items", "add_score", "add_asked_question", "answer_question", "score_changes_since", "top_scores", "rank"))
+LoggedUsersProxy   = MakeProxyType("LoggedUsersProxy", ("__contains__", "__len__", "add", "remove", "names"))
+QuestionsBankProxy = MakeProxyType("QuestionsBankProxy", ("publish", "bank_since"))
+
+
+class StateManager(BaseManager):
+	"""
+	Explanations: Manager of the state owner process - holds the users and logged_users dictionaries,
+	and the refreshed questions bank, for all the worker processes of the server (--workers N).
+	"""
+
+
+StateManager.register("users"         , callable=_get_shared_users         , proxytype=UserTableProxy)
+StateManager.register("logged_users"  , callable=_get_shared_logged_users  , proxytype=LoggedUsersProxy)
+StateManager.register("questions_bank", callable=_get_shared_questions_bank, proxytype=QuestionsBankProxy)
+
+
+def start_state_manager(users, journal_path=None, storage=None):
+	"""
+	Explanations: Starts the state owner process, with the users that the server already loaded.
+	If journal_path is given, the state owner process records the changes in the score journal,
+	and the journal compaction saves the users to the storage.
+
+	Receives: users (dict), journal_path (str), storage (TextStorage / SQLiteStorage).
+
+	Returns: manager (StateManager) - started, workers connect to manager.address.
+	"""
+	manager = StateManager()
+	manager.start(initializer=_load_shared_state, initargs=(dict(dict.items(users)), journal_path, storage))
+	return manager
+
+
+def connect_state_manager(address):
+	"""
+	Explanations: Connects a worker process to the state owner process.
+
+	Receives: address of the manager.
+
+	Returns: users (UserTableProxy), logged_users (LoggedUsersProxy), questions_bank (QuestionsBankProxy).
+	"""
+	manager = StateManager(address=address)
+	manager.connect()
+	return manager.users(), manager.logged_users(), manager.questions_bank()
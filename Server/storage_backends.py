@@ -0,0 +1,219 @@
+import os
+import json
+import sqlite3
+import threading
+
+
+class TextStorage:
+	"""
+	Explanations: Storage of the users and the questions in the ASCII table files (users.txt / questions.txt).
+	All the users are loaded at boot (the table files can't be read by rows).
+	"""
+
+	def __init__(self, directory):
+		self.users_file_path     = os.path.join(directory, "users.txt")
+		self.questions_file_path = os.path.join(directory, "questions.txt")
+
+	@staticmethod
+	def read_table(file_path, header_first_field):
+		"""
+		Explanations: Reads the rows of an ASCII table file (4 fields in every row), without the header row.
+
+		Returns: list of rows (list of str).
+		"""
+		rows = []
+		with open(file_path, 'r') as content_to_read:
+			for line_to_read in content_to_read:
+				if line_to_read.count("|") == 5:
+					row_fields = [row_field.strip() for row_field in line_to_read.split("|")[1:-1]]
+					if header_first_field == row_fields[0]: continue
+					rows.append(row_fields)
+		return rows
+
+	@staticmethod
+	def parse_question_row(row):
+		"""
+		Explanations: Parses one row of the questions table. Raises ValueError if the row isn't valid.
+
+		Returns: question ID (int), {"question", "answers", "correct" (number of the correct answer)}.
+		"""
+		question_id, question, answers, correct_answer = row
+		answers = [answer.strip() for answer in answers.split(",")]
+		return int(question_id), {"question": question, "answers": answers, "correct": answers.index(correct_answer) + 1}
+
+	@staticmethod
+	def parse_user_row(row):
+		"""
+		Explanations: Parses one row of the users table. Raises ValueError if the row isn't valid.
+
+		Returns: user name (str), {"password", "score", "questions_asked"}.
+		"""
+		user_name, password, score, questions_asked = row
+		if questions_asked == "-": questions_asked = []
+		else:                      questions_asked = [int(question_id) for question_id in questions_asked.split(",")]
+		return user_name, {"password": password, "score": int(score), "questions_asked": questions_asked}
+
+	def load_questions(self):
+		"""
+		Explanations: Loads questions bank from file.
+
+		Returns: questions (dict) - question ID (int) ---> {"question", "answers", "correct" (number of the correct answer)}.
+		"""
+		return dict(self.parse_question_row(row) for row in self.read_table(self.questions_file_path, "Question ID"))
+
+	def load_users(self):
+		"""
+		Explanations: Loads users list from file.
+
+		Returns: users (dict) - user name ---> {"password", "score", "questions_asked"}.
+		"""
+		return dict(self.parse_user_row(row) for row in self.read_table(self.users_file_path, "User Name"))
+
+	def load_user(self, user_name):
+		return None
+
+	def load_scores(self):
+		return []
+
+	def save_users(self, users_to_save):
+		"""
+		Explanations: Saves the users to the users file, in the same table format that load_users reads.
+		The table is written to a temporary file, then replaces the users file (so a crash never leaves half a file).
+
+		Receives: users_to_save (dict) - must hold all the users.
+
+		Returns: None.
+		"""
+		header_fields = ["User Name", "Password", "Score", "Questions Asked"]
+		rows          = [[user_name, user_details["password"], str(user_details["score"]), ",".join(str(question_id) for question_id in user_details["questions_asked"]) or "-"] for user_name, user_details in users_to_save.items()]
+		widths        = [max(len(row[column]) for row in [header_fields] + rows) for column in range(len(header_fields))]
+		separator     = "+" + "+".join("-" * (width + 2) for width in widths) + "+\n"
+
+		def build_row(row):
+			return "| " + " | ".join(field.center(width) if column == 3 else field.ljust(width) for column, (field, width) in enumerate(zip(row, widths))) + " |\n"
+
+		table = separator + build_row(header_fields) + separator + "".join(build_row(row) + separator for row in rows)
+
+		with open(self.users_file_path + ".tmp", 'w', newline="\r\n") as content_to_write:
+			content_to_write.write(table)
+			content_to_write.flush()
+			os.fsync(content_to_write.fileno())
+		os.replace(self.users_file_path + ".tmp", self.users_file_path)
+
+
+class SQLiteStorage:
+	"""
+	Explanations: Storage of the users and the questions in SQLite (WAL mode, so reads don't wait for the writes).
+	The users are loaded lazily - at boot only (user name, score) are read, in order, from the score index
+	(for the leaderboard), and the full row of a user is read by the user name primary key when it is needed.
+	The statements are fixed SQL strings with parameters, so sqlite3 prepares each one once and reuses it from its cache,
+	and all the writes of one save are batched in one transaction (executemany).
+	"""
+
+	SCHEMA = """
+	CREATE TABLE IF NOT EXISTS users           (user_name TEXT PRIMARY KEY, password TEXT NOT NULL, score INTEGER NOT NULL);
+	CREATE INDEX IF NOT EXISTS users_by_score  ON users (score DESC, user_name);
+	CREATE TABLE IF NOT EXISTS questions_asked (user_name TEXT NOT NULL, question_id INTEGER NOT NULL, PRIMARY KEY (user_name, question_id)) WITHOUT ROWID;
+	CREATE TABLE IF NOT EXISTS questions       (question_id INTEGER PRIMARY KEY, question TEXT NOT NULL, answers TEXT NOT NULL, correct INTEGER NOT NULL);
+	"""
+
+	def __init__(self, database_path):
+		self.database_path  = database_path
+		self.connection     = None
+		self.connection_pid = None
+		self.lock           = threading.Lock()
+
+	def connect(self):
+		"""
+		Explanations: The connection of the current process (a connection can't be used after fork, so every worker opens its own).
+
+		Returns: sqlite3.Connection.
+		"""
+		if self.connection is None or self.connection_pid != os.getpid():
+			self.connection     = sqlite3.connect(self.database_path, check_same_thread=False, cached_statements=256)
+			self.connection_pid = os.getpid()
+			self.connection.execute("PRAGMA journal_mode=WAL")
+			self.connection.execute("PRAGMA synchronous=NORMAL")
+			self.connection.executescript(self.SCHEMA)
+		return self.connection
+
+	def __getstate__(self):
+		return {"database_path": self.database_path}
+
+	def __setstate__(self, state):
+		self.__init__(state["database_path"])
+
+	def is_empty(self):
+		with self.lock:
+			return self.connect().execute("SELECT NOT EXISTS (SELECT 1 FROM users) AND NOT EXISTS (SELECT 1 FROM questions)").fetchone()[0] == 1
+
+	def load_questions(self):
+		with self.lock:
+			rows = self.connect().execute("SELECT question_id, question, answers, correct FROM questions").fetchall()
+		return {question_id: {"question": question, "answers": json.loads(answers), "correct": correct} for question_id, question, answers, correct in rows}
+
+	def save_questions(self, questions_to_save):
+		with self.lock:
+			with self.connect() as connection:
+				connection.executemany("INSERT OR REPLACE INTO questions (question_id, question, answers, correct) VALUES (?, ?, ?, ?)",
+									   [(question_id, details["question"], json.dumps(details["answers"]), details["correct"]) for question_id, details in questions_to_save.items()])
+
+	def load_users(self):
+		return {}
+
+	def load_user(self, user_name):
+		"""
+		Explanations: Loads one user by the user name primary key.
+
+		Returns: user details (dict), or None if the user doesn't exist.
+		"""
+		with self.lock:
+			connection = self.connect()
+			user_row   = connection.execute("SELECT password, score FROM users WHERE user_name = ?", (user_name,)).fetchone()
+			if user_row is None:
+				return None
+			questions_asked = [question_id for (question_id,) in connection.execute("SELECT question_id FROM questions_asked WHERE user_name = ?", (user_name,))]
+		return {"password": user_row[0], "score": user_row[1], "questions_asked": questions_asked}
+
+	def load_scores(self):
+		"""
+		Explanations: All the (user name, score), ordered from the highest score - read from the score index only.
+
+		Returns: list of (user_name, score).
+		"""
+		with self.lock:
+			return self.connect().execute("SELECT user_name, score FROM users ORDER BY score DESC, user_name").fetchall()
+
+	def save_users(self, users_to_save):
+		"""
+		Explanations: Saves the given users (insert or update), in one transaction.
+
+		Receives: users_to_save (dict) - may hold only part of the users (the others are not changed).
+
+		Returns: None.
+		"""
+		with self.lock:
+			with self.connect() as connection:
+				connection.executemany("INSERT INTO users (user_name, password, score) VALUES (?, ?, ?) ON CONFLICT (user_name) DO UPDATE SET password = excluded.password, score = excluded.score",
+									   [(user_name, details["password"], details["score"]) for user_name, details in users_to_save.items()])
+				connection.executemany("INSERT OR IGNORE INTO questions_asked (user_name, question_id) VALUES (?, ?)",
+									   [(user_name, question_id) for user_name, details in users_to_save.items() for question_id in details["questions_asked"]])
+
+
+def create_storage(storage_type, directory, database_path=None):
+	"""
+	Explanations: Creates the storage of the server. A new SQLite database is filled from the text files of the directory.
+
+	Receives: storage_type (str) - "text" or "sqlite", directory (str), database_path (str).
+
+	Returns: storage (TextStorage / SQLiteStorage).
+	"""
+	text_storage = TextStorage(directory)
+	if storage_type == "text":
+		return text_storage
+
+	sqlite_storage = SQLiteStorage(database_path or os.path.join(directory, "trivia.db"))
+	if sqlite_storage.is_empty():
+		sqlite_storage.save_users(text_storage.load_users())
+		sqlite_storage.save_questions(text_storage.load_questions())
+	return sqlite_storage
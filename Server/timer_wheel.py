@@ -0,0 +1,114 @@
+class Timer:
+	"""
+	Explanations: One scheduled callback of a TimerWheel (keep it to cancel the callback).
+
+	expires : int - the tick that the callback runs at.
+	bucket  : the set of the wheel slot that holds the timer, or None after it ran / was cancelled.
+	"""
+	__slots__ = ("expires", "callback", "args", "bucket")
+
+	def __init__(self, expires, callback, args):
+		self.expires  = expires
+		self.callback = callback
+		self.args     = args
+		self.bucket   = None
+
+
+class TimerWheel:
+	"""
+	Explanations: Hierarchical timer wheel (like the timers of the Linux kernel) - levels of SLOTS slots, where a slot of level 0
+	is one tick, and a slot of level N holds the timers of SLOTS ** N ticks. A timer is added to the slot of its level by its
+	distance, and the timers of a higher level slot move down a level (cascade) when the lower wheel wraps around.
+	Schedule and cancel are O(1), and every tick touches only one slot - so the cost doesn't depend on the number of timers.
+
+	Timers that are further than SLOTS ** LEVELS ticks are kept in the last level, and cascade again until they are close.
+	"""
+	SLOT_BITS = 6
+	SLOTS     = 1 << SLOT_BITS
+	LEVELS    = 4
+
+	def __init__(self, tick, now):
+		self.tick         = tick
+		self.current_tick = int(now / tick)
+		self.wheels       = [[set() for _ in range(self.SLOTS)] for _ in range(self.LEVELS)]
+		self.count        = 0
+
+	def __len__(self):
+		return self.count
+
+	def add(self, timer):
+		expires  = timer.expires
+		distance = expires - self.current_tick
+		for level in range(self.LEVELS):
+			if distance < 1 << (self.SLOT_BITS * (level + 1)) or level == self.LEVELS - 1:
+				timer.bucket = self.wheels[level][(expires >> (self.SLOT_BITS * level)) & (self.SLOTS - 1)]
+				timer.bucket.add(timer)
+				return
+
+	def schedule(self, deadline, callback, *args):
+		"""
+		Explanations: Schedules callback(*args) to run at the deadline (rounded up to a whole tick, and at least one tick from now).
+
+		Receives: deadline (float) - same clock as the now of advance, callback (function), args.
+
+		Returns: timer (Timer).
+		"""
+		timer = Timer(max(-int(-deadline // self.tick), self.current_tick + 1), callback, args)
+		self.add(timer)
+		self.count += 1
+		return timer
+
+	def cancel(self, timer):
+		if timer.bucket is not None:
+			timer.bucket.discard(timer)
+			timer.bucket = None
+			self.count  -= 1
+
+	def cascade(self, level):
+		"""
+		Explanations: Moves the timers of the current slot of the level down to the lower levels.
+
+		Returns: the index of the slot (0 means that the level wrapped around too).
+		"""
+		index                     = (self.current_tick >> (self.SLOT_BITS * level)) & (self.SLOTS - 1)
+		timers                    = self.wheels[level][index]
+		self.wheels[level][index] = set()
+		for timer in timers:
+			self.add(timer)
+		return index
+
+	def advance(self, now):
+		"""
+		Explanations: Moves the wheel to now, tick by tick, and runs the callbacks of the timers that expired.
+		The callbacks may schedule and cancel timers.
+
+		Receives: now (float).
+
+		Returns: None.
+		"""
+		target_tick = int(now / self.tick)
+		while self.current_tick < target_tick:
+			self.current_tick += 1
+			if not self.count:
+				self.current_tick = target_tick
+				break
+
+			level = 1
+			while level < self.LEVELS and self.current_tick & ((1 << (self.SLOT_BITS * level)) - 1) == 0:
+				self.cascade(level)
+				level += 1
+
+			index   = self.current_tick & (self.SLOTS - 1)
+			expired = self.wheels[0][index]
+			self.wheels[0][index] = set()
+			for timer in expired:
+				timer.bucket = None
+				self.count  -= 1
+			for timer in expired:
+				timer.callback(*timer.args)
+
+	def timeout(self, now):
+		"""
+		Returns: seconds to wait for the next tick (for the select of the server loop), or None if there are no timers.
+		"""
+		return max((self.current_tick + 1) * self.tick - now, 0) if self.count else None
@@ -0,0 +1,72 @@
+import os
+import sys
+import time
+import pytest
+
+
+# The server and the client import chatlib from the DB folder, like in "PYTHONPATH=. python ../Server/server.py" #
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [os.path.join(ROOT, "DB"), os.path.join(ROOT, "Server"), os.path.join(ROOT, "Client")]
+
+
+class FakeConnection:
+	"""
+	Explanations: Stands for the socket of a client in the handlers of the server - the answers stay in outgoing_messages.
+	"""
+
+	def __repr__(self):
+		return "FakeConnection"
+
+
+@pytest.fixture
+def trivia_server(monkeypatch, tmp_path):
+	"""
+	Explanations: The server module with fresh tables (the users Test / Yossi, and 3 questions), in a temporary working directory.
+
+	Returns: server (module).
+	"""
+	import server
+	import sessions
+	import shared_state
+	import timer_wheel
+
+	monkeypatch.chdir(tmp_path)
+	monkeypatch.setattr(server, "users", shared_state.UserTable({
+		"Test" : {"password": "Test", "score": 0 , "questions_asked": []},
+		"Yossi": {"password": "123" , "score": 50, "questions_asked": []}
+	}))
+	monkeypatch.setattr(server, "questions", {
+		2313: {"question": "How much is 2 + 2 ?", "answers": ["3", "4", "2", "1"], "correct": 2},
+		3560: {"question": "How much is 2 * 2 ?", "answers": ["4", "3", "2", "1"], "correct": 1},
+		4122: {"question": "How much is 2 / 2 ?", "answers": ["3", "4", "2", "1"], "correct": 4}
+	})
+	monkeypatch.setattr(server, "question_decks", {})
+	monkeypatch.setattr(server, "client_sessions", sessions.SessionTable())
+	monkeypatch.setattr(server, "outgoing_messages", {})
+	monkeypatch.setattr(server, "pending_sockets", set())
+	monkeypatch.setattr(server, "deadline_timers", timer_wheel.TimerWheel(server.TIMER_TICK, time.monotonic()))
+	monkeypatch.setattr(server.answers_cache, "enabled", False)
+	server.index_questions()
+	return server
+
+
+def open_session(server, user_name=None):
+	"""
+	Explanations: Opens a session of a fake client on the server (logged in as user_name, if given).
+
+	Returns: connection (FakeConnection).
+	"""
+	connection = FakeConnection()
+	session    = server.client_sessions.open(connection, ("127.0.0.1", 0))
+	if user_name is not None:
+		server.client_sessions.login(session, user_name)
+	return connection
+
+
+def sent_messages(server, connection):
+	"""
+	Returns: list of (cmd, data) - the answers that the server queued to the connection.
+	"""
+	import chatlib
+
+	return chatlib.MessageDecoder().feed(bytes(server.outgoing_messages.get(connection, b"")))
@@ -0,0 +1,68 @@
+import pytest
+import chatlib
+
+
+MESSAGES = [("LOGIN", "Test#Test"), ("MY_SCORE", ""), ("SEND_ANSWER", "2313#2"), ("LOGGED_ANSWER", "שלום, Test")]
+
+
+def feed_in_chunks(decoder, stream, chunk_size):
+	messages = []
+	for offset in range(0, len(stream), chunk_size):
+		messages += decoder.feed(stream[offset:offset + chunk_size])
+	return messages
+
+
+@pytest.mark.parametrize("chunk_size", [1, 3, 22, 1000])
+def test_text_decoder_joins_split_and_pipelined_messages(chunk_size):
+	stream  = b"".join(chatlib.build_message(cmd, data).encode() for cmd, data in MESSAGES)
+	decoder = chatlib.MessageDecoder()
+
+	assert feed_in_chunks(decoder, stream, chunk_size) == MESSAGES
+	assert not decoder.buffer
+
+
+@pytest.mark.parametrize("chunk_size", [1, 5, 1000])
+def test_binary_decoder_joins_split_and_pipelined_messages(chunk_size):
+	stream  = b"".join(chatlib.build_binary_message(cmd, data) for cmd, data in MESSAGES)
+	decoder = chatlib.BinaryMessageDecoder()
+
+	assert feed_in_chunks(decoder, stream, chunk_size) == MESSAGES
+	assert not decoder.buffer
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 1000])
+def test_mux_decoder_keeps_the_session_tags(chunk_size):
+	stream  = b"".join(chatlib.build_mux_message(session_id, cmd, data) for session_id, (cmd, data) in enumerate(MESSAGES, start=1))
+	decoder = chatlib.MuxMessageDecoder()
+
+	assert feed_in_chunks(decoder, stream, chunk_size) == [(session_id, cmd, data) for session_id, (cmd, data) in enumerate(MESSAGES, start=1)]
+
+
+@pytest.mark.parametrize("broken_header", [
+	b"LOGIN           |00x4|Test",   # Length field isn't digits
+	b"LOGIN           |\xc2\xb2\xc2\xb2|Te",  # Unicode digits (²) in the length field
+	b"LOGIN           -0004|Test"    # Missing delimiter
+])
+def test_text_decoder_reports_a_broken_stream(broken_header):
+	decoder  = chatlib.MessageDecoder()
+	messages = decoder.feed(chatlib.build_message("MY_SCORE", "").encode() + broken_header)
+
+	assert messages == [("MY_SCORE", ""), (chatlib.ERROR_RETURN, chatlib.ERROR_RETURN)]
+	assert not decoder.buffer
+
+
+def test_text_decoder_reports_bad_utf8():
+	assert chatlib.MessageDecoder().feed(b"LOGIN           |0002|\xff\xfe") == [(chatlib.ERROR_RETURN, chatlib.ERROR_RETURN)]
+
+
+def test_binary_decoders_report_unknown_opcodes_and_huge_lengths():
+	assert chatlib.BinaryMessageDecoder().feed(chatlib.BINARY_HEADER.pack(0, 0)) == [(chatlib.ERROR_RETURN, chatlib.ERROR_RETURN)]
+	assert chatlib.BinaryMessageDecoder().feed(chatlib.BINARY_HEADER.pack(chatlib.OPCODES["LOGIN"], chatlib.BINARY_MAX_DATA_LENGTH + 1)) == [(chatlib.ERROR_RETURN, chatlib.ERROR_RETURN)]
+	assert chatlib.MuxMessageDecoder().feed(chatlib.MUX_HEADER.pack(1, 255, 0)) == [(chatlib.ERROR_RETURN, chatlib.ERROR_RETURN, chatlib.ERROR_RETURN)]
+
+
+def test_batch_round_trip():
+	batch_data = chatlib.build_batch(MESSAGES)
+
+	assert chatlib.parse_batch(batch_data) == MESSAGES
+	assert chatlib.parse_batch(batch_data[:-1]) is chatlib.ERROR_RETURN
@@ -0,0 +1,90 @@
+import random
+import pytest
+import chatlib
+import shared_state
+from leaderboard import Leaderboard
+from conftest import open_session, sent_messages
+
+
+def sorted_scores(scores):
+	return sorted(scores.items(), key=lambda user_score: (-user_score[1], user_score[0]))
+
+
+def test_leaderboard_keeps_the_order_of_a_full_sort():
+	random.seed(3)
+	leaderboard, scores = Leaderboard(), {}
+	for _ in range(2000):
+		user_name = f'user{random.randrange(200)}'
+		if random.random() < 0.1 and user_name in scores:
+			leaderboard.remove(user_name)
+			del scores[user_name]
+		else:
+			scores[user_name] = random.randrange(-5, 100)
+			leaderboard.update(user_name, scores[user_name])
+
+	assert leaderboard.top() == sorted_scores(scores)
+	assert leaderboard.top(10) == sorted_scores(scores)[:10]
+	assert len(leaderboard) == len(scores)
+
+
+def test_rank_counts_only_higher_scores():
+	leaderboard = Leaderboard()
+	leaderboard.load([("master", 200), ("Yossi", 50), ("Dana", 50), ("Test", 0)])
+
+	assert [leaderboard.rank(user_name) for user_name in ("master", "Yossi", "Dana", "Test")] == [1, 2, 2, 4]
+	assert leaderboard.rank("Nobody") is None
+
+
+def test_user_table_updates_the_leaderboard():
+	users = shared_state.UserTable({"Test": {"password": "Test", "score": 0, "questions_asked": []},
+									"Yossi": {"password": "123", "score": 50, "questions_asked": []}})
+	users.add_score("Test", 55)
+
+	assert users.top_scores() == [("Test", 55), ("Yossi", 50)]
+	assert users.rank("Yossi") == 2
+
+
+@pytest.mark.parametrize("data", ["²", "٣", "", "-1", "1.5", "x"])
+def test_bad_top_scores_counts_are_errors(trivia_server, data):
+	connection = open_session(trivia_server, "Test")
+
+	trivia_server.handle_client_message(connection, "TOP_SCORES", data)
+
+	assert [cmd for cmd, _ in sent_messages(trivia_server, connection)] == ["ERROR"]
+
+
+def test_top_scores(trivia_server):
+	connection = open_session(trivia_server, "Test")
+
+	trivia_server.handle_client_message(connection, "TOP_SCORES", "1")
+
+	assert sent_messages(trivia_server, connection) == [("ALL_SCORE", "Yossi : 50\n")]
+
+
+def test_build_message_rejects_data_longer_than_the_length_field():
+	assert chatlib.build_message("ALL_SCORE", "x" * chatlib.MAX_DATA_LENGTH) is not chatlib.ERROR_RETURN
+	assert chatlib.build_message("ALL_SCORE", "x" * (chatlib.MAX_DATA_LENGTH + 1)) is chatlib.ERROR_RETURN
+	assert chatlib.build_message("ALL_SCORE", "ש" * (chatlib.MAX_DATA_LENGTH // 2 + 1)) is chatlib.ERROR_RETURN  # Bytes, not characters
+
+
+def test_big_high_score_table_is_cut_at_a_whole_line(trivia_server):
+	for index in range(2000):
+		trivia_server.users[f'player{index:05}'] = {"password": "pw", "score": index, "questions_asked": []}
+	connection = open_session(trivia_server, "Test")
+
+	trivia_server.handle_client_message(connection, "HIGHSCORE", "")
+
+	[(cmd, data)] = sent_messages(trivia_server, connection)
+	assert cmd == "ALL_SCORE"
+	assert len(data.encode()) <= chatlib.MAX_DATA_LENGTH
+	assert data.endswith("\n")
+	assert data.splitlines()[0] == "player01999 : 1999"
+
+
+def test_build_scores_table_fits_the_limit():
+	import server
+
+	scores = [(f'user{index}', index) for index in range(100)]
+
+	assert server.build_scores_table(scores) == "".join(f'user{index} : {index}\n' for index in range(100))
+	assert server.build_scores_table(scores, 30) == "user0 : 0\nuser1 : 1\nuser2 : 2\n"
@@ -0,0 +1,88 @@
+import random
+import pytest
+import shared_state
+import score_journal
+from conftest import open_session, sent_messages
+
+
+def test_deck_draws_every_position_once():
+	import server
+
+	deck  = server.QuestionDeck(100)
+	drawn = [deck.draw() for _ in range(100)]
+
+	assert sorted(drawn) == list(range(100))
+	assert deck.draw() is None
+
+
+def test_deck_never_draws_removed_positions():
+	import server
+
+	random.seed(7)
+	deck    = server.QuestionDeck(50)
+	removed = set(random.sample(range(50), 20))
+	for position in removed:
+		assert deck.remove(position)
+	assert not deck.remove(next(iter(removed)))  # Already out of the deck
+
+	drawn = [deck.draw() for _ in range(30)]
+	assert set(drawn) == set(range(50)) - removed
+	assert deck.draw() is None
+
+
+def test_user_is_never_asked_a_question_twice(trivia_server):
+	connection = open_session(trivia_server, "Test")
+	for _ in range(4):
+		trivia_server.handle_client_message(connection, "GET_QUESTION", "")
+
+	messages = sent_messages(trivia_server, connection)
+	asked    = [int(data.split("#")[0]) for cmd, data in messages if cmd == "YOUR_QUESTION"]
+	assert sorted(asked) == sorted(trivia_server.questions)
+	assert messages[-1][0] == "NO_QUESTIONS"
+	assert trivia_server.users["Test"]["questions_asked"] == asked
+
+
+def test_question_is_scored_once(trivia_server):
+	connection = open_session(trivia_server, "Test")
+	trivia_server.handle_client_message(connection, "GET_QUESTION", "")
+	question_id = int(sent_messages(trivia_server, connection)[0][1].split("#")[0])
+	correct     = trivia_server.questions[question_id]["correct"]
+
+	trivia_server.handle_client_message(connection, "SEND_ANSWER", f'{question_id}#{correct}')
+	trivia_server.handle_client_message(connection, "SEND_ANSWER", f'{question_id}#{correct}')
+	trivia_server.handle_client_message(connection, "SEND_ANSWER", f'{next(iter(set(trivia_server.questions) - {question_id}))}#1')
+
+	assert [cmd for cmd, data in sent_messages(trivia_server, connection)[1:]] == ["CORRECT_ANSWER", "WRONG_ANSWER", "WRONG_ANSWER"]
+	assert trivia_server.users["Test"]["score"] == trivia_server.CORRECT_ANSWER_POINT
+
+
+@pytest.mark.parametrize("data", ["²#1", "2313#²", "٣#1", "#", "2313", "2313#1#1", "-1#1", "2313#0", "2313#5"])
+def test_bad_answers_are_wrong_answers(trivia_server, data):
+	connection = open_session(trivia_server, "Test")
+	trivia_server.users.add_asked_question("Test", 2313)
+
+	trivia_server.handle_client_message(connection, "SEND_ANSWER", data)
+
+	assert [cmd for cmd, _ in sent_messages(trivia_server, connection)] == ["WRONG_ANSWER"]
+	assert trivia_server.users["Test"]["score"] == 0
+
+
+def test_asked_questions_are_checked_after_the_user_is_replaced():
+	users = shared_state.UserTable({"Test": {"password": "Test", "score": 0, "questions_asked": [1]}})
+
+	assert not users.add_asked_question("Test", 1)
+	assert users.add_asked_question("Test", 2)
+
+	users["Test"] = dict(users["Test"], questions_asked=[1, 2, 3])  # Like a reload of the user
+	assert not users.add_asked_question("Test", 3)
+	assert users.add_asked_question("Test", 4)
+	assert users["Test"]["questions_asked"] == [1, 2, 3, 4]
+
+
+def test_replay_adds_every_asked_question_once(tmp_path):
+	users        = shared_state.UserTable({"Test": {"password": "Test", "score": 0, "questions_asked": [1]}})
+	journal_path = tmp_path / score_journal.JOURNAL_FILE_NAME
+	journal_path.write_text("".join(f'Q\tTest\t{question_id}\n' for question_id in (1, 2, 2, 3)), encoding="utf-8")
+
+	assert score_journal.replay_journal(str(journal_path), users) == 4
+	assert users["Test"]["questions_asked"] == [1, 2, 3]
@@ -0,0 +1,115 @@
+import json
+import base64
+import threading
+import http.server
+import pytest
+
+
+def encode(text):
+	return base64.b64encode(text.encode()).decode()
+
+
+OPENTDB_ANSWER = {"response_code": 0, "results": [
+	{"question": encode("Capital of France ?"), "correct_answer": encode("Paris"), "incorrect_answers": [encode("Rome"), encode("Oslo"), encode("Bern")]},
+	{"question": encode("How much is 3 + 3 ?"), "correct_answer": encode("6"), "incorrect_answers": [encode("5"), encode("7"), encode("9")]}
+]}
+
+
+@pytest.fixture
+def questions_web():
+	"""
+	Explanations: Local stand-in of the questions web server - answers every GET with the body of the path (see bodies).
+
+	Returns: base url (str), bodies (dict) - path ---> body (bytes).
+	"""
+	bodies = {}
+
+	class Handler(http.server.BaseHTTPRequestHandler):
+		def do_GET(self):
+			body = bodies.get(self.path, b"")
+			self.send_response(200 if self.path in bodies else 404)
+			self.send_header("Content-Length", str(len(body)))
+			self.end_headers()
+			self.wfile.write(body)
+
+		def log_message(self, *args):
+			pass
+
+	web_server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+	threading.Thread(target=web_server.serve_forever, args=(0.05,), daemon=True).start()
+	yield f'http://127.0.0.1:{web_server.server_address[1]}', bodies
+	web_server.shutdown()
+	web_server.server_close()
+
+
+def test_fetch_decodes_the_opentdb_answer(trivia_server, questions_web):
+	url, bodies         = questions_web
+	bodies["/api.json"] = json.dumps(OPENTDB_ANSWER).encode()
+
+	web_questions = trivia_server.fetch_questions_from_web(url + "/api.json")
+
+	assert sorted(question["question"] for question in web_questions.values()) == ["Capital of France ?", "How much is 3 + 3 ?"]
+	for question in web_questions.values():
+		assert question["answers"][question["correct"] - 1] in ("Paris", "6")
+	assert web_questions == trivia_server.fetch_questions_from_web(url + "/api.json")  # The IDs are stable between refreshes
+
+
+@pytest.mark.parametrize("body", [b"not json", b'{"response_code": 0}', b'{"results": [{"question": "@@@"}]}'])
+def test_malformed_answer_keeps_the_bank(trivia_server, questions_web, body):
+	url, bodies         = questions_web
+	bodies["/api.json"] = body
+	published           = []
+	bank_before         = trivia_server.questions
+
+	trivia_server.refresh_questions_forever(url + "/api.json", 0, published.append)
+
+	assert published == []
+	assert trivia_server.questions is bank_before
+	assert trivia_server.load_questions_cache() is None
+
+
+def test_refresh_saves_the_cache_and_publishes(trivia_server, questions_web):
+	url, bodies         = questions_web
+	bodies["/api.json"] = json.dumps(OPENTDB_ANSWER).encode()
+	published           = []
+
+	trivia_server.refresh_questions_forever(url + "/api.json", 0, published.append)
+
+	assert len(published) == 1 and len(published[0]) == 2
+	assert trivia_server.load_questions_cache() == published[0]
+
+
+def test_failed_refresh_falls_back_to_the_cache(trivia_server, questions_web):
+	url, bodies         = questions_web
+	bodies["/api.json"] = json.dumps(OPENTDB_ANSWER).encode()
+	trivia_server.refresh_questions_forever(url + "/api.json", 0, lambda web_questions: None)
+
+	published = []
+	trivia_server.refresh_questions_forever(url + "/missing.json", 0, published.append)
+
+	assert published == []
+	cached_questions = trivia_server.load_questions_cache()
+	assert sorted(question["question"] for question in cached_questions.values()) == ["Capital of France ?", "How much is 3 + 3 ?"]
+
+
+def test_broken_cache_is_ignored(trivia_server, tmp_path):
+	(tmp_path / trivia_server.QUESTIONS_CACHE_FILE).write_text("{broken", encoding="utf-8")
+
+	assert trivia_server.load_questions_cache() is None
+
+
+def test_workers_pull_the_published_bank(trivia_server, monkeypatch):
+	import shared_state
+
+	questions_bank = shared_state.QuestionsBank()
+	monkeypatch.setattr(trivia_server, "questions_bank", questions_bank)
+	monkeypatch.setattr(trivia_server, "questions_version", 0)
+	bank_before = trivia_server.questions
+
+	trivia_server.pull_questions_bank()
+	assert trivia_server.questions is bank_before
+
+	new_bank = {7: {"question": "New ?", "answers": ["a", "b", "c", "d"], "correct": 1}}
+	questions_bank.publish(new_bank)
+	trivia_server.pull_questions_bank()
+	assert trivia_server.questions == new_bank
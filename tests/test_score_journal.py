@@ -0,0 +1,100 @@
+import pytest
+import shared_state
+import score_journal
+
+
+def new_users():
+	return shared_state.UserTable({"Test" : {"password": "Test", "score": 0 , "questions_asked": []},
+								   "Yossi": {"password": "123" , "score": 50, "questions_asked": [2313]}})
+
+
+@pytest.fixture
+def journal_path(tmp_path):
+	return str(tmp_path / score_journal.JOURNAL_FILE_NAME)
+
+
+def open_journal(journal_path, users, saved):
+	"""
+	Explanations: A journal that commits and compacts only when the test calls it (saved gets every saved snapshot).
+	"""
+	journal = score_journal.ScoreJournal(journal_path, users, saved.append, commit_interval=3600, compact_interval=3600)
+	users.attach_journal(journal)
+	return journal
+
+
+def test_replay_restores_the_changes_after_a_restart(journal_path):
+	users   = new_users()
+	journal = open_journal(journal_path, users, [])
+	users.add_score("Test", 5)
+	users.add_score("Test", 5)
+	users.add_asked_question("Yossi", 3560)
+	journal.close()
+
+	restarted_users = new_users()
+	assert score_journal.replay_journal(journal_path, restarted_users) == 3
+	assert restarted_users["Test"]["score"] == 10
+	assert restarted_users["Yossi"]["questions_asked"] == [2313, 3560]
+	assert restarted_users.top_scores() == [("Yossi", 50), ("Test", 10)]
+
+
+@pytest.mark.parametrize("records", [
+	"S\tTest\t7\nS\tTest\t9",         # Broken last line (crash in the middle of a write)
+	"S\tTest\t7\nS\tTest\t²\n",       # Unicode digit
+	"S\tTest\t7\nS\tTest\t--5\n",     # Not a number
+	"S\tTest\t7\nS\tNobody\t9\n",     # Unknown user
+	"S\tTest\t7\nS\tTest\n"           # Missing field
+])
+def test_replay_skips_bad_records(journal_path, records):
+	with open(journal_path, "w", encoding="utf-8") as journal_file:
+		journal_file.write(records)
+	users = new_users()
+
+	assert score_journal.replay_journal(journal_path, users) == 1
+	assert users["Test"]["score"] == 7
+
+
+def test_replay_without_a_journal(journal_path):
+	assert score_journal.replay_journal(journal_path, new_users()) == 0
+
+
+def test_compaction_saves_the_users_and_truncates_the_journal(journal_path):
+	users, saved = new_users(), []
+	journal      = open_journal(journal_path, users, saved)
+	users.add_score("Test", 5)
+	journal.commit()
+
+	journal.compact()
+
+	assert [snapshot["Test"]["score"] for snapshot in saved] == [5]
+	with open(journal_path, encoding="utf-8") as journal_file:
+		assert journal_file.read() == ""
+	journal.close()
+
+
+def test_compaction_is_skipped_when_nothing_was_recorded(journal_path):
+	users, saved = new_users(), []
+	journal      = open_journal(journal_path, users, saved)
+
+	journal.compact()
+	users.add_score("Test", 5)
+	journal.compact()
+	journal.compact()
+
+	assert len(saved) == 1
+	journal.close()
+
+
+def test_refused_save_keeps_the_journal(journal_path):
+	users   = new_users()
+	refused = []
+	journal = score_journal.ScoreJournal(journal_path, users, lambda users_to_save: refused.append(users_to_save) or False, commit_interval=3600, compact_interval=3600)
+	users.attach_journal(journal)
+	users.add_score("Test", 5)
+
+	journal.compact()
+	journal.close()
+
+	assert len(refused) == 1
+	restarted_users = new_users()
+	assert score_journal.replay_journal(journal_path, restarted_users) == 1
+	assert restarted_users["Test"]["score"] == 5
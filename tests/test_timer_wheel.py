@@ -0,0 +1,80 @@
+import random
+from timer_wheel import TimerWheel
+
+
+TICK = 0.25
+
+
+class SmallTimerWheel(TimerWheel):
+	"""
+	Explanations: A wheel of 4 slots per level - all the levels (and the timers beyond the last level) in a few hundred ticks.
+	"""
+	SLOT_BITS = 2
+	SLOTS     = 1 << SLOT_BITS
+
+
+def test_timers_run_at_their_tick_in_order():
+	wheel, fired = TimerWheel(TICK, 0.0), []
+	wheel.schedule(1.0, fired.append, "b")
+	wheel.schedule(0.1, fired.append, "a")
+	wheel.schedule(2.6, fired.append, "c")
+
+	wheel.advance(0.9)
+	assert fired == ["a"]
+	wheel.advance(1.0)
+	assert fired == ["a", "b"]
+	wheel.advance(2.5)
+	assert fired == ["a", "b"]
+	wheel.advance(2.75)  # The deadline is rounded up to a whole tick
+	assert fired == ["a", "b", "c"]
+	assert len(wheel) == 0 and wheel.timeout(3.0) is None
+
+
+def test_far_timers_cascade_down_every_level():
+	random.seed(5)
+	wheel, fired = SmallTimerWheel(TICK, 0.0), []
+	deadlines    = {index: random.uniform(0, TICK * SmallTimerWheel.SLOTS ** SmallTimerWheel.LEVELS * 3) for index in range(500)}
+	for index, deadline in deadlines.items():
+		wheel.schedule(deadline, lambda index=index: fired.append((index, wheel.current_tick)))
+
+	wheel.advance(TICK * SmallTimerWheel.SLOTS ** SmallTimerWheel.LEVELS * 4)
+
+	assert len(wheel) == 0
+	assert sorted(index for index, _ in fired) == sorted(deadlines)
+	for index, fired_tick in fired:
+		assert fired_tick == -int(-deadlines[index] // TICK)  # Runs exactly at the tick of its deadline
+
+
+def test_cancelled_timers_never_run():
+	wheel, fired = TimerWheel(TICK, 0.0), []
+	timers       = [wheel.schedule(index * TICK * 100, fired.append, index) for index in range(1, 10)]
+	for timer in timers[::2]:
+		wheel.cancel(timer)
+	wheel.cancel(timers[0])  # Cancelling twice is safe
+
+	wheel.advance(TICK * 1000)
+
+	assert fired == [2, 4, 6, 8]
+
+
+def test_callbacks_can_schedule_again():
+	wheel, fired = TimerWheel(TICK, 0.0), []
+
+	def heartbeat(count):
+		fired.append(count)
+		if count < 5:
+			wheel.schedule(wheel.current_tick * TICK + 1.0, heartbeat, count + 1)
+
+	wheel.schedule(1.0, heartbeat, 1)
+	wheel.advance(100.0)
+
+	assert fired == [1, 2, 3, 4, 5]
+
+
+def test_schedule_in_the_past_runs_on_the_next_tick():
+	wheel, fired = TimerWheel(TICK, 10.0), []
+	wheel.schedule(0.0, fired.append, "late")
+
+	assert wheel.timeout(10.0) == TICK
+	wheel.advance(10.25)
+	assert fired == ["late"]